@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import glob
+import random
+import threading
+import subprocess
+
+from src.content_creation.media_cache import file_sha1
+from src.utils.json_files import load_json, save_json
+
+# Platform loudness targets (YouTube/Instagram normalize to roughly -14 LUFS).
+TARGET_LUFS = -14.0
+TARGET_TRUE_PEAK = -1.5
+TARGET_LRA = 11.0
+# Music under a voiceover sits this far below the voice before ducking.
+MUSIC_BED_GAIN_DB = -12.0
+FADE_IN_SECONDS = 0.5
+FADE_OUT_SECONDS = 1.5
+AUDIO_SAMPLE_RATE = 44100
+
+# First-pass loudnorm measurements, keyed by source content hash, so each file is analysed once.
+LOUDNESS_CACHE_FILE = 'loudness_cache.json'
+# Put a quiet local song under voice reels, ducked whenever the narrator speaks.
+VOICE_MUSIC_BED = os.getenv('VOICE_MUSIC_BED', 'False').lower() in ('true', '1', 't')
+
+_LOUDNORM_JSON_RE = re.compile(r'\{[^{}]*"input_i"[^{}]*\}', re.S)
+
+# Concurrent renders measure and record loudness from executor threads.
+_loudness_lock = threading.Lock()
+
+def load_loudness_cache():
+    return load_json(LOUDNESS_CACHE_FILE)
+
+def save_loudness_cache(cache):
+    save_json(LOUDNESS_CACHE_FILE, cache, indent=2)
+
+def measure_loudness(path):
+    """First loudnorm pass: returns input_i/input_tp/input_lra/input_thresh/target_offset for path."""
+    key = f"{file_sha1(path)}:{TARGET_LUFS}:{TARGET_TRUE_PEAK}:{TARGET_LRA}"
+    with _loudness_lock:
+        cached = load_loudness_cache().get(key)
+    if cached:
+        return cached
+    # Measured outside the lock: one ffmpeg pass over the whole file.
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-nostats', '-i', path,
+        '-af', f"loudnorm=I={TARGET_LUFS}:TP={TARGET_TRUE_PEAK}:LRA={TARGET_LRA}:print_format=json",
+        '-f', 'null', '-'
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    match = _LOUDNORM_JSON_RE.search(result.stderr.decode('utf-8', 'ignore'))
+    if not match:
+        raise RuntimeError(f"loudnorm produced no measurements for {path}")
+    stats = json.loads(match.group(0))
+    measured = {k: stats[k] for k in ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')}
+    with _loudness_lock:
+        cache = load_loudness_cache()
+        cache[key] = measured
+        save_loudness_cache(cache)
+    return measured
+
+def loudnorm_filter(path):
+    """Second-pass loudnorm filter for path, using its cached first-pass measurements."""
+    m = measure_loudness(path)
+    return (
+        f"loudnorm=I={TARGET_LUFS}:TP={TARGET_TRUE_PEAK}:LRA={TARGET_LRA}"
+        f":measured_I={m['input_i']}:measured_TP={m['input_tp']}:measured_LRA={m['input_lra']}"
+        f":measured_thresh={m['input_thresh']}:offset={m['target_offset']}:linear=true"
+    )
+
+def pick_music_bed(seed=None):
+    """A local song to put under a voiceover; the same seed always picks the same song."""
+    songs = sorted(glob.glob('downloaded_songs/*.mp3'))
+    if not songs:
+        return None
+    return random.Random(seed).choice(songs) if seed is not None else random.choice(songs)
+
+def build_audio_track(output_path, duration, voice_path=None, music_path=None):
+    """
+    Renders the final soundtrack in a single ffmpeg graph: each source is loudness-normalized
+    (two-pass loudnorm), music is looped and trimmed to `duration`, a voiceover (if any) ducks
+    the music through sidechaincompress, and the mix gets fade in/out. Writes AAC to output_path
+    so the video writer can mux it without re-encoding or decoding it in Python.
+    """
+    if not voice_path and not music_path:
+        raise ValueError("build_audio_track needs a voice or a music source.")
+    fade_out_start = max(0.0, duration - FADE_OUT_SECONDS)
+    inputs, chains = [], []
+    if music_path:
+        inputs += ['-stream_loop', '-1', '-i', music_path]
+        music_gain = f",volume={MUSIC_BED_GAIN_DB}dB" if voice_path else ''
+        chains.append(f"[0:a]{loudnorm_filter(music_path)}{music_gain},aresample={AUDIO_SAMPLE_RATE},atrim=0:{duration:.3f}[music]")
+    if voice_path:
+        index = 1 if music_path else 0
+        inputs += ['-i', voice_path]
+        chains.append(f"[{index}:a]{loudnorm_filter(voice_path)},aresample={AUDIO_SAMPLE_RATE},apad,atrim=0:{duration:.3f}[voice]")
+
+    if music_path and voice_path:
+        chains.append("[voice]asplit=2[voice_sc][voice_mix]")
+        chains.append("[music][voice_sc]sidechaincompress=threshold=0.03:ratio=8:attack=20:release=400[ducked]")
+        chains.append("[ducked][voice_mix]amix=inputs=2:duration=first:normalize=0[mixed]")
+        last = 'mixed'
+    else:
+        last = 'music' if music_path else 'voice'
+    chains.append(
+        f"[{last}]afade=t=in:st=0:d={FADE_IN_SECONDS},"
+        f"afade=t=out:st={fade_out_start:.3f}:d={FADE_OUT_SECONDS}[out]"
+    )
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error'] + inputs + [
+            '-filter_complex', ';'.join(chains), '-map', '[out]',
+            '-t', f"{duration:.3f}", '-c:a', 'aac', '-b:a', '192k', '-ar', str(AUDIO_SAMPLE_RATE),
+            output_path
+        ],
+        check=True
+    )
+    print(f"[AUDIO] Built {duration:.1f}s normalized soundtrack: {output_path}")
+    return output_path
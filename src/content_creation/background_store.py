@@ -0,0 +1,138 @@
+import os
+import time
+import random
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from src.content_creation.media_cache import CACHE_PROFILES
+from src.utils.rate_limiter import guarded_call
+from src.utils.json_files import load_json, save_json
+
+# Scene background photos per location, each with pre-resized copies for every render geometry.
+BACKGROUND_STORE_DIR = 'backgrounds'
+BACKGROUND_INDEX_FILE = 'index.json'
+BACKGROUND_CANDIDATES = int(os.getenv('BACKGROUND_CANDIDATES', '5'))
+# Searches are repeated at most this often; image files are revalidated with ETag/Last-Modified.
+BACKGROUND_REFRESH_SECONDS = float(os.getenv('BACKGROUND_REFRESH_DAYS', '7')) * 86400
+BACKGROUND_FETCH_WORKERS = 6
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def index_path(store_dir=BACKGROUND_STORE_DIR):
+    return os.path.join(store_dir, BACKGROUND_INDEX_FILE)
+
+def load_index(store_dir=BACKGROUND_STORE_DIR):
+    return load_json(index_path(store_dir))
+
+def save_index(index, store_dir=BACKGROUND_STORE_DIR):
+    # Atomic, so a scene render reading the index never sees it half-written.
+    save_json(index_path(store_dir), index, indent=2)
+
+def fetch_image(candidate):
+    """
+    Downloads candidate['url'] to candidate['path'], streaming to disk. If the file is already there
+    the request is conditional, and a 304 keeps the local copy. Returns True if the file changed.
+    """
+    headers = {}
+    if os.path.exists(candidate['path']):
+        if candidate.get('etag'):
+            headers['If-None-Match'] = candidate['etag']
+        if candidate.get('last_modified'):
+            headers['If-Modified-Since'] = candidate['last_modified']
+    with requests.get(candidate['url'], headers=headers, stream=True, timeout=60) as r:
+        if r.status_code == 304:
+            return False
+        r.raise_for_status()
+        partial_path = candidate['path'] + '.part'
+        with open(partial_path, 'wb') as f:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(partial_path, candidate['path'])
+        candidate['etag'] = r.headers.get('ETag')
+        candidate['last_modified'] = r.headers.get('Last-Modified')
+    return True
+
+def resize_variants(candidate):
+    """Writes a scaled-and-cropped copy of the image for every render geometry."""
+    base = os.path.splitext(candidate['path'])[0]
+    variants = {}
+    for aspect_ratio, profile in CACHE_PROFILES.items():
+        width, height = profile['width'], profile['height']
+        variant_path = f"{base}_{aspect_ratio}.jpg"
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-i', candidate['path'],
+            '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}",
+            '-q:v', '2', variant_path
+        ], check=True)
+        variants[aspect_ratio] = variant_path
+    candidate['variants'] = variants
+
+def sync_candidate(candidate):
+    changed = fetch_image(candidate)
+    variants = candidate.get('variants') or {}
+    if changed or not all(os.path.exists(p) for p in variants.values()) or set(variants) != set(CACHE_PROFILES):
+        resize_variants(candidate)
+    return candidate
+
+def search_location(location, query, api_key, store_dir):
+    url = f'https://api.pexels.com/v1/search?query={query}&per_page={BACKGROUND_CANDIDATES}&orientation=landscape'
+    r = guarded_call('pexels', requests.get, url, headers={'Authorization': api_key}, timeout=30)
+    r.raise_for_status()
+    return [{
+        'id': photo['id'],
+        'url': photo['src'].get('large2x') or photo['src']['large'],
+        'path': os.path.join(store_dir, location, f"{photo['id']}.jpg"),
+    } for photo in r.json().get('photos', [])]
+
+def sync_backgrounds(queries, api_key, store_dir=BACKGROUND_STORE_DIR, force_search=False):
+    """
+    Brings the store up to date for every location in queries ({location: search query}).
+    Searches only run when a location's candidates are older than BACKGROUND_REFRESH_SECONDS;
+    all image downloads and resizes run concurrently. Returns the index.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    index = load_index(store_dir)
+    now = time.time()
+    for location, query in queries.items():
+        entry = index.get(location, {})
+        if not force_search and entry.get('candidates') and now - entry.get('searched_at', 0) < BACKGROUND_REFRESH_SECONDS:
+            continue
+        os.makedirs(os.path.join(store_dir, location), exist_ok=True)
+        try:
+            found = search_location(location, query, api_key, store_dir)
+        except Exception as e:
+            print(f"[BACKGROUNDS] Search failed for {location}, keeping cached candidates: {e}")
+            continue
+        known = {c['id']: c for c in entry.get('candidates', [])}
+        # Keep validators and variants for photos we already have.
+        index[location] = {
+            'query': query,
+            'searched_at': now,
+            'candidates': [dict(known.get(c['id'], {}), **c) for c in found] or entry.get('candidates', []),
+        }
+
+    candidates = [c for location in queries for c in index.get(location, {}).get('candidates', [])]
+    with ThreadPoolExecutor(max_workers=BACKGROUND_FETCH_WORKERS) as pool:
+        futures = [(c, pool.submit(sync_candidate, c)) for c in candidates]
+        for candidate, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[BACKGROUNDS] Failed to fetch {candidate['url']}: {e}")
+    save_index(index, store_dir)
+    ready = sum(1 for c in candidates if os.path.exists(c['path']))
+    print(f"[BACKGROUNDS] {ready}/{len(candidates)} background images ready for {len(queries)} locations")
+    return index
+
+def background_for(location, aspect_ratio=None, choice=None, store_dir=BACKGROUND_STORE_DIR):
+    """
+    Local lookup of a background image for location: the pre-resized variant for aspect_ratio,
+    or the original photo. `choice` picks a specific candidate; by default one is picked at random.
+    Returns None if the store has nothing for the location.
+    """
+    candidates = [c for c in load_index(store_dir).get(location, {}).get('candidates', []) if os.path.exists(c['path'])]
+    if not candidates:
+        return None
+    candidate = candidates[choice % len(candidates)] if choice is not None else random.choice(candidates)
+    variant = (candidate.get('variants') or {}).get(aspect_ratio) if aspect_ratio else None
+    return variant if variant and os.path.exists(variant) else candidate['path']
@@ -1,37 +1,86 @@
 import os
 import shutil
 import asyncio
+import functools
+import aiohttp
 import requests
 import textwrap
 import random
 import time
+import threading
 import json
 import re
 from moviepy.editor import (
     VideoFileClip, AudioFileClip, CompositeVideoClip, CompositeAudioClip,
     concatenate_videoclips, TextClip, ImageClip
 )
-import moviepy.audio.fx.all as afx
-from src.content_creation.script_generator import generate_script, parse_script_to_dialogues
-from src.content_creation.voice_generator import generate_realistic_voice, generate_multi_voice
+from src.content_creation.script_generator import generate_script, parse_script_to_dialogues, spoken_text
+from src.content_creation.voice_generator import generate_realistic_voice, generate_multi_voice, expected_backend
+from src.content_creation.duration_model import fit_script, fit_tempo, probe_duration
+from src.content_creation.audio_stage import build_audio_track, pick_music_bed, VOICE_MUSIC_BED, TARGET_LUFS, TARGET_TRUE_PEAK, TARGET_LRA
+from src.content_creation.media_cache import lookup_cached_background, normalize_background, cached_shots, pin_background, unpin_background
+from src.content_creation.shot_index import pick_segment
+from src.content_creation.encode_planner import plan_encode, render_slot, ENCODE_CRF, RENDER_FPS
+from src.content_creation.workspace import create_temp_dir, remove_temp_dir
+from src.content_creation.thumbnails import generate_thumbnail
+from src.content_creation.stream_render import render_streaming
+from src.content_creation.subtitles import prepare_subtitles, subtitle_filter, BURN_SUBTITLES, SUBTITLE_FONT
+from src.content_creation.run_ledger import ReelRun, content_hash
+from src.content_creation.background_store import sync_backgrounds, background_for
+from src.content_creation.jamendo import get_client as jamendo_client
+from src.content_creation.song_index import get_index as song_index
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import urllib.request
 import hashlib
 import glob
 import subprocess
+from src.utils.rate_limiter import guarded_call, async_guarded_call, is_available
+from src.utils.json_files import load_json, save_json
 
-# Subtitle creation is temporarily removed to prevent ImageMagick errors.
-# def create_subtitle_clips(script, video_duration, video_size):
-#     ...
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking call (TTS SDKs, ffmpeg, MoviePy, file hashing) on the default executor."""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def fetch_json(provider, url, headers=None, timeout=30):
+    """GETs url under the provider's rate limit and returns the decoded JSON body, without blocking the loop."""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        response = await async_guarded_call(provider, session.get, url, headers=headers)
+        async with response:
+            response.raise_for_status()
+            return await response.json()
 
 async def download_media(url, path):
     """Asynchronously downloads a file."""
-    with requests.get(url, stream=True) as r:
-        r.raise_for_status()
-        with open(path, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=60)) as session:
+        async with session.get(url) as r:
+            r.raise_for_status()
+            with open(path, 'wb') as f:
+                async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+async def fetch_background(video_url, video_path, aspect_ratio):
+    """
+    Returns a background clip normalized to the render geometry for aspect_ratio.
+    Reuses the mezzanine cache when this URL was normalized before; otherwise downloads it.
+    Falls back to the raw download if normalization fails.
+    """
+    try:
+        cached_path = await run_blocking(lookup_cached_background, video_url, aspect_ratio)
+    except Exception as e:
+        print(f"[MEDIA CACHE] Lookup failed, downloading instead: {e}")
+        cached_path = None
+    if cached_path:
+        print(f"[MEDIA CACHE] Reusing normalized background for {video_url}")
+        return cached_path
+    await download_media(video_url, video_path)
+    try:
+        return await run_blocking(normalize_background, video_path, aspect_ratio, source_url=video_url)
+    except Exception as e:
+        print(f"[MEDIA CACHE] Normalization failed, using raw download: {e}")
+        return video_path
 
 # Persistent storage for used (topic, video_url, song_url) combinations
 USED_COMBINATIONS_FILE = 'used_reel_combinations.json'
@@ -105,45 +154,13 @@ VIDEO_QUERIES = {
     'haryanvi': ['haryanvi village', 'haryanvi dance', 'haryanvi festival', 'haryanvi wedding'],
 }
 
-# Jamendo API credentials (register for your own client_id at https://developer.jamendo.com/v3.0)
-JAMENDO_CLIENT_ID = os.getenv('JAMENDO_CLIENT_ID', 'demo_client_id')
-
-# Map language to Jamendo tags/genres
-JAMENDO_LANG_TAGS = {
-    'english': 'english',
-    'punjabi': 'punjabi',
-    'hindi': 'hindi',
-    'haryanvi': 'haryanvi',
-}
-
-def fetch_jamendo_song(language):
-    """
-    Fetch a trending song from Jamendo for the given language.
-    Returns a direct MP3 URL or None if not found.
-    """
-    tag = JAMENDO_LANG_TAGS.get(language, 'english')
-    url = f"https://api.jamendo.com/v3.0/tracks/?client_id={JAMENDO_CLIENT_ID}&format=json&limit=10&tags={tag}&audioformat=mp32&order=popularity_total"
-    try:
-        resp = requests.get(url)
-        data = resp.json()
-        tracks = data.get('results', [])
-        for track in tracks:
-            audio_url = track.get('audio')
-            if audio_url:
-                return audio_url
-    except Exception as e:
-        print(f"[Jamendo] Error fetching song for {language}: {e}")
-    return None
-
 # Helper to get the next unique (topic, video_url, song_url) for a non-voice reel
 async def get_next_unique_combo(topic, used_combinations, lang, output_dir):
     api_key = os.getenv("PEXELS_API_KEY")
     for video_query in VIDEO_QUERIES[lang]:
         # Search Pexels for a video
         search_url = f"https://api.pexels.com/videos/search?query={video_query}&per_page=5&orientation=portrait"
-        response = requests.get(search_url, headers={'Authorization': api_key})
-        response.raise_for_status()
-        videos_json = response.json().get('videos', [])
+        videos_json = (await fetch_json('pexels', search_url, headers={'Authorization': api_key})).get('videos', [])
         for video_data in videos_json:
             video_url = next((f['link'] for f in video_data['video_files'] if f['quality'] == 'hd'), video_data['video_files'][0]['link'])
             for song_url in TRENDING_SONG_CLIPS[lang]:
@@ -168,25 +185,57 @@ def sanitize_filename(name):
 USED_VIDEOS_FILE = 'used_videos_global.json'
 USED_COMBOS_FILE = 'used_video_song_combos_global.json'
 
+# Backgrounds are claimed from the cycle's event loop and from the prefetcher's thread (its own
+# asyncio.run); every load-check-save of the files above happens under this lock.
+_claims_lock = threading.Lock()
+
 def load_used_videos():
-    if os.path.exists(USED_VIDEOS_FILE):
-        with open(USED_VIDEOS_FILE, 'r') as f:
-            return set(json.load(f))
-    return set()
+    return set(load_json(USED_VIDEOS_FILE, []))
 
 def save_used_videos(used_videos):
-    with open(USED_VIDEOS_FILE, 'w') as f:
-        json.dump(list(used_videos), f)
+    save_json(USED_VIDEOS_FILE, list(used_videos))
 
 def load_used_combos():
-    if os.path.exists(USED_COMBOS_FILE):
-        with open(USED_COMBOS_FILE, 'r') as f:
-            return set(tuple(x) for x in json.load(f))
-    return set()
+    return set(tuple(x) for x in load_json(USED_COMBOS_FILE, []))
 
 def save_used_combos(used_combos):
-    with open(USED_COMBOS_FILE, 'w') as f:
-        json.dump([list(x) for x in used_combos], f)
+    save_json(USED_COMBOS_FILE, [list(x) for x in used_combos])
+
+def claim_voice_video(topic, video_urls):
+    """
+    Records and returns the first of video_urls not yet used for a voice reel on topic.
+    When all were used, the tracking is reset and the first one is taken.
+    """
+    with _claims_lock:
+        used_combos = load_used_combos()
+        video_url = next((url for url in video_urls if (topic, url, 'voice') not in used_combos), None)
+        if video_url is None:
+            used_combos.clear()
+            video_url = video_urls[0]
+        used_combos.add((topic, video_url, 'voice'))
+        save_used_combos(used_combos)
+        return video_url
+
+def claim_music_video(song_url, video_urls):
+    """
+    Records and returns the first of video_urls never used before and never with song_url.
+    When all were used, the global tracking is reset and the first one is taken.
+    """
+    with _claims_lock:
+        used_videos = load_used_videos()
+        used_combos = load_used_combos()
+        video_url = next((url for url in video_urls
+                          if url not in used_videos and (url, song_url) not in used_combos), None)
+        if video_url is None:
+            print("[RESET] All unique (video, song) pairs exhausted. Resetting global tracking.")
+            used_videos.clear()
+            used_combos.clear()
+            video_url = video_urls[0]
+        used_videos.add(video_url)
+        used_combos.add((video_url, song_url))
+        save_used_videos(used_videos)
+        save_used_combos(used_combos)
+        return video_url
 
 # Spotify API helper
 sp = None
@@ -228,12 +277,12 @@ def fetch_spotify_artist_top_preview():
     random.shuffle(SPOTIFY_ARTISTS)
     for artist_name in SPOTIFY_ARTISTS:
         try:
-            results = sp.search(q=f'artist:{artist_name}', type='artist', limit=1)
+            results = guarded_call('spotify', sp.search, q=f'artist:{artist_name}', type='artist', limit=1)
             items = results['artists']['items']
             if not items:
                 continue
             artist_id = items[0]['id']
-            top_tracks = sp.artist_top_tracks(artist_id)
+            top_tracks = guarded_call('spotify', sp.artist_top_tracks, artist_id)
             tracks = top_tracks['tracks']
             random.shuffle(tracks)
             for track in tracks:
@@ -247,251 +296,457 @@ def fetch_spotify_artist_top_preview():
             print(f"[Spotify] Error fetching top tracks for {artist_name}: {e}")
     return None, None, None
 
-async def create_video(topic: str, duration: int, aspect_ratio: str, output_dir: str = ".", music_url: str = None, reel_index: int = 0, voice_reel: bool = False, use_spotify: bool = True):
+def prepare_voiceover(topic, duration, work_dir, script=None):
+    """
+    Generates the script for `topic` (unless one is given) and synthesizes its voiceover
+    into work_dir. The script is trimmed to the predicted speech length before TTS and the
+    audio is time-stretched afterwards so it lands within 5% of `duration`.
+    Returns (script, audio_path).
+    """
+    audio_path = os.path.join(work_dir, "voiceover.mp3")
+    if script is None:
+        script = generate_script(topic, duration)
+    script = fit_script(script, duration, *expected_backend())
+    backend, voice = generate_realistic_voice(script, audio_path)
+    for _ in range(10):
+        if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+            break
+        time.sleep(0.5)
+    else:
+        raise FileNotFoundError(f"Audio file was not created or is empty: {audio_path}")
+    try:
+        fit_tempo(audio_path, script, backend, voice, duration)
+    except Exception as e:
+        print(f"[DURATION] Could not calibrate voiceover length: {e}")
+    return script, audio_path
+
+def pick_pexels_video_url(video_data):
+    return next((f['link'] for f in video_data['video_files'] if f['quality'] == 'hd'), video_data['video_files'][0]['link'])
+
+async def pick_voice_background(topic, aspect_ratio, work_dir):
+    """Finds and fetches a Pexels video on `topic` that was not used for this topic before."""
+    api_key = os.getenv("PEXELS_API_KEY")
+    orientation = 'landscape' if aspect_ratio == 'landscape' else 'portrait'
+    search_url = f"https://api.pexels.com/videos/search?query={topic}&per_page=5&orientation={orientation}"
+    videos_json = (await fetch_json('pexels', search_url, headers={'Authorization': api_key})).get('videos', [])
+    if not videos_json:
+        raise ValueError(f"No Pexels videos found for '{topic}'.")
+    candidates = {pick_pexels_video_url(video_data): video_data for video_data in videos_json}
+    video_url = claim_voice_video(topic, list(candidates))
+    video_path = os.path.join(work_dir, f"voice_{topic.replace(' ','_')}_{candidates[video_url]['id']}.mp4")
+    return await fetch_background(video_url, video_path, aspect_ratio)
+
+# Music reels use a clip of this length, starting this far into the song.
+SONG_CLIP_START = 20
+SONG_CLIP_SECONDS = 30
+
+def clip_song(source, work_dir):
+    """Cuts the SONG_CLIP_SECONDS clip used by a music reel out of a full song; returns its path or None."""
+    audio_path = os.path.join(work_dir, "song.mp3")
+    try:
+        subprocess.run([
+            'ffmpeg', '-y', '-ss', str(SONG_CLIP_START), '-t', str(SONG_CLIP_SECONDS), '-i', source,
+            '-acodec', 'libmp3lame', audio_path
+        ], check=True)
+    except Exception as e:
+        print(f"[FALLBACK ERROR] Failed to extract middle clip: {e}")
+        return None
+    return audio_path
+
+def extract_local_song(work_dir):
+    """
+    Cuts a 30s clip (starting at 20s) from a random MP3 in downloaded_songs/.
+    Returns (audio_path, song_url, song_title, song_artist) or None.
+    """
+    fallback_mp3s = glob.glob('downloaded_songs/*.mp3')
+    if not fallback_mp3s:
+        print("[FALLBACK ERROR] No fallback MP3s found in downloaded_songs/. Skipping this music reel.")
+        return None
+    fallback_song = random.choice(fallback_mp3s)
+    print(f"[FALLBACK] Using local fallback song: {fallback_song}")
+    # Use ffmpeg to extract a 30s clip starting at 20s
+    audio_path = clip_song(fallback_song, work_dir)
+    if not audio_path:
+        return None
+    song = song_index().sync_if_stale().lookup(fallback_song) or {}
+    song_title = song.get('title') or os.path.splitext(os.path.basename(fallback_song))[0]
+    return audio_path, fallback_song, song_title, song.get('artist') or "Fallback"
+
+def extract_jamendo_song(lang, work_dir):
+    """
+    Clips a song picked from the cached Jamendo catalogue for lang. The catalogue is only
+    refreshed from the API once per TTL and each track is downloaded once, so a reel
+    normally makes no Jamendo requests. Returns (audio_path, song_url, song_title, song_artist) or None.
+    """
+    if not is_available('jamendo'):
+        return None
+    client = jamendo_client()
+    track = client.pick_track(lang or 'english', min_duration=SONG_CLIP_START + SONG_CLIP_SECONDS)
+    if not track:
+        return None
+    try:
+        source = client.download(track)
+    except Exception as e:
+        print(f"[Jamendo] Could not download '{track['title']}': {e}")
+        return None
+    song_index().register(source, source_url=track['audio'], title=track['title'], artist=track['artist'])
+    audio_path = clip_song(source, work_dir)
+    if not audio_path:
+        return None
+    print(f"[Jamendo] Selected: {track['title']} by {track['artist']} ({track['license']})")
+    return audio_path, track['audio'], track['title'], track['artist']
+
+def resolve_song(use_spotify, work_dir, lang=None):
+    """
+    Picks the music for a reel: a Spotify preview when use_spotify is set, then (or when Spotify
+    has nothing) a Jamendo track in lang, otherwise a local song.
+    Returns (audio_path, song_url, song_title, song_artist) or None.
+    """
+    if not use_spotify:
+        # Always use a local fallback MP3 from downloaded_songs/
+        return extract_local_song(work_dir)
+    if not is_available('spotify'):
+        print("[Spotify] Circuit is open after repeated failures. Trying Jamendo.")
+        return extract_jamendo_song(lang, work_dir) or extract_local_song(work_dir)
+    # --- Use Spotify API for top artist track ---
+    song_title, song_artist, preview_url = fetch_spotify_artist_top_preview()
+    if not song_title or not song_artist or not preview_url:
+        print("[ERROR] Could not fetch a Spotify preview. Trying Jamendo.")
+        return extract_jamendo_song(lang, work_dir) or extract_local_song(work_dir)
+    audio_path = os.path.join(work_dir, "song.mp3")
+    song_url = preview_url
+    print(f"[Spotify] Downloading preview audio: {song_url}")
+    try:
+        resp = requests.get(song_url, stream=True)
+        resp.raise_for_status()
+        with open(audio_path, 'wb') as f:
+            for chunk in resp.iter_content(chunk_size=8192):
+                f.write(chunk)
+        size = os.path.getsize(audio_path)
+        print(f"[Spotify] Preview audio downloaded: {audio_path} ({size} bytes)")
+        if size < 1000:
+            print(f"[Spotify] Downloaded file too small, not using: {audio_path}")
+            raise Exception("Downloaded preview is too small.")
+        # Save a copy in downloaded_songs
+        os.makedirs('downloaded_songs', exist_ok=True)
+        song_filename = f"{song_title or 'song'}_{song_artist or 'artist'}.mp3".replace(' ', '_')
+        song_save_path = os.path.join('downloaded_songs', song_filename)
+        shutil.copy(audio_path, song_save_path)
+        song_index().register(song_save_path, source_url=song_url, title=song_title, artist=song_artist)
+    except Exception as e:
+        print(f"[ERROR] Failed to download Spotify preview audio: {e}. Skipping this music reel.")
+        return None
+    return audio_path, song_url, song_title, song_artist
+
+async def pick_music_background(lang, reel_index, song_url, aspect_ratio, work_dir):
+    """Finds and fetches a Pexels video never used before, and never with this song."""
+    api_key = os.getenv("PEXELS_API_KEY")
+    # Search Pexels for a matching video, ensuring global uniqueness
+    video_query = VIDEO_QUERIES[lang][reel_index % len(VIDEO_QUERIES[lang])]
+    search_url = f"https://api.pexels.com/videos/search?query={video_query}&per_page=15&orientation=portrait"
+    videos_json = (await fetch_json('pexels', search_url, headers={'Authorization': api_key})).get('videos', [])
+    if not videos_json:
+        raise ValueError(f"No Pexels videos found for '{video_query}'.")
+    candidates = {pick_pexels_video_url(video_data): video_data for video_data in videos_json}
+    video_url = claim_music_video(song_url, list(candidates))
+    print(f"[INFO] Using unique video: {video_url}")
+    video_path = os.path.join(work_dir, f"{lang}_{video_query.replace(' ','_')}_{candidates[video_url]['id']}.mp4")
+    return await fetch_background(video_url, video_path, aspect_ratio)
+
+def final_video_path_for(output_dir, topic, aspect_ratio, kind):
+    """Where create_video writes its result; kind is 'voice' or '<lang>_music'."""
+    return os.path.join(output_dir, f"{sanitize_filename(topic)}_{aspect_ratio}_{kind}.mp4")
+
+def make_thumbnail(background_path, video_path, aspect_ratio, duration, start=0.0):
+    """Saves a poster frame for video_path; a failure here never fails the render."""
+    try:
+        # Same segment the render used, so the poster shows footage that is actually in the reel.
+        return generate_thumbnail(background_path, video_path, aspect_ratio, max_time=duration, start=start)
+    except Exception as e:
+        print(f"[THUMBNAIL] Skipped thumbnail for {video_path}: {e}")
+        return None
+
+def mix_soundtrack(work_dir, video_duration, voice_path=None, music_path=None):
+    """
+    Builds the normalized soundtrack with ffmpeg. The reel runs for the shorter of the background
+    and the lead audio (voice if present, else the song). Returns (soundtrack_path, duration).
+    """
+    lead = voice_path or music_path
+    duration = min(video_duration, probe_duration(lead))
+    soundtrack = build_audio_track(os.path.join(work_dir, 'soundtrack.m4a'), duration, voice_path, music_path)
+    return soundtrack, duration
+
+def reel_subtitles(script, voice_path, work_dir, aspect_ratio, final_duration):
+    """ASS captions for a narrated reel, timed against the voiceover; None for music reels or on failure."""
+    if not (script and voice_path):
+        return None
+    try:
+        return prepare_subtitles(script, probe_duration(voice_path), work_dir, aspect_ratio, final_duration)
+    except Exception as e:
+        print(f"[SUBTITLES] Rendering without captions: {e}")
+        return None
+
+def background_start(video_path, background_hash, lead_path, max_duration=None):
+    """
+    Where in the background the reel starts: the best segment of the reel's length (the shortest
+    of background, lead audio and max_duration) from the shot index stored with the cached clip,
+    so fades, logo slates and dead footage are skipped. 0 for clips without an index.
+    Part of the render stage's inputs, so a rebuild cuts the same segment.
+    """
+    length = min(probe_duration(video_path), probe_duration(lead_path), max_duration or float('inf'))
+    start = pick_segment(cached_shots(background_hash), length)
+    if start:
+        print(f"[SHOTS] Using {length:.0f}s of background from {start:.1f}s")
+    return start
+
+def render_reel(video_paths, final_video_path, aspect_ratio, work_dir, max_duration=None, voice_path=None, music_path=None, fragmented=False, streaming=False, script=None, start=0.0):
+    """
+    Mixes the soundtrack and encodes the reel; returns its duration.
+    When the narration `script` is given, captions are burned in during the same encode.
+    `streaming` hands frames and audio straight to one memory-capped ffmpeg process instead of
+    compositing in MoviePy, which keeps long landscape renders at a flat memory footprint.
+    The background is read from `start` seconds (see background_start) rather than from frame 0.
+    """
+    video_paths = [vp for vp in video_paths if os.path.exists(vp)]
+    if streaming:
+        video_duration = sum(probe_duration(vp) for vp in video_paths)
+        soundtrack, final_duration = mix_soundtrack(work_dir, min(video_duration, max_duration or video_duration), voice_path, music_path)
+        subtitles = reel_subtitles(script, voice_path, work_dir, aspect_ratio, final_duration)
+        with render_slot() as queue_depth:
+            encode_settings = plan_encode(final_duration, aspect_ratio, queue_depth, fragmented)
+            render_streaming(video_paths, soundtrack, final_video_path, final_duration, encode_settings, work_dir, subtitles, start=start)
+        return final_duration
+
+    video_clips_handles = [VideoFileClip(vp) for vp in video_paths]
+    try:
+        with concatenate_videoclips(video_clips_handles, method="compose") as background_video:
+            soundtrack, final_duration = mix_soundtrack(work_dir, min(background_video.duration, max_duration or background_video.duration), voice_path, music_path)
+            final_clip = background_video.subclip(start, start + final_duration) if final_duration < background_video.duration else background_video
+            subtitles = reel_subtitles(script, voice_path, work_dir, aspect_ratio, final_duration)
+            with render_slot() as queue_depth:
+                encode_settings = plan_encode(final_clip.duration, aspect_ratio, queue_depth, fragmented)
+                if subtitles:
+                    # libass runs inside the writer's ffmpeg on the piped frames; no per-frame TextClip compositing.
+                    encode_settings['ffmpeg_params'] = encode_settings['ffmpeg_params'] + ['-vf', subtitle_filter(subtitles)]
+                final_clip.write_videofile(
+                    final_video_path,
+                    codec='libx264',
+                    audio=soundtrack,
+                    logger='bar',
+                    fps=RENDER_FPS,
+                    **encode_settings
+                )
+        return final_duration
+    finally:
+        for clip in video_clips_handles:
+            try:
+                clip.close()
+            except Exception:
+                pass
+
+def music_reel_language(reel_index):
+    langs = ['english', 'punjabi', 'hindi']
+    return langs[reel_index % len(langs)]
+
+def render_settings(streaming=False, fragmented=False):
+    """Everything besides the media inputs that changes the rendered file; part of the render stage's ledger inputs."""
+    return {
+        'crf': ENCODE_CRF, 'fps': RENDER_FPS,
+        'loudness': [TARGET_LUFS, TARGET_TRUE_PEAK, TARGET_LRA],
+        'subtitles': BURN_SUBTITLES, 'subtitle_font': SUBTITLE_FONT,
+        'streaming': streaming, 'fragmented': fragmented,
+    }
+
+async def create_video(topic: str, duration: int, aspect_ratio: str, output_dir: str = ".", music_url: str = None, reel_index: int = 0, voice_reel: bool = False, use_spotify: bool = True, prefetched: dict = None, fragmented: bool = False, streaming: bool = False, ledger: ReelRun = None):
     """
     For non-voice reels: Use a trending song clip and a unique video (never repeat combination).
     For every 5th reel (voice_reel=True): Use the current voiceover logic and a unique video on the topic.
+    `prefetched` holds inputs already produced by the cycle prefetcher (script, audio_path,
+    video_path, song_url, lang); stages with a prefetched result are skipped.
+    `fragmented` writes a fragmented MP4 that can be uploaded while it is being encoded;
+    otherwise the output is a fast-start MP4.
+    `streaming` renders through a single memory-capped ffmpeg process (see render_reel).
+    Network I/O is async and blocking work (script, TTS, ffmpeg, the render) runs on executor
+    threads, so several create_video calls can run side by side under asyncio.gather.
+    Every stage is recorded in the run ledger; pass a replaying `ledger` to rebuild a reel,
+    re-running only the stages whose inputs changed.
     """
     api_key = os.getenv("PEXELS_API_KEY")
     if not api_key:
         raise ValueError("PEXELS_API_KEY environment variable not set.")
+    prefetched = prefetched or {}
+    call_args = {
+        'topic': topic, 'duration': duration, 'aspect_ratio': aspect_ratio, 'output_dir': output_dir,
+        'reel_index': reel_index, 'voice_reel': voice_reel, 'use_spotify': use_spotify,
+        'fragmented': fragmented, 'streaming': streaming,
+    }
     # Sanitize topic for temp_dir
     safe_topic = sanitize_filename(topic)
-    temp_dir = os.path.join(output_dir, f"temp_{safe_topic}_{random.randint(1000, 9999)}")
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    video_clips_handles = []
-    created_successfully = False
-    
-    # Load used combinations
-    used_videos = load_used_videos()
-    used_combos = load_used_combos()
-    
+    temp_dir = create_temp_dir(output_dir, f"temp_{safe_topic}")
+    # Backgrounds this reel renders from; pinned so a concurrent reel cannot evict them mid-render.
+    pinned = []
+
     try:
         if voice_reel:
             # --- Voice Reel: Generate script and voiceover, use unique video on topic ---
-            print(f"\n1. Generating {int(duration/60)} min script for '{topic}' (voice reel)...")
-            audio_path = os.path.join(temp_dir, "voiceover.mp3")
-            script = generate_script(topic, duration)
-            generate_realistic_voice(script, audio_path)
-            for _ in range(10):
-                if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
-                    break
-                time.sleep(0.5)
-            else:
-                raise FileNotFoundError(f"Audio file was not created or is empty: {audio_path}")
-            with AudioFileClip(audio_path) as voiceover_clip:
-                actual_duration = voiceover_clip.duration
-            # Search Pexels for a unique video on the topic
-            search_url = f"https://api.pexels.com/videos/search?query={topic}&per_page=5&orientation=portrait"
-            response = requests.get(search_url, headers={'Authorization': api_key})
-            response.raise_for_status()
-            videos_json = response.json().get('videos', [])
-            for video_data in videos_json:
-                video_url = next((f['link'] for f in video_data['video_files'] if f['quality'] == 'hd'), video_data['video_files'][0]['link'])
-                combo = (topic, video_url, 'voice')
-                if combo not in used_combos:
-                    video_path = os.path.join(temp_dir, f"voice_{topic.replace(' ','_')}_{video_data['id']}.mp4")
-                    await download_media(video_url, video_path)
-                    used_combos.add(combo)
-                    save_used_combos(used_combos)
-                    break
-            else:
-                # If all combinations used, reset
-                used_combos.clear()
-                save_used_combos(used_combos)
-                return await create_video(topic, duration, aspect_ratio, output_dir, music_url, reel_index, voice_reel, use_spotify)
-            video_paths = [video_path]
+            final_video_path = final_video_path_for(output_dir, topic, aspect_ratio, 'voice')
+            run = ledger or ReelRun(final_video_path)
+            if not run.replay:
+                run.describe('voice', call_args)
+
+            def voiceover():
+                if prefetched.get('audio_path'):
+                    print(f"\n1. Using prefetched voiceover for '{topic}'...")
+                    return {'script': prefetched.get('script'), 'audio': prefetched['audio_path']}
+                print(f"\n1. Generating {int(duration/60)} min script for '{topic}' (voice reel)...")
+                script, audio_path = prepare_voiceover(topic, duration, temp_dir, script=prefetched.get('script'))
+                return {'script': script, 'audio': audio_path}
+
+            async def background():
+                return {'video': prefetched.get('video_path') or await pick_voice_background(topic, aspect_ratio, temp_dir)}
+            # Script/TTS run on a worker thread while the background is searched and downloaded.
+            # Both are awaited to the end before a failure propagates, so neither outlives temp_dir.
+            results = await asyncio.gather(
+                run.astage('voiceover', {'topic': topic, 'duration': duration}, lambda: run_blocking(voiceover), files=('audio',)),
+                run.astage('background', {'topic': topic, 'aspect_ratio': aspect_ratio}, background, files=('video',)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            voice, video_path = results[0], results[1]['video']
+            pin_background(video_path)
+            pinned.append(video_path)
+
             print(f"2. Assembling voice reel with unique video...")
-            video_clips_handles = [VideoFileClip(vp) for vp in video_paths if os.path.exists(vp)]
-            with concatenate_videoclips(video_clips_handles, method="compose") as background_video, \
-                 AudioFileClip(audio_path) as main_audio_clip:
-                looped_audio = afx.audio_loop(main_audio_clip, duration=background_video.duration)
-                background_video.audio = looped_audio
-                if main_audio_clip.duration < background_video.duration:
-                    background_video = background_video.subclip(0, main_audio_clip.duration)
-                final_clip = background_video
-                final_video_path = os.path.join(output_dir, f"{safe_topic}_{aspect_ratio}_voice.mp4")
-                final_clip.write_videofile(
-                    final_video_path,
-                    codec='libx264',
-                    audio_codec='aac',
-                    temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
-                    remove_temp=True,
-                    threads=2,
-                    preset='ultrafast',
-                    logger='bar',
-                    fps=24,
-                    audio_fps=22050
-                )
+            music_bed = pick_music_bed(seed=topic) if VOICE_MUSIC_BED else None
+            background_hash, voice_hash, music_hash = await asyncio.gather(
+                *(run_blocking(content_hash, path) for path in (video_path, voice['audio'], music_bed)))
+
+            start = await run_blocking(background_start, video_path, background_hash, voice['audio'])
+
+            def render():
+                final_duration = render_reel([video_path], final_video_path, aspect_ratio, temp_dir,
+                                             voice_path=voice['audio'], music_path=music_bed,
+                                             fragmented=fragmented, streaming=streaming,
+                                             script=spoken_text(voice['script'], topic), start=start)
+                make_thumbnail(video_path, final_video_path, aspect_ratio, final_duration, start)
+                return {'video': final_video_path, 'duration': final_duration}
+            await run.astage('render', {
+                'background': background_hash, 'voice': voice_hash, 'music': music_hash, 'script': voice['script'],
+                'start': start, 'settings': render_settings(streaming, fragmented),
+            }, lambda: run_blocking(render), files=('video',), store=False)
             print(f"Voice reel created successfully: {final_video_path}")
-            created_successfully = True
             return final_video_path, None
         else:
             # For music reels, always use 30 seconds (Spotify preview duration)
             duration = 30
-            langs = ['english', 'punjabi', 'hindi']
-            lang = langs[reel_index % len(langs)]
-            if not use_spotify:
-                # Always use a local fallback MP3 from downloaded_songs/
-                fallback_mp3s = glob.glob('downloaded_songs/*.mp3')
-                if not fallback_mp3s:
-                    print("[FALLBACK ERROR] No fallback MP3s found in downloaded_songs/. Skipping this music reel.")
-                    return None, None
-                fallback_song = random.choice(fallback_mp3s)
-                print(f"[FALLBACK] Using local fallback song: {fallback_song}")
-                # Use ffmpeg to extract a 30s clip starting at 20s
-                audio_path = os.path.join(temp_dir, "song.mp3")
-                try:
-                    subprocess.run([
-                        'ffmpeg', '-y', '-ss', '20', '-t', '30', '-i', fallback_song, '-acodec', 'libmp3lame', audio_path
-                    ], check=True)
-                except Exception as e:
-                    print(f"[FALLBACK ERROR] Failed to extract middle clip: {e}")
-                    return None, None
-                song_url = fallback_song
-                song_title = os.path.splitext(os.path.basename(fallback_song))[0]
-                song_artist = "Fallback"
-            else:
-                # --- Use Spotify API for top artist track ---
-                song_title, song_artist, preview_url = fetch_spotify_artist_top_preview()
-                if not song_title or not song_artist or not preview_url:
-                    print("[ERROR] Could not fetch a Spotify preview. Using fallback local song.")
-                    # Fallback: use a random local MP3 from downloaded_songs/
-                    fallback_mp3s = glob.glob('downloaded_songs/*.mp3')
-                    if not fallback_mp3s:
-                        print("[FALLBACK ERROR] No fallback MP3s found in downloaded_songs/. Skipping this music reel.")
-                        return None, None
-                    fallback_song = random.choice(fallback_mp3s)
-                    print(f"[FALLBACK] Using local fallback song: {fallback_song}")
-                    # Use ffmpeg to extract a 30s clip starting at 20s
-                    audio_path = os.path.join(temp_dir, "song.mp3")
-                    try:
-                        subprocess.run([
-                            'ffmpeg', '-y', '-ss', '20', '-t', '30', '-i', fallback_song, '-acodec', 'libmp3lame', audio_path
-                        ], check=True)
-                    except Exception as e:
-                        print(f"[FALLBACK ERROR] Failed to extract middle clip: {e}")
-                        return None, None
-                    song_url = fallback_song
-                    song_title = os.path.splitext(os.path.basename(fallback_song))[0]
-                    song_artist = "Fallback"
-                else:
-                    audio_path = os.path.join(temp_dir, "song.mp3")
-                    song_url = preview_url
-                    print(f"[Spotify] Downloading preview audio: {song_url}")
-                    try:
-                        resp = requests.get(song_url, stream=True)
-                        resp.raise_for_status()
-                        with open(audio_path, 'wb') as f:
-                            for chunk in resp.iter_content(chunk_size=8192):
-                                f.write(chunk)
-                        size = os.path.getsize(audio_path)
-                        print(f"[Spotify] Preview audio downloaded: {audio_path} ({size} bytes)")
-                        if size < 1000:
-                            print(f"[Spotify] Downloaded file too small, not using: {audio_path}")
-                            raise Exception("Downloaded preview is too small.")
-                        # Save a copy in downloaded_songs
-                        os.makedirs('downloaded_songs', exist_ok=True)
-                        song_filename = f"{song_title or 'song'}_{song_artist or 'artist'}.mp3".replace(' ', '_')
-                        song_save_path = os.path.join('downloaded_songs', song_filename)
-                        shutil.copy(audio_path, song_save_path)
-                    except Exception as e:
-                        print(f"[ERROR] Failed to download Spotify preview audio: {e}. Skipping this music reel.")
-                        return None, None
-            # Search Pexels for a matching video, ensuring global uniqueness
-            video_query = VIDEO_QUERIES[lang][reel_index % len(VIDEO_QUERIES[lang])]
-            search_url = f"https://api.pexels.com/videos/search?query={video_query}&per_page=15&orientation=portrait"
-            response = requests.get(search_url, headers={'Authorization': api_key})
-            response.raise_for_status()
-            videos_json = response.json().get('videos', [])
-            video_path = None
-            for video_data in videos_json:
-                video_url = next((f['link'] for f in video_data['video_files'] if f['quality'] == 'hd'), video_data['video_files'][0]['link'])
-                combo = (video_url, song_url)
-                if video_url not in used_videos and combo not in used_combos:
-                    video_path = os.path.join(temp_dir, f"{lang}_{video_query.replace(' ','_')}_{video_data['id']}.mp4")
-                    await download_media(video_url, video_path)
-                    used_videos.add(video_url)
-                    used_combos.add(combo)
-                    save_used_videos(used_videos)
-                    save_used_combos(used_combos)
-                    print(f"[INFO] Using unique video: {video_url}")
-                    break
-            if not video_path:
-                # If all videos/combos used, reset and try again
-                print("[RESET] All unique (video, song) pairs exhausted. Resetting global tracking.")
-                used_videos.clear()
-                used_combos.clear()
-                save_used_videos(used_videos)
-                save_used_combos(used_combos)
-                return await create_video(topic, duration, aspect_ratio, output_dir, music_url, reel_index, voice_reel, use_spotify)
-            video_paths = [video_path]
+            lang = prefetched.get('lang') or music_reel_language(reel_index)
+            final_video_path = final_video_path_for(output_dir, topic, aspect_ratio, f"{lang}_music")
+            run = ledger or ReelRun(final_video_path)
+            if not run.replay:
+                run.describe('music', call_args)
+
+            def song_stage():
+                if prefetched.get('audio_path'):
+                    print(f"[PREFETCH] Using prefetched song: {prefetched.get('song_url')}")
+                    return {'audio': prefetched['audio_path'], 'song_url': prefetched.get('song_url')}
+                song = resolve_song(use_spotify, temp_dir, lang)
+                if not song:
+                    raise LookupError("No song available")
+                return {'audio': song[0], 'song_url': song[1]}
+            try:
+                song = await run.astage('song', {'lang': lang, 'use_spotify': use_spotify, 'reel_index': reel_index},
+                                        lambda: run_blocking(song_stage), files=('audio',))
+            except LookupError:
+                return None, None
+            audio_path, song_url = song['audio'], song['song_url']
+
+            async def background():
+                return {'video': prefetched.get('video_path') or await pick_music_background(lang, reel_index, song_url, aspect_ratio, temp_dir)}
+            video_path = (await run.astage('background', {'lang': lang, 'reel_index': reel_index, 'aspect_ratio': aspect_ratio}, background, files=('video',)))['video']
+            pin_background(video_path)
+            pinned.append(video_path)
+
             print(f"2. Assembling music reel with unique video and real song ({lang})...")
-            video_clips_handles = [VideoFileClip(vp) for vp in video_paths if os.path.exists(vp)]
             try:
-                with concatenate_videoclips(video_clips_handles, method="compose") as background_video, \
-                     AudioFileClip(audio_path) as main_audio_clip:
-                    looped_audio = afx.audio_loop(main_audio_clip, duration=background_video.duration)
-                    background_video.audio = looped_audio
-                    if main_audio_clip.duration < background_video.duration:
-                        background_video = background_video.subclip(0, main_audio_clip.duration)
-                    final_clip = background_video
-                    final_video_path = os.path.join(output_dir, f"{safe_topic}_{aspect_ratio}_{lang}_music.mp4")
-                    final_clip.write_videofile(
-                        final_video_path,
-                        codec='libx264',
-                        audio_codec='aac',
-                        temp_audiofile=os.path.join(temp_dir, 'temp-audio.m4a'),
-                        remove_temp=True,
-                        threads=2,
-                        preset='ultrafast',
-                        logger='bar',
-                        fps=24,
-                        audio_fps=22050
-                    )
+                background_hash, music_hash = await asyncio.gather(
+                    run_blocking(content_hash, video_path), run_blocking(content_hash, audio_path))
+                start = await run_blocking(background_start, video_path, background_hash, audio_path, duration)
+
+                def render():
+                    final_duration = render_reel([video_path], final_video_path, aspect_ratio, temp_dir,
+                                                 max_duration=duration, music_path=audio_path,
+                                                 fragmented=fragmented, streaming=streaming, start=start)
+                    make_thumbnail(video_path, final_video_path, aspect_ratio, final_duration, start)
+                    return {'video': final_video_path, 'duration': final_duration}
+                await run.astage('render', {
+                    'background': background_hash, 'music': music_hash,
+                    'max_duration': duration, 'start': start, 'settings': render_settings(streaming, fragmented),
+                }, lambda: run_blocking(render), files=('video',), store=False)
                 print(f"Music reel created successfully: {final_video_path}")
-                created_successfully = True
                 return final_video_path, song_url
             except Exception as e:
                 print(f"[ERROR] Failed to combine video and audio: {e}")
                 raise
     finally:
-        for clip in video_clips_handles:
-            try:
-                clip.close()
-            except Exception:
-                pass
-        if created_successfully and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-            print(f"Cleaned up temporary directory: {temp_dir}")
+        for path in pinned:
+            unpin_background(path)
+        # Raw downloads, voiceover.mp3 and soundtrack.m4a are never needed after this call.
+        await run_blocking(remove_temp_dir, temp_dir)
 
-def generate_blender_script(scene_id, location, characters, audio_files, output_dir):
+def generate_blender_script(scene_id, location, characters, audio_files, output_dir, frame_count=250, fps=24, assets_dir='assets', background_image=None):
     """
     Generate a Blender Python script for a scene.
     - location: e.g., 'Japan', 'India', 'China'
     - characters: list of character names (user must provide .glb/.fbx files)
     - audio_files: list of audio file paths for each character's dialogue
     - output_dir: where to save the .py script
+    - frame_count: scene length in frames; a headless run may render any sub-range of it
+      by passing `-- <frame_start> <frame_end> <output.mp4>` after the script (see scene_renderer)
+    - background_image: photo used as the world backdrop when no environment model is installed
     """
     script_path = os.path.join(output_dir, f"scene_{scene_id:02d}_blender.py")
+    character_models = {c: os.path.abspath(os.path.join(assets_dir, 'characters', f"{c.replace(' ', '_')}.glb")) for c in characters}
+    environment_path = os.path.abspath(os.path.join(assets_dir, 'environments', f"{location}_environment.glb"))
     with open(script_path, 'w', encoding='utf-8') as f:
         f.write(f"""
 import bpy
 import os
-# --- USER: Set these paths to your downloaded assets ---
+import sys
+# --- USER: Put your downloaded assets at these paths ---
 CHARACTER_MODELS = {{
-{chr(10).join([f'    "{c}": r"/path/to/{c}.glb",' for c in characters])}
+{chr(10).join([f'    "{c}": r"{character_models[c]}",' for c in characters])}
 }}
-ENVIRONMENT_PATH = r"/path/to/{location}_environment.glb"  # Download from Sketchfab/PolyHaven
+ENVIRONMENT_PATH = r"{environment_path}"  # Download from Sketchfab/PolyHaven
+BACKGROUND_IMAGE = r"{os.path.abspath(background_image) if background_image else ''}"
 AUDIO_FILES = {audio_files}
-OUTPUT_VIDEO = r"scene_{scene_id:02d}_{location}.mp4"
+
+# --- Frame range and output (overridable from the command line after '--') ---
+ARGS = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+FRAME_START = int(ARGS[0]) if len(ARGS) > 0 else 1
+FRAME_END = int(ARGS[1]) if len(ARGS) > 1 else {frame_count}
+OUTPUT_VIDEO = os.path.abspath(ARGS[2] if len(ARGS) > 2 else r"scene_{scene_id:02d}_{location}.mp4")
 
 # --- Load environment ---
-bpy.ops.import_scene.gltf(filepath=ENVIRONMENT_PATH)
+if os.path.exists(ENVIRONMENT_PATH):
+    bpy.ops.import_scene.gltf(filepath=ENVIRONMENT_PATH)
+elif BACKGROUND_IMAGE and os.path.exists(BACKGROUND_IMAGE):
+    # No environment model: use the location photo as the world backdrop.
+    world = bpy.context.scene.world or bpy.data.worlds.new("World")
+    bpy.context.scene.world = world
+    world.use_nodes = True
+    env_node = world.node_tree.nodes.new('ShaderNodeTexEnvironment')
+    env_node.image = bpy.data.images.load(BACKGROUND_IMAGE)
+    world.node_tree.links.new(env_node.outputs['Color'], world.node_tree.nodes['Background'].inputs['Color'])
+else:
+    print(f"Environment model missing: {{ENVIRONMENT_PATH}}")
 
 # --- Load characters ---
 for char, model_path in CHARACTER_MODELS.items():
+    if not os.path.exists(model_path):
+        print(f"Character model missing: {{model_path}}")
+        continue
     bpy.ops.import_scene.gltf(filepath=model_path)
     # Optionally, position each character
     # bpy.context.selected_objects[0].location = (...)
@@ -505,15 +760,28 @@ for char, model_path in CHARACTER_MODELS.items():
 # bpy.ops.sequencer.sound_strip_add(filepath=AUDIO_FILES[0], ...)
 
 # --- Camera setup (optional) ---
-# bpy.ops.object.camera_add(...)
+scene = bpy.context.scene
+if scene.camera is None:
+    bpy.ops.object.camera_add(location=(0, -10, 2), rotation=(1.4, 0, 0))
+    scene.camera = bpy.context.object
 
 # --- Render settings ---
-bpy.context.scene.render.filepath = OUTPUT_VIDEO
-bpy.context.scene.render.image_settings.file_format = 'FFMPEG'
-bpy.context.scene.render.ffmpeg.format = 'MPEG4'
+scene.frame_start = FRAME_START
+scene.frame_end = FRAME_END
+scene.render.fps = {fps}
+scene.render.resolution_x, scene.render.resolution_y = 1920, 1080
+# Rendered under a hidden name and renamed when complete, so a killed job never looks finished.
+partial_path = os.path.join(os.path.dirname(OUTPUT_VIDEO), '.rendering_' + os.path.basename(OUTPUT_VIDEO))
+scene.render.filepath = partial_path
+scene.render.image_settings.file_format = 'FFMPEG'
+scene.render.ffmpeg.format = 'MPEG4'
+scene.render.ffmpeg.codec = 'H264'
+# Dialogue audio is muxed when the scenes are assembled.
+scene.render.ffmpeg.audio_codec = 'NONE'
 
 # --- Render animation ---
 bpy.ops.render.render(animation=True)
+os.replace(scene.render.frame_path(frame=FRAME_START), OUTPUT_VIDEO)
 """)
     print(f"Blender script generated: {script_path}")
     return script_path
@@ -526,27 +794,13 @@ COUNTRY_BG_QUERIES = {
     'China': 'china city street',
 }
 
-def download_backgrounds(output_dir='backgrounds'):
-    os.makedirs(output_dir, exist_ok=True)
-    headers = {'Authorization': PEXELS_API_KEY}
-    for country, query in COUNTRY_BG_QUERIES.items():
-        url = f'https://api.pexels.com/v1/search?query={query}&per_page=1&orientation=landscape'
-        try:
-            r = requests.get(url, headers=headers)
-            r.raise_for_status()
-            data = r.json()
-            if data['photos']:
-                img_url = data['photos'][0]['src']['large']
-                img_path = os.path.join(output_dir, f'{country}.jpg')
-                img_data = requests.get(img_url).content
-                with open(img_path, 'wb') as f:
-                    f.write(img_data)
-                print(f"Downloaded background for {country}: {img_path}")
-            else:
-                print(f"No background found for {country}")
-        except Exception as e:
-            print(f"Failed to download background for {country}: {e}")
-    return {country: os.path.join(output_dir, f'{country}.jpg') for country in COUNTRY_BG_QUERIES}
+def download_backgrounds(output_dir='backgrounds', aspect_ratio=None):
+    """
+    Syncs the background store (see background_store) and returns {country: image path}.
+    Cached images are only revalidated, so after the first run this is mostly local lookups.
+    """
+    sync_backgrounds(COUNTRY_BG_QUERIES, PEXELS_API_KEY, store_dir=output_dir)
+    return {country: background_for(country, aspect_ratio, choice=0, store_dir=output_dir) for country in COUNTRY_BG_QUERIES}
 
 # Call this at the start of your pipeline to ensure backgrounds are available
 # backgrounds = download_backgrounds()
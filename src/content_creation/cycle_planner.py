@@ -0,0 +1,51 @@
+import time
+import asyncio
+
+class DependencyFailed(RuntimeError):
+    """Result of a node that was skipped because a node it depends on failed."""
+
+class CycleGraph:
+    """
+    The deliverables of one cycle (and the inputs they share) as a small DAG. Each node is an
+    async function called with its dependencies' results; it starts as soon as they are ready,
+    so independent branches run concurrently and a shared input is computed once.
+    A failed node only fails the nodes downstream of it.
+    """
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, func, deps=()):
+        """Adds node `name`; its dependencies must already be in the graph, which keeps it acyclic."""
+        missing = [d for d in deps if d not in self.nodes]
+        if missing:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {missing}")
+        self.nodes[name] = (func, tuple(deps))
+        return name
+
+    async def run(self):
+        """Runs every node; returns {name: result}, where a failed node's result is its exception."""
+        tasks = {}
+
+        async def run_node(name):
+            func, deps = self.nodes[name]
+            inputs = []
+            for dep in deps:
+                try:
+                    inputs.append(await tasks[dep])
+                except Exception as e:
+                    raise DependencyFailed(f"{dep} failed: {e}") from e
+            started = time.time()
+            print(f"[CYCLE] {name}: started")
+            result = await func(*inputs)
+            print(f"[CYCLE] {name}: done in {time.time() - started:.0f}s")
+            return result
+
+        for name in self.nodes:
+            tasks[name] = asyncio.ensure_future(run_node(name))
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+        for name, result in results.items():
+            if isinstance(result, DependencyFailed):
+                print(f"[CYCLE] {name}: skipped, {result}")
+            elif isinstance(result, Exception):
+                print(f"[CYCLE] {name}: failed: {result}")
+        return results
@@ -0,0 +1,154 @@
+import os
+import re
+import threading
+import subprocess
+
+from src.utils.json_files import load_json, save_json
+
+# History of (text size, TTS backend, voice) -> spoken seconds, used to predict speech length before TTS.
+SPEECH_HISTORY_FILE = 'speech_durations.json'
+MAX_SAMPLES_PER_VOICE = 50
+MIN_SAMPLES = 3
+
+# Same pace generate_script plans with, used until we have measurements.
+DEFAULT_WORDS_PER_SECOND = 2.5
+# Final audio should land within this fraction of the target.
+DURATION_TOLERANCE = 0.05
+# atempo range that still sounds natural for narration.
+MIN_TEMPO, MAX_TEMPO = 0.8, 1.3
+# Fade applied where over-long audio is cut to length.
+LENGTH_FADE_SECONDS = 0.5
+
+# Hindi full stop (danda) as well as Latin sentence punctuation.
+_SENTENCE_RE = re.compile(r'[^।.!?\n]+[।.!?]*')
+
+# Voiceovers of concurrent cycle branches record samples from executor threads.
+_history_lock = threading.Lock()
+
+def load_history():
+    return load_json(SPEECH_HISTORY_FILE)
+
+def save_history(history):
+    save_json(SPEECH_HISTORY_FILE, history, indent=2)
+
+def _text_stats(text):
+    return len(text.split()), len(text)
+
+def record_sample(text, backend, voice, seconds):
+    """Adds one measured TTS result to the history."""
+    if not seconds:
+        return
+    words, chars = _text_stats(text)
+    key = f"{backend}:{voice}"
+    with _history_lock:
+        history = load_history()
+        samples = history.get(key, []) + [{'words': words, 'chars': chars, 'seconds': seconds}]
+        history[key] = samples[-MAX_SAMPLES_PER_VOICE:]
+        save_history(history)
+
+def _seconds_per_char(history, backend, voice):
+    samples = history.get(f"{backend}:{voice}", [])
+    if len(samples) < MIN_SAMPLES:
+        # Not enough data for this voice yet: pool every voice of the same backend.
+        samples = [s for key, values in history.items() if key.startswith(f"{backend}:") for s in values]
+    if len(samples) < MIN_SAMPLES:
+        return None
+    return sum(s['seconds'] for s in samples) / max(1, sum(s['chars'] for s in samples))
+
+def predict_seconds(text, backend, voice=None):
+    """Predicted speech length of text for a backend/voice, from measured history where available."""
+    words, chars = _text_stats(text)
+    rate = _seconds_per_char(load_history(), backend, voice)
+    if rate is None:
+        return words / DEFAULT_WORDS_PER_SECOND
+    return chars * rate
+
+def split_sentences(script):
+    return [s.strip() for s in _SENTENCE_RE.findall(script) if s.strip()]
+
+def fit_script(script, target_seconds, backend, voice=None):
+    """
+    Drops whole sentences from the body of an over-long script until its predicted length is within
+    tolerance of target_seconds. The opening hook and the closing call-to-action are always kept.
+    Short scripts are returned unchanged; fit_tempo slows the audio down instead. The spoken
+    result is only guaranteed within DURATION_TOLERANCE while the needed stretch stays inside
+    MIN_TEMPO..MAX_TEMPO; beyond that fit_tempo pads the audio with silence or cuts it to length.
+    """
+    limit = target_seconds * (1 + DURATION_TOLERANCE)
+    predicted = predict_seconds(script, backend, voice)
+    if predicted <= limit:
+        return script
+    sentences = split_sentences(script)
+    if len(sentences) <= 2:
+        return script
+    head, body, tail = sentences[0], sentences[1:-1], sentences[-1]
+    while body and predict_seconds(' '.join([head] + body + [tail]), backend, voice) > limit:
+        body.pop()
+    fitted = ' '.join([head] + body + [tail])
+    print(f"[DURATION] Trimmed script from ~{predicted:.0f}s to ~{predict_seconds(fitted, backend, voice):.0f}s (target {target_seconds}s)")
+    return fitted
+
+def probe_duration(audio_path):
+    """Reads the duration of a media file from its header with ffprobe."""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', audio_path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return float(result.stdout.decode().strip())
+
+def tempo_for(actual_seconds, target_seconds):
+    """
+    atempo factor that brings actual_seconds to target_seconds, or 1.0 if already within tolerance.
+    Clamped to MIN_TEMPO..MAX_TEMPO, so tempo alone only reaches the tolerance for audio within
+    that range of the target; fit_length() handles the rest.
+    """
+    if not actual_seconds or abs(actual_seconds - target_seconds) <= target_seconds * DURATION_TOLERANCE:
+        return 1.0
+    return min(MAX_TEMPO, max(MIN_TEMPO, actual_seconds / target_seconds))
+
+def apply_tempo(audio_path, factor):
+    """Time-stretches audio_path in place with ffmpeg's atempo (pitch is preserved)."""
+    stretched_path = audio_path + '.tempo' + os.path.splitext(audio_path)[1]
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', audio_path,
+        '-filter:a', f"atempo={factor:.4f}", stretched_path
+    ], check=True)
+    os.replace(stretched_path, audio_path)
+
+def fit_length(audio_path, target_seconds):
+    """
+    Sets the length of audio_path in place when it is still outside the tolerance after the
+    tempo step: short audio is padded with trailing silence up to target_seconds, long audio is
+    cut at target_seconds with a short fade-out. Returns the final duration in seconds.
+    """
+    actual = probe_duration(audio_path)
+    if abs(actual - target_seconds) <= target_seconds * DURATION_TOLERANCE:
+        return actual
+    if actual < target_seconds:
+        audio_filter = f"apad=whole_dur={target_seconds:.3f}"
+    else:
+        fade_start = max(0.0, target_seconds - LENGTH_FADE_SECONDS)
+        audio_filter = f"atrim=end={target_seconds:.3f},afade=t=out:st={fade_start:.3f}:d={LENGTH_FADE_SECONDS}"
+    fitted_path = audio_path + '.fit' + os.path.splitext(audio_path)[1]
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', audio_path, '-filter:a', audio_filter, fitted_path
+    ], check=True)
+    os.replace(fitted_path, audio_path)
+    print(f"[DURATION] Voiceover {actual:.1f}s is outside the tempo range, {'padded' if actual < target_seconds else 'cut'} to {target_seconds}s")
+    return float(target_seconds)
+
+def fit_tempo(audio_path, text, backend, voice, target_seconds):
+    """
+    Records the measured length of a fresh TTS file and, if it misses the target by more than
+    the tolerance, time-stretches it within MIN_TEMPO..MAX_TEMPO. Audio that is still outside the
+    tolerance after that is padded or cut by fit_length(), so the result always lands within
+    DURATION_TOLERANCE of target_seconds. Returns the final duration in seconds.
+    """
+    actual = probe_duration(audio_path)
+    record_sample(text, backend, voice, actual)
+    factor = tempo_for(actual, target_seconds)
+    if factor == 1.0:
+        return actual
+    apply_tempo(audio_path, factor)
+    print(f"[DURATION] Voiceover {actual:.1f}s -> {actual / factor:.1f}s (atempo {factor:.2f}, target {target_seconds}s)")
+    return fit_length(audio_path, target_seconds)
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+
+from src.utils.json_files import load_json, save_json
+
+# Measured x264 throughput per preset on this machine, written once by benchmark_presets().
+ENCODER_BENCHMARK_FILE = 'encoder_benchmark.json'
+
+# Fastest to slowest. Slower presets give smaller files at the same CRF.
+PRESET_LADDER = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+ENCODE_CRF = os.getenv('ENCODE_CRF', '23')
+RENDER_FPS = 24
+
+# Wall-clock window one reel may spend encoding. Defaults to the minimum upload delay
+# (see random_upload_delay) so a render never pushes the upload schedule back.
+RENDER_BUDGET_SECONDS = float(os.getenv('RENDER_BUDGET_SECONDS', '300'))
+# Fraction of the budget we plan against, to absorb decode/compositing overhead.
+RENDER_HEADROOM = 0.6
+
+BENCHMARK_SIZE = (1080, 1920)
+BENCHMARK_SECONDS = 2
+
+_queue_lock = threading.Lock()
+# Held while the preset benchmark runs, so concurrent first renders run it once between them.
+_benchmark_lock = threading.Lock()
+_render_queue_depth = 0
+
+@contextmanager
+def render_slot():
+    """
+    Counts the renders running at once; yields the count including this one. It does not
+    serialize them: concurrent renders share the CPU, which plan_encode accounts for.
+    """
+    global _render_queue_depth
+    with _queue_lock:
+        _render_queue_depth += 1
+        depth = _render_queue_depth
+    try:
+        yield depth
+    finally:
+        with _queue_lock:
+            _render_queue_depth -= 1
+
+def load_benchmark():
+    data = load_json(ENCODER_BENCHMARK_FILE)
+    if data.get('cpu_count') == os.cpu_count():
+        return data
+    return None
+
+def benchmark_presets():
+    """
+    Encodes a synthetic 1080x1920 clip with every preset on the ladder and records frames/second.
+    Runs once per machine; the result is cached in ENCODER_BENCHMARK_FILE.
+    """
+    width, height = BENCHMARK_SIZE
+    frames = BENCHMARK_SECONDS * RENDER_FPS
+    results = {}
+    for preset in PRESET_LADDER:
+        start = time.perf_counter()
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={RENDER_FPS}",
+            '-t', str(BENCHMARK_SECONDS),
+            '-c:v', 'libx264', '-preset', preset, '-crf', ENCODE_CRF,
+            '-threads', str(os.cpu_count() or 1),
+            '-f', 'null', '-'
+        ], check=True)
+        elapsed = time.perf_counter() - start
+        results[preset] = frames / elapsed
+        print(f"[ENCODE] Benchmark {preset}: {results[preset]:.1f} fps")
+    data = {
+        'cpu_count': os.cpu_count(),
+        'pixels': width * height,
+        'fps': results,
+        'measured_at': time.time(),
+    }
+    save_json(ENCODER_BENCHMARK_FILE, data, indent=2)
+    return data
+
+def ensure_benchmark():
+    """The cached benchmark for this machine, running benchmark_presets() first if there is none."""
+    benchmark = load_benchmark()
+    if benchmark:
+        return benchmark
+    with _benchmark_lock:
+        # Another render may have finished the benchmark while this one waited for the lock.
+        return load_benchmark() or benchmark_presets()
+
+def container_params(fragmented=False):
+    """
+    MP4 layout flags. Default output is fast-start (moov atom first) so platforms can start
+    processing before the whole file arrives. Fragmented output never seeks back while writing,
+    so a file can be uploaded while it is still being encoded; short GOPs keep fragments small.
+    """
+    if fragmented:
+        return ['-movflags', '+frag_keyframe+empty_moov+default_base_moof', '-g', str(RENDER_FPS * 2)]
+    return ['-movflags', '+faststart']
+
+def render_budget():
+    """
+    Per-reel encode budget in seconds. Renders run concurrently rather than waiting in a queue,
+    so every reel gets the whole window; sharing the CPU is charged to the estimate instead.
+    """
+    return RENDER_BUDGET_SECONDS * RENDER_HEADROOM
+
+def plan_encode(duration, aspect_ratio='portrait', queue_depth=1, fragmented=False):
+    """
+    Picks the slowest x264 preset whose estimated encode time for `duration` seconds of video
+    fits the budget when queue_depth renders share the CPU. Returns keyword arguments for
+    MoviePy's write_videofile.
+    """
+    threads = max(1, (os.cpu_count() or 2) // max(1, queue_depth))
+    ffmpeg_params = ['-crf', ENCODE_CRF] + container_params(fragmented)
+    fallback = {'preset': 'ultrafast', 'threads': threads, 'ffmpeg_params': ffmpeg_params}
+    try:
+        benchmark = ensure_benchmark()
+    except Exception as e:
+        print(f"[ENCODE] Preset benchmark failed, using ultrafast: {e}")
+        return fallback
+
+    # Both profiles are 1080p-class; scale in case the benchmark geometry ever changes.
+    pixels = BENCHMARK_SIZE[0] * BENCHMARK_SIZE[1]
+    pixel_scale = pixels / benchmark.get('pixels', pixels)
+    frames = duration * RENDER_FPS
+    budget = render_budget()
+    chosen = 'ultrafast'
+    for preset in PRESET_LADDER:
+        fps = benchmark['fps'].get(preset)
+        if not fps:
+            continue
+        # Shared-CPU model: queue_depth renders run at once, so each sees 1/queue_depth of the
+        # measured rate. This is the only place depth is charged; the budget itself stays fixed.
+        estimate = frames * pixel_scale * max(1, queue_depth) / fps
+        if estimate <= budget:
+            chosen = preset
+    print(f"[ENCODE] {aspect_ratio} {duration:.0f}s, queue depth {queue_depth}, budget {budget:.0f}s -> preset '{chosen}', {threads} threads")
+    return {'preset': chosen, 'threads': threads, 'ffmpeg_params': ffmpeg_params}
+
+if __name__ == '__main__':
+    benchmark_presets()
+    for depth in (1, 2, 4):
+        plan_encode(60, 'portrait', depth)
+        plan_encode(180, 'landscape', depth)
@@ -0,0 +1,204 @@
+import re
+import sys
+import json
+import heapq
+import random
+from itertools import cycle, islice
+
+# Tag pool by category. A tag may sit in several categories; the engine deduplicates it.
+# 'GENERAL' tags suit any reel, 'MUSIC' tags are added for music reels.
+TAG_POOL = {
+    'GENERAL': [
+        'Trending', 'Viral', 'Explore', 'Reels', 'InstaGood', 'ExplorePage', 'Discover', 'ForYou',
+        'ForYouPage', 'FYP', 'ViralVideo', 'ViralReel', 'ViralContent', 'TrendingNow', 'MustWatch',
+        'WatchThis', 'MustSee', 'Share', 'Like', 'Comment', 'Follow', 'Subscribe', 'Support',
+        'Community', 'Collab', 'Creator', 'ContentCreator', 'Influencer', 'SocialMedia', 'Online',
+        'Digital', 'Shorts', 'Vlog', 'Vlogger', 'Vlogging', 'Story', 'New', 'Today', 'ThisWeek',
+        'Best', 'Top', 'Amazing', 'Awesome', 'Cool', 'Wow', 'Incredible', 'Epic', 'Iconic',
+        'Hindi', 'India', 'Desi', 'AI', 'Inspiration', 'Motivation', 'Life', 'Vibes',
+    ],
+    'MUSIC': [
+        'Music', 'MusicLover', 'Song', 'Singer', 'Artist', 'Beat', 'Sound', 'Lyrics', 'Cover',
+        'Remix', 'Mashup', 'Original', 'Bollywood', 'Pop', 'Rap', 'Dance', 'Punjabi', 'English',
+        'Chill', 'Vibes', 'Musician', 'Dancer', 'Throwback', 'OldIsGold', 'Timeless', 'Classic',
+    ],
+    'TECHNOLOGY': [
+        'Tech', 'TechTrends', 'AI', 'Innovation', 'Future', 'Digital', 'Developer', 'Programmer',
+        'Coder', 'Hacker', 'Maker', 'Builder', 'Inventor', 'Engineer', 'Gaming', 'Gamer', 'Startup',
+    ],
+    'BUSINESS': [
+        'Business', 'Startup', 'Entrepreneur', 'Investor', 'Trader', 'Success', 'SuccessStory',
+        'Goals', 'Leader', 'Growth', 'PersonalGrowth', 'Mindset', 'WorkHard', 'DreamBig', 'Money',
+    ],
+    'SPORTS': [
+        'Sports', 'Champion', 'Team', 'Squad', 'SquadGoals', 'Winner', 'Player', 'Coach', 'Fitness',
+        'NeverGiveUp', 'StayStrong', 'Strength', 'Power', 'Energy', 'Cricket', 'Football', 'Legend',
+    ],
+    'ENTERTAINMENT': [
+        'Entertainment', 'Bollywood', 'Movies', 'Comedy', 'Actor', 'Actress', 'Director', 'Dance',
+        'Music', 'Celebrity', 'WebSeries', 'Throwback', 'Memories', 'Classic', 'Fun',
+    ],
+    'HEALTH': [
+        'Health', 'Fitness', 'SelfCare', 'Mindset', 'PositiveVibes', 'Happiness', 'Yoga',
+        'Meditation', 'Wellness', 'HealthyLiving', 'Nutrition', 'MentalHealth', 'Energy',
+    ],
+    'SCIENCE': [
+        'Science', 'Scientist', 'Research', 'Knowledge', 'Learning', 'Education', 'Space',
+        'Universe', 'Galaxy', 'Planet', 'Earth', 'Nature', 'Innovation', 'Facts',
+    ],
+    'CULTURE': [
+        'Culture', 'Tradition', 'Heritage', 'Festival', 'Art', 'Desi', 'India', 'History', 'Food',
+    ],
+    'TRAVEL': [
+        'Travel', 'Adventure', 'Wanderlust', 'Explore', 'Nature', 'Photography', 'Journey',
+        'TravelGram', 'Mountains', 'Beach', 'Food',
+    ],
+    'POLITICS': [
+        'News', 'Politics', 'India', 'Debate', 'Democracy', 'Facts', 'Knowledge', 'Awareness',
+    ],
+    'ASTROLOGY': [
+        'Astrology', 'Zodiac', 'Horoscope', 'Stars', 'Moon', 'Universe', 'Spiritual', 'Karma',
+    ],
+    'FUNNY': [
+        'Funny', 'Comedy', 'Fun', 'LOL', 'Memes', 'Humor', 'Jokes', 'FunChallenge', 'Challenge', 'OMG',
+    ],
+    'MEMES': [
+        'Memes', 'Meme', 'DesiMemes', 'Funny', 'Comedy', 'LOL', 'Relatable', 'Humor', 'OMG',
+    ],
+    'ANIME': [
+        'Anime', 'Manga', 'Otaku', 'AnimeEdit', 'Japan', 'Cosplay', 'AnimeArt', 'Weeb', 'Story',
+    ],
+}
+MUSIC_REEL_TAGS = ['#NowPlaying', '#MusicReel', '#TrendingSong']
+
+# Relative sampling weights.
+BASE_WEIGHT = 1.0
+CATEGORY_WEIGHT = 3.0
+MUSIC_WEIGHT = 3.0
+# Added per trending-topic word that appears in the tag.
+TREND_WEIGHT = 2.0
+
+CAPTION_MAX_CHARS = 150
+
+_WORD_RE = re.compile(r'[a-z0-9]{3,}')
+
+def sanitize_hashtag(text):
+    """Removes special characters to create a valid hashtag."""
+    return re.sub(r'[^a-zA-Z0-9]', '', text)
+
+def _truncate(caption, limit=CAPTION_MAX_CHARS):
+    return caption if len(caption) <= limit else caption[:limit - 3] + '...'
+
+def weighted_sample(weights, k, rng=random):
+    """
+    k distinct keys of weights ({key: weight}) sampled without replacement, each draw
+    proportional to weight (Efraimidis-Spirakis: keep the k largest u ** (1 / w)).
+    """
+    keyed = ((rng.random() ** (1.0 / w), key) for key, w in weights.items() if w > 0)
+    return [key for _, key in heapq.nlargest(k, keyed)]
+
+class HashtagEngine:
+    """Deduplicated tag pool indexed by category; built once and shared by every caption."""
+    def __init__(self, pool=TAG_POOL):
+        self.categories = {}  # tag (lowercase) -> set of categories
+        self.display = {}     # tag (lowercase) -> spelling used in the hashtag
+        for category, tags in pool.items():
+            for tag in tags:
+                key = tag.lower()
+                self.display.setdefault(key, tag)
+                self.categories.setdefault(key, set()).add(category)
+        self._weight_cache = {}
+
+    def trend_words(self, trending):
+        return frozenset(w for topic in trending or () for w in _WORD_RE.findall(topic.lower()))
+
+    def weights(self, category=None, is_music_reel=False, trending=()):
+        """Sampling weight of every tag for a reel, cached per (category, reel type, trending topics)."""
+        category = (category or '').upper()
+        words = self.trend_words(trending)
+        cache_key = (category, is_music_reel, words)
+        if cache_key not in self._weight_cache:
+            weights = {}
+            for key, categories in self.categories.items():
+                weight = BASE_WEIGHT if 'GENERAL' in categories else 0.0
+                if category in categories:
+                    weight += CATEGORY_WEIGHT
+                if is_music_reel and 'MUSIC' in categories:
+                    weight += MUSIC_WEIGHT
+                weight += TREND_WEIGHT * sum(1 for w in words if w in key)
+                if weight > 0:
+                    weights[key] = weight
+            if len(self._weight_cache) > 256:
+                self._weight_cache.clear()
+            self._weight_cache[cache_key] = weights
+        return self._weight_cache[cache_key]
+
+    def hashtags(self, topic, category, n=30, song_title=None, song_artist=None, is_music_reel=False, trending=(), rng=random):
+        """Space-separated hashtags: reel-specific tags first, then a weighted sample from the pool."""
+        fixed = []
+        if is_music_reel and song_title:
+            fixed += [f"#{sanitize_hashtag(song_title)}", f"#{sanitize_hashtag(song_artist or '')}"] + MUSIC_REEL_TAGS
+        fixed += [f"#{sanitize_hashtag(topic)}", f"#{sanitize_hashtag(category or '')}"]
+        tags = list(dict.fromkeys(t for t in fixed if len(t) > 1))[:n]
+        taken = {t[1:].lower() for t in tags}
+        weights = {k: w for k, w in self.weights(category, is_music_reel, trending).items() if k not in taken}
+        tags += [f"#{self.display[k]}" for k in weighted_sample(weights, n - len(tags), rng)]
+        return ' '.join(tags)
+
+    def caption(self, topic, category, song_title=None, song_artist=None, is_music_reel=False, rng=random):
+        if is_music_reel and song_title:
+            # Try to fetch a related quote/lyric (placeholder logic)
+            quote = f"Enjoy the vibes of '{song_title}' by {song_artist}. Let the music move you!"
+            return _truncate(f"{quote} #NowPlaying")
+        # Voice/topic-based: the sentence repeated to 40-60 words, cut to the caption limit.
+        base = f"{topic}: Discover more in {category}. ".split()
+        return _truncate(' '.join(islice(cycle(base), rng.randint(40, 60))))
+
+    def batch(self, reels, n=30, trending=(), seed=None):
+        """
+        Captions and hashtags for many reels at once: [(caption, hashtags)] in the order of reels,
+        each a dict with topic, category and optionally song_title, song_artist, is_music_reel.
+        Weight tables are shared across reels of the same category.
+        """
+        rng = random.Random(seed)
+        results = []
+        for reel in reels:
+            kwargs = {k: reel.get(k) for k in ('song_title', 'song_artist')}
+            is_music_reel = bool(reel.get('is_music_reel'))
+            caption = self.caption(reel['topic'], reel.get('category'), is_music_reel=is_music_reel, rng=rng, **kwargs)
+            tags = self.hashtags(reel['topic'], reel.get('category'), n=n, is_music_reel=is_music_reel,
+                                 trending=reel.get('trending', trending), rng=rng, **kwargs)
+            results.append((caption, tags))
+        return results
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = HashtagEngine()
+    return _engine
+
+def load_reels_file(path):
+    """Reads 'CATEGORY: topic' lines (the 1000_fallback_topics.txt format) into batch() reel dicts."""
+    reels = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            category, sep, topic = line.strip().partition(':')
+            if sep and topic.strip():
+                reels.append({'topic': topic.strip(), 'category': category.strip()})
+    return reels
+
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == '--batch':
+    # Captions for a batch run: python -m src.content_creation.hashtags --batch 1000_fallback_topics.txt > captions.jsonl
+    batch_reels = load_reels_file(sys.argv[2] if len(sys.argv) > 2 else '1000_fallback_topics.txt')
+    for reel, (caption, tags) in zip(batch_reels, get_engine().batch(batch_reels)):
+        print(json.dumps(dict(reel, caption=caption, hashtags=tags), ensure_ascii=False))
+elif __name__ == '__main__':
+    engine = get_engine()
+    print(engine.hashtags('Latest Cricket Highlights', 'SPORTS', trending=['india vs australia cricket']))
+    for caption, tags in engine.batch([
+        {'topic': 'AI Breakthroughs', 'category': 'TECHNOLOGY'},
+        {'topic': 'Song', 'category': 'ENTERTAINMENT', 'song_title': 'Kesariya', 'song_artist': 'Arijit Singh', 'is_music_reel': True},
+    ], seed=1):
+        print(caption, '\n', tags, '\n')
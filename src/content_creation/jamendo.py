@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import requests
+
+from src.utils.rate_limiter import guarded_call
+
+# Jamendo API credentials (register for your own client_id at https://developer.jamendo.com/v3.0)
+JAMENDO_CLIENT_ID = os.getenv('JAMENDO_CLIENT_ID', 'demo_client_id')
+JAMENDO_TRACKS_URL = 'https://api.jamendo.com/v3.0/tracks/'
+
+# Map language to Jamendo tags/genres
+JAMENDO_LANG_TAGS = {
+    'english': 'english',
+    'punjabi': 'punjabi',
+    'hindi': 'hindi',
+    'haryanvi': 'haryanvi',
+}
+
+# Track metadata per tag, refreshed in bulk at most this often; reels are served from the cache.
+JAMENDO_CACHE_FILE = 'jamendo_cache.json'
+JAMENDO_CACHE_TTL_SECONDS = float(os.getenv('JAMENDO_CACHE_TTL_HOURS', '24')) * 3600
+# A refresh pages through up to JAMENDO_MAX_PAGES pages of the API's maximum page size.
+JAMENDO_PAGE_SIZE = 200
+JAMENDO_MAX_PAGES = int(os.getenv('JAMENDO_MAX_PAGES', '3'))
+# Full tracks are downloaded once into the local song library and clipped from there.
+JAMENDO_SONGS_DIR = 'downloaded_songs'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def track_metadata(result):
+    """The fields kept for a track from one Jamendo API result."""
+    return {
+        'id': str(result['id']),
+        'title': result.get('name') or 'Unknown Title',
+        'artist': result.get('artist_name') or 'Unknown Artist',
+        'duration': int(result.get('duration') or 0),
+        'audio': result.get('audio'),
+        'license': result.get('license_ccurl'),
+    }
+
+class JamendoClient:
+    """
+    Tag/popularity catalogue of Jamendo tracks kept in JAMENDO_CACHE_FILE:
+    {'tags': {tag: {'fetched': ts, 'ids': [...]}}, 'tracks': {id: metadata}}.
+    A tag is fetched from the API only when its listing is older than the TTL; if a refresh fails
+    the stale listing keeps being served.
+    """
+    def __init__(self, cache_file=JAMENDO_CACHE_FILE, ttl=JAMENDO_CACHE_TTL_SECONDS):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        # requests.Session is not thread-safe; reels on executor threads each get their own.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.cache = self._load()
+        self._by_audio = {t['audio']: t for t in self.cache['tracks'].values() if t.get('audio')}
+
+    @property
+    def session(self):
+        """This thread's requests.Session, created on first use."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _load(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except ValueError:
+                print(f"[Jamendo] Cache {self.cache_file} is unreadable, starting empty")
+        return {'tags': {}, 'tracks': {}}
+
+    def _save(self):
+        partial_path = self.cache_file + '.part'
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        os.replace(partial_path, self.cache_file)
+
+    def fetch_pages(self, tag):
+        """All tracks tagged `tag`, most popular first, paged in bulk."""
+        results = []
+        for page in range(JAMENDO_MAX_PAGES):
+            resp = guarded_call('jamendo', self.session.get, JAMENDO_TRACKS_URL, params={
+                'client_id': JAMENDO_CLIENT_ID, 'format': 'json', 'tags': tag, 'audioformat': 'mp32',
+                'order': 'popularity_total', 'limit': JAMENDO_PAGE_SIZE, 'offset': page * JAMENDO_PAGE_SIZE,
+            }, timeout=15)
+            resp.raise_for_status()
+            data = resp.json()
+            status = data.get('headers', {}).get('status')
+            if status and status != 'success':
+                raise RuntimeError(data['headers'].get('error_message') or status)
+            batch = data.get('results', [])
+            results += batch
+            if len(batch) < JAMENDO_PAGE_SIZE:
+                break
+        return [track_metadata(r) for r in results if r.get('audio')]
+
+    def refresh(self, tag):
+        tracks = self.fetch_pages(tag)
+        with self._lock:
+            for track in tracks:
+                self.cache['tracks'][track['id']] = track
+                self._by_audio[track['audio']] = track
+            self.cache['tags'][tag] = {'fetched': time.time(), 'ids': [t['id'] for t in tracks]}
+            self._save()
+        print(f"[Jamendo] Cached {len(tracks)} tracks for tag '{tag}'")
+
+    def tracks(self, tag):
+        """Cached tracks for tag, refreshing the listing first if it is missing or past its TTL."""
+        listing = self.cache['tags'].get(tag)
+        if not listing or time.time() - listing['fetched'] > self.ttl:
+            try:
+                self.refresh(tag)
+            except Exception as e:
+                print(f"[Jamendo] Refresh of '{tag}' failed{', serving cached listing' if listing else ''}: {e}")
+            listing = self.cache['tags'].get(tag)
+        if not listing:
+            return []
+        return [self.cache['tracks'][i] for i in listing['ids'] if i in self.cache['tracks']]
+
+    def pick_track(self, language, min_duration=0, rng=random):
+        """A random cached track for language at least min_duration seconds long, or None."""
+        tag = JAMENDO_LANG_TAGS.get(language, 'english')
+        candidates = [t for t in self.tracks(tag) if t['duration'] >= min_duration]
+        return rng.choice(candidates) if candidates else None
+
+    def metadata_for_url(self, audio_url):
+        """Cached metadata of the track with this audio URL, or None. Never calls the API."""
+        return self._by_audio.get(audio_url)
+
+    def download(self, track, songs_dir=JAMENDO_SONGS_DIR):
+        """Local copy of track's audio, downloaded on first use."""
+        os.makedirs(songs_dir, exist_ok=True)
+        path = os.path.join(songs_dir, f"jamendo_{track['id']}.mp3")
+        if not os.path.exists(path):
+            partial_path = path + '.part'
+            with self.session.get(track['audio'], stream=True, timeout=60) as r:
+                r.raise_for_status()
+                with open(partial_path, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            os.replace(partial_path, path)
+            print(f"[Jamendo] Downloaded '{track['title']}' by {track['artist']}: {path}")
+        return path
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = JamendoClient()
+        return _client
+
+if __name__ == '__main__':
+    # Warm the cache for every language: python -m src.content_creation.jamendo [--refresh]
+    client = get_client()
+    for language, tag in JAMENDO_LANG_TAGS.items():
+        if '--refresh' in sys.argv:
+            client.refresh(tag)
+        tracks = client.tracks(tag)
+        print(f"{language}: {len(tracks)} tracks")
+        for track in tracks[:3]:
+            print(f"  {track['title']} - {track['artist']} ({track['duration']}s) {track['license']}")
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+from src.content_creation.shot_index import analyze_background
+
+# Normalized ("mezzanine") copies of downloaded backgrounds, one per render geometry.
+MEDIA_CACHE_DIR = os.getenv('MEDIA_CACHE_DIR', 'media_cache')
+MEDIA_CACHE_INDEX_FILE = os.path.join(MEDIA_CACHE_DIR, 'index.json')
+MEDIA_CACHE_BUDGET_MB = int(os.getenv('MEDIA_CACHE_BUDGET_MB', '2048'))
+
+# Target geometry per aspect ratio. Every mezzanine file is CFR with a keyframe every second,
+# so later renders can seek and cut it without re-scaling.
+CACHE_PROFILES = {
+    'portrait': {'width': 1080, 'height': 1920, 'fps': 24, 'gop': 24},
+    'landscape': {'width': 1920, 'height': 1080, 'fps': 24, 'gop': 24},
+}
+
+# Guards every load/modify/save of the index; reels on executor threads share it.
+_index_lock = threading.Lock()
+# Mezzanine files a reel is rendering from right now -> number of such reels; evict_lru skips them.
+_pins = {}
+
+def load_cache_index():
+    if os.path.exists(MEDIA_CACHE_INDEX_FILE):
+        try:
+            with open(MEDIA_CACHE_INDEX_FILE, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            print(f"[MEDIA CACHE] Index {MEDIA_CACHE_INDEX_FILE} is unreadable, starting empty")
+    return {}
+
+def save_cache_index(index):
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=MEDIA_CACHE_DIR, suffix='.json.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, MEDIA_CACHE_INDEX_FILE)
+
+def file_sha1(path, chunk_size=1024 * 1024):
+    """Hashes a file in chunks so large 4K downloads are never held in memory."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(source_hash, aspect_ratio):
+    return f"{source_hash[:16]}_{aspect_ratio}"
+
+def _analyze(path):
+    """Shot index for a mezzanine file; None if analysis fails, so the renderer falls back to frame 0."""
+    try:
+        return analyze_background(path)
+    except Exception as e:
+        print(f"[MEDIA CACHE] Shot analysis failed for {path}: {e}")
+        return None
+
+def _touch(key):
+    """Marks entry `key` as used and returns its path (None if it was evicted meanwhile)."""
+    with _index_lock:
+        entry = load_cache_index().get(key)
+    if not entry:
+        return None
+    # Entries cached before shot analysis existed are analysed (and hashed) once, on their next
+    # use; outside the lock, since that reads the whole clip.
+    shots = _analyze(entry['path']) if 'shots' not in entry else None
+    sha1 = file_sha1(entry['path']) if 'sha1' not in entry else None
+    with _index_lock:
+        index = load_cache_index()
+        if key not in index:
+            return None
+        index[key]['last_used'] = time.time()
+        index[key].setdefault('shots', shots)
+        index[key].setdefault('sha1', sha1)
+        save_cache_index(index)
+        return index[key]['path']
+
+def lookup_cached_background(video_url, aspect_ratio):
+    """
+    Returns the mezzanine path for a previously normalized Pexels URL, or None.
+    Lets callers skip the download entirely when the background is already cached.
+    """
+    with _index_lock:
+        key = next((k for k, e in load_cache_index().items()
+                    if e.get('source_url') == video_url and e.get('profile') == aspect_ratio
+                    and os.path.exists(e['path'])), None)
+    return _touch(key) if key else None
+
+def normalize_background(source_path, aspect_ratio, source_url=None):
+    """
+    Returns a copy of source_path scaled and center-cropped to the profile for aspect_ratio,
+    creating it on first use. Entries are keyed by source content hash plus profile.
+    """
+    profile = CACHE_PROFILES.get(aspect_ratio)
+    if not profile:
+        raise ValueError(f"Unknown cache profile: {aspect_ratio}")
+    source_hash = file_sha1(source_path)
+    key = cache_key(source_hash, aspect_ratio)
+    with _index_lock:
+        entry = load_cache_index().get(key)
+    if entry and os.path.exists(entry['path']):
+        cached_path = _touch(key)
+        if cached_path:
+            print(f"[MEDIA CACHE] Hit for {os.path.basename(source_path)} ({aspect_ratio})")
+            return cached_path
+
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    cached_path = os.path.join(MEDIA_CACHE_DIR, f"{key}.mp4")
+    width, height = profile['width'], profile['height']
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=increase,"
+        f"crop={width}:{height},fps={profile['fps']},setsar=1"
+    )
+    print(f"[MEDIA CACHE] Normalizing {os.path.basename(source_path)} to {width}x{height}...")
+    # Encoded under a unique name and moved into place, so two reels normalizing the same clip
+    # never write the same file.
+    fd, partial_path = tempfile.mkstemp(dir=MEDIA_CACHE_DIR, suffix='.mp4')
+    os.close(fd)
+    try:
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error', '-i', source_path,
+            '-vf', video_filter, '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p',
+            '-g', str(profile['gop']), '-keyint_min', str(profile['gop']), '-sc_threshold', '0',
+            '-movflags', '+faststart', '-f', 'mp4',
+            partial_path
+        ], check=True)
+        os.replace(partial_path, cached_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    entry = {
+        'path': cached_path,
+        'source_hash': source_hash,
+        'source_url': source_url,
+        'profile': aspect_ratio,
+        'size': os.path.getsize(cached_path),
+        # Content hash of the mezzanine itself: what the run ledger records and stores it under.
+        'sha1': file_sha1(cached_path),
+        'shots': _analyze(cached_path),
+        'created': time.time(),
+        'last_used': time.time(),
+    }
+    with _index_lock:
+        index = load_cache_index()
+        index[key] = entry
+        save_cache_index(index)
+    evict_lru(keep=key)
+    return cached_path
+
+def cached_shots(sha1):
+    """
+    Shot index stored with the cache entry whose mezzanine has content hash sha1, or None.
+    Keyed by content so ledger copies of a background (ledger_artifacts/<sha1>.mp4) find it too;
+    raw downloads have none.
+    """
+    if not sha1:
+        return None
+    with _index_lock:
+        index = load_cache_index()
+    return next((e.get('shots') for e in index.values() if e.get('sha1') == sha1), None)
+
+def pin_background(path):
+    """Protects the cache file at path from eviction until the matching unpin_background()."""
+    with _index_lock:
+        key = os.path.abspath(path)
+        _pins[key] = _pins.get(key, 0) + 1
+
+def unpin_background(path):
+    with _index_lock:
+        key = os.path.abspath(path)
+        if _pins.get(key, 0) > 1:
+            _pins[key] -= 1
+        else:
+            _pins.pop(key, None)
+
+def evict_lru(budget_mb=None, keep=None):
+    """
+    Deletes least-recently-used entries until the cache fits within the disk budget.
+    Entries pinned by a render in progress are skipped, even if that leaves the cache over budget.
+    """
+    budget_bytes = (budget_mb or MEDIA_CACHE_BUDGET_MB) * 1024 * 1024
+    with _index_lock:
+        index = load_cache_index()
+        # Drop entries whose files were removed by hand.
+        for key in [k for k, e in index.items() if not os.path.exists(e['path'])]:
+            del index[key]
+        total = sum(e['size'] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda item: item[1]['last_used']):
+            if total <= budget_bytes:
+                break
+            if key == keep or _pins.get(os.path.abspath(entry['path'])):
+                continue
+            try:
+                os.remove(entry['path'])
+            except OSError as e:
+                print(f"[MEDIA CACHE] Could not evict {entry['path']}: {e}")
+                continue
+            total -= entry['size']
+            del index[key]
+            print(f"[MEDIA CACHE] Evicted {key}")
+        save_cache_index(index)
@@ -0,0 +1,122 @@
+import os
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.content_creation.creator import (
+    sanitize_filename, prepare_voiceover, resolve_song, music_reel_language,
+    pick_voice_background, pick_music_background
+)
+from src.content_creation.reel_derivation import DERIVE_VOICE_REEL, derive_voice_reel
+from src.content_creation.workspace import PREFETCH_ROOT, create_temp_dir, remove_temp_dir
+
+# How many cycles ahead the prefetcher may run.
+PREFETCH_MAX_AHEAD = int(os.getenv('PREFETCH_MAX_AHEAD', '1'))
+
+def prefetch_cycle_inputs(plan, use_spotify, create_youtube=True, create_instagram=True):
+    """
+    Produces everything a planned cycle needs up to the render step: the YouTube script,
+    voiceover and background, the music reel's song and background, and on voice cycles the
+    voice reel's voiceover (cut from the YouTube one when they share a topic) and background.
+    Results are stored on plan['youtube'], plan['music'] and plan['voice'] in the shape
+    create_video expects.
+    """
+    # Prefetched inputs live here until the cycle that uses them finishes (or abandons them).
+    work_dir = create_temp_dir(PREFETCH_ROOT, sanitize_filename(plan['topic']))
+    plan['work_dir'] = work_dir
+    try:
+        _prefetch_into(plan, work_dir, use_spotify, create_youtube, create_instagram)
+    except Exception:
+        release_prefetched(plan)
+        raise
+    print(f"[PREFETCH] Next cycle ready: {plan['topic']}")
+    return plan
+
+def _prefetch_into(plan, work_dir, use_spotify, create_youtube, create_instagram):
+    if create_youtube:
+        youtube_dir = os.path.join(work_dir, 'youtube')
+        os.makedirs(youtube_dir, exist_ok=True)
+        print(f"[PREFETCH] Preparing YouTube inputs for '{plan['topic']}'...")
+        script, audio_path = prepare_voiceover(plan['topic'], 180, youtube_dir)
+        video_path = asyncio.run(pick_voice_background(plan['topic'], 'landscape', youtube_dir))
+        plan['youtube'] = {'script': script, 'audio_path': audio_path, 'video_path': video_path}
+    if not create_instagram:
+        return
+    if plan['voice_reel']:
+        voice_dir = os.path.join(work_dir, 'voice')
+        os.makedirs(voice_dir, exist_ok=True)
+        print(f"[PREFETCH] Preparing voice reel inputs for '{plan['reel_topic']}'...")
+        youtube = plan.get('youtube') if plan['reel_topic'] == plan['topic'] else None
+        script = audio_path = None
+        if youtube and DERIVE_VOICE_REEL:
+            # Same topic as the YouTube video: cut the reel out of its voiceover.
+            try:
+                script, audio_path = derive_voice_reel(
+                    youtube['script'], youtube['audio_path'], 60, voice_dir, plan['reel_topic'])
+            except Exception as e:
+                print(f"[DERIVE] Could not cut the voice reel from the long-form audio, voicing it instead: {e}")
+        if not audio_path:
+            # Reuse the YouTube script (if any) rather than generating another.
+            script, audio_path = prepare_voiceover(
+                plan['reel_topic'], 60, voice_dir, script=youtube['script'] if youtube else None)
+        video_path = asyncio.run(pick_voice_background(plan['reel_topic'], 'portrait', voice_dir))
+        plan['voice'] = {'script': script, 'audio_path': audio_path, 'video_path': video_path}
+    music_dir = os.path.join(work_dir, 'music')
+    os.makedirs(music_dir, exist_ok=True)
+    print(f"[PREFETCH] Preparing music reel inputs for '{plan['topic']}'...")
+    lang = music_reel_language(plan['reel_number'])
+    song = resolve_song(use_spotify, music_dir, lang)
+    if song:
+        audio_path, song_url, song_title, song_artist = song
+        video_path = asyncio.run(pick_music_background(lang, plan['reel_number'], song_url, 'portrait', music_dir))
+        plan['music'] = {
+            'audio_path': audio_path, 'video_path': video_path, 'lang': lang,
+            'song_url': song_url, 'song_title': song_title, 'song_artist': song_artist,
+        }
+
+def release_prefetched(plan):
+    """Deletes the prefetched assets of a plan that was used or abandoned."""
+    if plan:
+        remove_temp_dir(plan.get('work_dir'))
+
+class CyclePrefetcher:
+    """
+    Runs cycle-preparation jobs on a background thread while the main loop sleeps between uploads.
+    At most max_ahead jobs are pending at once; jobs run one after another, oldest first.
+    """
+    def __init__(self, max_ahead=PREFETCH_MAX_AHEAD):
+        self.max_ahead = max_ahead
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = deque()
+
+    def has_room(self):
+        return len(self.pending) < self.max_ahead
+
+    def schedule(self, job, *args):
+        """Queues job(*args) unless max_ahead jobs are already pending. Returns whether it was queued."""
+        if not self.has_room():
+            return False
+        self.pending.append(self.executor.submit(job, *args))
+        return True
+
+    def take(self):
+        """Waits for the oldest pending job and returns its plan, or None if none succeeded."""
+        while self.pending:
+            future = self.pending.popleft()
+            try:
+                plan = future.result()
+            except Exception as e:
+                print(f"[PREFETCH] Prefetch failed, the cycle will fetch its own inputs: {e}")
+                continue
+            if plan:
+                return plan
+        return None
+
+    def release_all(self):
+        """Abandons every pending plan and frees its assets."""
+        while self.pending:
+            future = self.pending.popleft()
+            try:
+                release_prefetched(future.result())
+            except Exception:
+                pass
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import random
+import asyncio
+
+from src.content_creation.run_ledger import ReelRun, upload_inputs
+from src.content_creation.thumbnails import existing_thumbnail, thumbnail_path_for
+from src.content_creation.workspace import mark_uploaded
+from src.content_creation.hashtags import get_engine
+from src.youtube.uploader import upload_to_youtube
+from src.instagram.uploader import upload_reel
+
+# Accounts and channels every reel is published to: a JSON list of targets, e.g.
+# [{"name": "ig-main", "platform": "instagram", "session": "session.json", "region": "IN"},
+#  {"name": "ig-us", "platform": "instagram", "session": "sessions/us.json", "region": "US",
+#   "min_interval_minutes": 90, "stagger_seconds": 600, "hashtag_count": 20},
+#  {"name": "yt-main", "platform": "youtube", "token": "token.pickle"}]
+# Without the file, the single session.json / token.pickle pair is used, as before.
+PUBLISH_TARGETS_FILE = os.getenv('PUBLISH_TARGETS_FILE', 'publish_targets.json')
+# Last upload time of every target, for per-target pacing.
+PUBLISH_STATE_FILE = 'publish_state.json'
+# A target whose pacing would hold the reel back longer than this skips it instead of waiting.
+PUBLISH_MAX_WAIT_SECONDS = float(os.getenv('PUBLISH_MAX_WAIT_SECONDS', '900'))
+# Region whose trends pick the cycle's topic; targets default to it.
+TREND_REGION = os.getenv('TREND_REGION', 'IN')
+
+DEFAULT_TARGETS = [
+    {'name': 'instagram', 'platform': 'instagram', 'session': 'session.json'},
+    {'name': 'youtube', 'platform': 'youtube', 'token': 'token.pickle'},
+]
+TARGET_DEFAULTS = {
+    'region': TREND_REGION,
+    'enabled': True,
+    'min_interval_minutes': 0,   # never two uploads to this target closer together than this
+    'stagger_seconds': 0,        # random 0..N second delay, so accounts do not post in lockstep
+    'hashtag_count': 30,
+    'caption_prefix': '',
+    'caption_suffix': '',
+    'session': 'session.json',
+    'token': 'token.pickle',
+    'client_secrets': 'client_secrets.json',
+}
+
+def load_targets(platform=None):
+    """Enabled publish targets, optionally only those of one platform, with defaults filled in."""
+    targets = DEFAULT_TARGETS
+    if os.path.exists(PUBLISH_TARGETS_FILE):
+        with open(PUBLISH_TARGETS_FILE, 'r', encoding='utf-8') as f:
+            targets = json.load(f)
+    targets = [dict(TARGET_DEFAULTS, **t) for t in targets]
+    return [t for t in targets if t['enabled'] and (platform is None or t['platform'] == platform)]
+
+def target_named(name, platform):
+    """The configured target called name, or the platform's default target if it is gone."""
+    targets = load_targets(platform)
+    return next((t for t in targets if t['name'] == name), None) or dict(
+        TARGET_DEFAULTS, **next(t for t in DEFAULT_TARGETS if t['platform'] == platform))
+
+def target_regions():
+    return sorted({t['region'] for t in load_targets()})
+
+def has_credentials(target):
+    path = target['session'] if target['platform'] == 'instagram' else target['token']
+    return os.path.exists(path)
+
+def load_state():
+    if os.path.exists(PUBLISH_STATE_FILE):
+        with open(PUBLISH_STATE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+def mark_published(target):
+    state = load_state()
+    state[target['name']] = time.time()
+    with open(PUBLISH_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
+
+# Upload times handed out by schedule() in this process and not yet released, per target, so
+# reels published concurrently in one cycle are paced against each other too.
+_reserved = {}
+
+def pacing_wait(target, state=None, now=None):
+    """Seconds to hold an upload to target back, or None if it should skip this reel."""
+    state = load_state() if state is None else state
+    now = time.time() if now is None else now
+    last = max(state.get(target['name'], 0), max(_reserved.get(target['name'], ()), default=0))
+    wait = max(0.0, last + target['min_interval_minutes'] * 60 - now)
+    if wait > PUBLISH_MAX_WAIT_SECONDS:
+        return None
+    return wait + random.uniform(0, target['stagger_seconds'])
+
+def schedule(targets):
+    """
+    [(target, wait_seconds)] for the targets that take this reel. Each target's upload slot is
+    reserved until publish() finishes or release() is called, so a reel that is never uploaded
+    does not hold the slot.
+    """
+    state = load_state()
+    now = time.time()
+    scheduled = []
+    for target in targets:
+        wait = pacing_wait(target, state, now)
+        if wait is None:
+            print(f"[PUBLISH] {target['name']}: posted too recently, skipping this reel")
+        else:
+            slot = now + wait
+            _reserved.setdefault(target['name'], []).append(slot)
+            scheduled.append((dict(target, reserved_slot=slot), wait))
+    return scheduled
+
+def release(scheduled):
+    """Drops the slot reservations of scheduled (target, wait) pairs; safe to call more than once."""
+    for target, _ in scheduled:
+        slots = _reserved.get(target['name'], [])
+        if target.get('reserved_slot') in slots:
+            slots.remove(target['reserved_slot'])
+
+def instagram_caption(target, reel_id, topic, category, song_title=None, song_artist=None,
+                      is_music_reel=False, trending_by_region=None):
+    """
+    Caption for one target: its own prefix/suffix and hashtag count, hashtags boosted by what is
+    trending in its region, and a hashtag mix seeded per target so accounts do not post identical text.
+    """
+    rng = random.Random(f"{reel_id}:{target['name']}")
+    engine = get_engine()
+    caption = engine.caption(topic, category, song_title, song_artist, is_music_reel, rng=rng)
+    hashtags = engine.hashtags(topic, category, target['hashtag_count'], song_title, song_artist, is_music_reel,
+                               (trending_by_region or {}).get(target['region'], ()), rng=rng)
+    caption = ' '.join(p for p in (target['caption_prefix'], caption, target['caption_suffix']) if p)
+    return f"{caption}\n\n{hashtags}"
+
+def youtube_description(target, description):
+    return '\n\n'.join(p for p in (target['caption_prefix'], description, target['caption_suffix']) if p)
+
+async def upload_to_target(target, video_path, params, encode_status=None):
+    """Uploads video_path to one target; returns the ledger outputs, or None if the upload failed."""
+    if target['platform'] == 'youtube':
+        # While the video is still encoding its thumbnail does not exist yet; the uploader sets it afterwards.
+        thumbnail = thumbnail_path_for(video_path) if encode_status is not None else existing_thumbnail(video_path)
+        video_id = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: upload_to_youtube(
+                video_path, params['title'], params['description'], params['tags'], thumbnail, encode_status,
+                token_file=target['token'], client_secrets_file=target['client_secrets']))
+        return {'video_id': video_id} if video_id else None
+    media = await upload_reel(video_path, params['caption'], thumbnail_path=existing_thumbnail(video_path),
+                              session_file=target['session'])
+    return {'media_id': str(getattr(media, 'id', ''))} if media else None
+
+async def publish(target, wait, video_path, params, encode_status=None, run=None):
+    """Waits out the target's pacing, uploads, and records the upload in the run ledger."""
+    try:
+        if wait:
+            print(f"[PUBLISH] {target['name']}: uploading in {wait:.0f}s")
+            await asyncio.sleep(wait)
+        started = time.time()
+        try:
+            outputs = await upload_to_target(target, video_path, params, encode_status)
+        except Exception as e:
+            print(f"[PUBLISH] {target['name']}: upload failed: {e}")
+            return None
+        if not outputs:
+            print(f"[PUBLISH] {target['name']}: upload failed")
+            return None
+        mark_published(target)
+    finally:
+        # Published uploads are paced from PUBLISH_STATE_FILE now; failed or cancelled ones free the slot.
+        release([(target, wait)])
+    # Hashing the video for the ledger happens off the event loop.
+    await asyncio.get_running_loop().run_in_executor(None, lambda: (run or ReelRun(video_path)).record(
+        f"upload:{target['name']}", upload_inputs(target['platform'], video_path, target=target['name'], **params),
+        outputs, started))
+    print(f"[PUBLISH] {target['name']}: published {os.path.basename(video_path)}")
+    return outputs
+
+async def fan_out(video_path, scheduled, params_for, encode_status=None, run=None):
+    """
+    Publishes one rendered reel to every scheduled (target, wait) concurrently. params_for(target)
+    gives that target's upload parameters (title/description/tags, or caption). Returns
+    {target name: outputs} for the uploads that succeeded; the reel is marked uploaded if any did.
+    """
+    results = await asyncio.gather(*(
+        publish(target, wait, video_path, params_for(target), encode_status, run) for target, wait in scheduled
+    ))
+    published = {target['name']: r for (target, _), r in zip(scheduled, results) if r}
+    if published:
+        mark_uploaded(video_path)
+    print(f"[PUBLISH] {os.path.basename(video_path)}: {len(published)}/{len(scheduled)} targets published")
+    return published
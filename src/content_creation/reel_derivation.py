@@ -0,0 +1,130 @@
+import os
+import re
+import subprocess
+
+from src.content_creation.subtitles import word_timings
+from src.content_creation.script_generator import spoken_text
+from src.content_creation.duration_model import probe_duration
+
+# Cut the voice reel out of the long-form voiceover instead of writing and voicing a new script.
+DERIVE_VOICE_REEL = os.getenv('DERIVE_VOICE_REEL', 'True').lower() in ('true', '1', 't')
+# Estimated sentence boundaries move to a detected pause at most this many seconds away.
+SNAP_TOLERANCE_SECONDS = 0.6
+SILENCE_THRESHOLD_DB = -35
+SILENCE_MIN_SECONDS = 0.2
+# Short fades at every cut so joins do not click.
+CUT_FADE_SECONDS = 0.03
+
+_SILENCE_RE = re.compile(r'silence_(start|end): (-?[\d.]+)')
+_WORD_RE = re.compile(r'\w{2,}')
+# Topic words too common to mark a sentence as on-topic.
+_STOPWORDS = {'the', 'of', 'in', 'and', 'to', 'for', 'on', 'is', 'an', 'how', 'what', 'why', 'vs', 'with', 'from'}
+
+def detect_pauses(audio_path):
+    """Midpoints (seconds) of the pauses in audio_path, from ffmpeg's silencedetect."""
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-nostats', '-i', audio_path,
+        '-af', f"silencedetect=noise={SILENCE_THRESHOLD_DB}dB:d={SILENCE_MIN_SECONDS}", '-f', 'null', '-'
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    pauses, start = [], None
+    for kind, value in _SILENCE_RE.findall(result.stderr.decode('utf-8', 'ignore')):
+        if kind == 'start':
+            start = float(value)
+        elif start is not None:
+            pauses.append((start + float(value)) / 2)
+            start = None
+    return pauses
+
+def snap(t, pauses, tolerance=SNAP_TOLERANCE_SECONDS):
+    nearest = min(pauses, key=lambda p: abs(p - t), default=None)
+    return nearest if nearest is not None and abs(nearest - t) <= tolerance else t
+
+def timed_sentences(script, audio_path):
+    """
+    [(sentence, start, end)] for script spoken in audio_path. Sentence times come from the
+    per-character estimate the captions use; every boundary is then snapped to a real pause.
+    """
+    duration = probe_duration(audio_path)
+    timed = word_timings(script, duration)
+    if not timed:
+        return []
+    pauses = detect_pauses(audio_path)
+    bounds = [0.0]
+    for previous, current in zip(timed, timed[1:]):
+        bounds.append(snap((previous[-1][2] + current[0][1]) / 2, pauses))
+    bounds.append(duration)
+    return [(' '.join(w for w, _, _ in words), bounds[i], bounds[i + 1]) for i, words in enumerate(timed)]
+
+def sentence_score(sentence, topic_words):
+    """How much a sentence works as a highlight: mentions the topic, has a number, asks or exclaims."""
+    score = 2 * len(set(_WORD_RE.findall(sentence.lower())) & topic_words)
+    score += 1 if re.search(r'\d', sentence) else 0
+    score += 1 if sentence.rstrip().endswith(('!', '?')) else 0
+    return score
+
+def select_highlights(sentences, target_seconds, topic=''):
+    """
+    Indexes of the sentences to keep, in order: the opening hook and the closing call-to-action,
+    then the best-scoring sentences in between while they fit in target_seconds.
+    """
+    if not sentences:
+        return []
+    length = lambda i: sentences[i][2] - sentences[i][1]
+    keep = {0}
+    budget = target_seconds - length(0)
+    last = len(sentences) - 1
+    if last > 0 and length(last) <= budget:
+        keep.add(last)
+        budget -= length(last)
+    topic_words = set(_WORD_RE.findall(topic.lower())) - _STOPWORDS
+    middle = sorted(range(1, last), key=lambda i: (-sentence_score(sentences[i][0], topic_words), i))
+    for i in middle:
+        if length(i) <= budget:
+            keep.add(i)
+            budget -= length(i)
+    return sorted(keep)
+
+def contiguous_segments(sentences, indexes):
+    """Merges runs of consecutive kept sentences into (start, end) cuts, so there are as few joins as possible."""
+    segments = []
+    for i in indexes:
+        start, end = sentences[i][1], sentences[i][2]
+        if segments and segments[-1][2] == i - 1:
+            segments[-1] = (segments[-1][0], end, i)
+        else:
+            segments.append((start, end, i))
+    return [(start, end) for start, end, _ in segments]
+
+def cut_audio(audio_path, segments, output_path):
+    """Joins the (start, end) segments of audio_path in one ffmpeg pass, with short fades at every cut."""
+    chains = []
+    for n, (start, end) in enumerate(segments):
+        fade_out = max(0.0, end - start - CUT_FADE_SECONDS)
+        chains.append(
+            f"[0:a]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS,"
+            f"afade=t=in:d={CUT_FADE_SECONDS},afade=t=out:st={fade_out:.3f}:d={CUT_FADE_SECONDS}[s{n}]"
+        )
+    chains.append(''.join(f"[s{n}]" for n in range(len(segments))) + f"concat=n={len(segments)}:v=0:a=1[out]")
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', audio_path,
+        '-filter_complex', ';'.join(chains), '-map', '[out]', '-c:a', 'libmp3lame', '-q:a', '2', output_path
+    ], check=True)
+    return output_path
+
+def derive_voice_reel(script, audio_path, target_seconds, work_dir, topic=''):
+    """
+    Cuts a target_seconds voice reel out of a long-form voiceover: the hook, the highlights and the
+    call-to-action, taken from the existing audio by timestamp. No new script and no new TTS.
+    Returns (reel_script, reel_audio_path).
+    """
+    sentences = timed_sentences(spoken_text(script, topic), audio_path)
+    if not sentences:
+        raise ValueError("Long-form script has no sentences to derive a reel from.")
+    keep = select_highlights(sentences, target_seconds, topic)
+    segments = contiguous_segments(sentences, keep)
+    reel_audio = cut_audio(audio_path, segments, os.path.join(work_dir, 'reel_voiceover.mp3'))
+    reel_script = ' '.join(sentences[i][0] for i in keep)
+    seconds = sum(end - start for start, end in segments)
+    print(f"[DERIVE] Voice reel cut from long-form audio: {len(keep)}/{len(sentences)} sentences, "
+          f"{len(segments)} segment(s), ~{seconds:.0f}s")
+    return reel_script, reel_audio
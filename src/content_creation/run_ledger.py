@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import asyncio
+import shutil
+import hashlib
+import threading
+
+from src.content_creation.media_cache import file_sha1
+
+# Append-only record of every stage that produced a reel: inputs, content hashes, outputs, timings.
+RUN_LEDGER_FILE = 'run_ledger.jsonl'
+# Content-addressed copies of intermediate files (voiceovers, backgrounds, songs), so a later
+# rebuild can reuse them after the reel's temp dir is gone.
+LEDGER_ARTIFACTS_DIR = 'ledger_artifacts'
+LEDGER_ARTIFACT_RETENTION_DAYS = float(os.getenv('LEDGER_ARTIFACT_RETENTION_DAYS', '14'))
+
+_ledger_lock = threading.Lock()
+
+def append_entry(entry):
+    entry = dict(entry, ts=time.time())
+    line = json.dumps(entry, ensure_ascii=False, sort_keys=True)
+    with _ledger_lock:
+        with open(RUN_LEDGER_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+def read_entries(reel_id=None):
+    if not os.path.exists(RUN_LEDGER_FILE):
+        return []
+    entries = []
+    with open(RUN_LEDGER_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if reel_id is None or entry.get('reel') == reel_id:
+                entries.append(entry)
+    return entries
+
+def latest_stages(reel_id):
+    """The most recent record of each stage for a reel."""
+    return {e['stage']: e for e in read_entries(reel_id) if e.get('type') == 'stage'}
+
+def latest_reel(reel_id):
+    reels = [e for e in read_entries(reel_id) if e.get('type') == 'reel']
+    return reels[-1] if reels else None
+
+def hash_inputs(inputs):
+    payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def content_hash(path):
+    """Hash used when a stage input is a file: callers put this in `inputs` instead of the path."""
+    return file_sha1(path) if path and os.path.exists(path) else None
+
+def store_artifact(path, sha1):
+    """Keeps a copy of path under LEDGER_ARTIFACTS_DIR/<sha1><ext> (hard link when possible)."""
+    os.makedirs(LEDGER_ARTIFACTS_DIR, exist_ok=True)
+    artifact = os.path.join(LEDGER_ARTIFACTS_DIR, sha1 + os.path.splitext(path)[1])
+    if not os.path.exists(artifact):
+        try:
+            os.link(path, artifact)
+        except OSError:
+            shutil.copy2(path, artifact)
+    os.utime(artifact)
+    return artifact
+
+def prune_artifacts(retention_days=None):
+    """Deletes stored artifacts that no stage has stored or reused within the retention period."""
+    retention_days = LEDGER_ARTIFACT_RETENTION_DAYS if retention_days is None else retention_days
+    if not os.path.isdir(LEDGER_ARTIFACTS_DIR):
+        return
+    cutoff = time.time() - retention_days * 24 * 60 * 60
+    for name in os.listdir(LEDGER_ARTIFACTS_DIR):
+        path = os.path.join(LEDGER_ARTIFACTS_DIR, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            print(f"[LEDGER] Pruned artifact {name}")
+
+def upload_inputs(platform, video_path, **params):
+    """Ledger inputs of an upload stage: the platform, the upload parameters and the video's content hash."""
+    return dict(params, platform=platform, video=content_hash(video_path))
+
+class ReelRun:
+    """
+    Runs and records the stages of one reel (identified by its final output path).
+    In replay mode a stage whose inputs hash matches its last recorded run is not executed:
+    its recorded outputs are returned instead, Make-style. A changed input re-runs that stage,
+    and since its outputs then hash differently, every stage downstream of it too.
+    """
+    def __init__(self, reel_id, replay=False):
+        self.reel_id = reel_id
+        self.replay = replay
+        self.run_id = f"{int(time.time() * 1000):x}"
+        self.previous = latest_stages(reel_id) if replay else {}
+
+    def describe(self, kind, args):
+        """Records how the reel was requested, so a rebuild can call the pipeline the same way."""
+        append_entry({'type': 'reel', 'reel': self.reel_id, 'run': self.run_id, 'kind': kind, 'args': args})
+
+    def reuse(self, name, inputs):
+        """Outputs of the last run of stage `name` if its inputs were identical and its files still exist."""
+        record = self.previous.get(name)
+        if not record or record['input_hash'] != hash_inputs(inputs):
+            return None
+        outputs = dict(record['outputs'])
+        for key, info in record.get('files', {}).items():
+            artifact, path = info.get('artifact'), info.get('path')
+            if artifact and os.path.exists(artifact):
+                # A reuse counts as a use: prune_artifacts() keeps it for another retention period.
+                os.utime(artifact)
+                outputs[key] = artifact
+            elif path and os.path.exists(path) and content_hash(path) == info['sha1']:
+                outputs[key] = path
+            else:
+                return None
+        print(f"[LEDGER] {name}: inputs unchanged, reusing previous output")
+        return outputs
+
+    def record(self, name, inputs, outputs, started, files=(), store=True):
+        """
+        Appends a stage run to the ledger. `files` names the outputs that are file paths;
+        they are hashed and, with `store`, kept as artifacts. Returns outputs.
+        """
+        seconds = time.time() - started
+        file_info = {}
+        for key in files:
+            path = outputs.get(key)
+            if not path or not os.path.exists(path):
+                continue
+            sha1 = file_sha1(path)
+            file_info[key] = {'path': path, 'sha1': sha1}
+            if store:
+                file_info[key]['artifact'] = store_artifact(path, sha1)
+        append_entry({
+            'type': 'stage', 'reel': self.reel_id, 'run': self.run_id, 'stage': name,
+            'inputs': inputs, 'input_hash': hash_inputs(inputs),
+            'outputs': {k: v for k, v in outputs.items() if k not in file_info},
+            'files': file_info, 'started_at': started, 'seconds': round(seconds, 3),
+        })
+        print(f"[LEDGER] {name}: ran in {seconds:.1f}s")
+        return outputs
+
+    def stage(self, name, inputs, func, files=(), store=True):
+        """Runs func() -> outputs dict for stage `name`, unless an identical earlier run can be reused."""
+        outputs = self.reuse(name, inputs)
+        if outputs is None:
+            started = time.time()
+            outputs = self.record(name, inputs, func(), started, files, store)
+        return outputs
+
+    async def astage(self, name, inputs, coro_func, files=(), store=True):
+        """stage() for coroutine functions. Output files are hashed on an executor thread."""
+        loop = asyncio.get_running_loop()
+        outputs = await loop.run_in_executor(None, self.reuse, name, inputs)
+        if outputs is None:
+            started = time.time()
+            result = await coro_func()
+            outputs = await loop.run_in_executor(None, self.record, name, inputs, result, started, files, store)
+        return outputs
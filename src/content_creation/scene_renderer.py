@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import math
+import hashlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.content_creation.script_generator import parse_script_to_dialogues
+from src.content_creation.voice_generator import generate_multi_voice
+from src.content_creation.duration_model import probe_duration
+from src.content_creation.creator import generate_blender_script, download_backgrounds
+from src.content_creation.background_store import background_for
+from src.utils.json_files import load_json, save_json
+
+BLENDER_BINARY = os.getenv('BLENDER_BINARY', 'blender')
+BLENDER_ASSETS_DIR = os.getenv('BLENDER_ASSETS_DIR', 'assets')
+SCENE_FPS = 24
+# Dialogue lines per scene; the location changes between scenes.
+LINES_PER_SCENE = int(os.getenv('LINES_PER_SCENE', '4'))
+# Each scene is split into frame ranges of this size so one long scene still uses every worker.
+FRAMES_PER_JOB = int(os.getenv('FRAMES_PER_JOB', '120'))
+# Blender processes run side by side; each gets an equal share of the cores.
+SCENE_RENDER_WORKERS = int(os.getenv('SCENE_RENDER_WORKERS', str(max(1, (os.cpu_count() or 2) // 4))))
+
+SCENE_LOCATIONS = ['Japan', 'India', 'China']
+LOCATION_KEYWORDS = {
+    'Japan': ('japan', 'tokyo', 'जापान', 'टोक्यो'),
+    'India': ('india', 'delhi', 'mumbai', 'भारत', 'दिल्ली', 'मुंबई'),
+    'China': ('china', 'beijing', 'चीन', 'बीजिंग'),
+}
+# Records what each rendered scene was made from, so re-runs only render changed scenes.
+SCENE_MANIFEST_FILE = 'scenes.json'
+
+def scene_location(lines, scene_index):
+    """Location named in the scene's dialogue, or the next one in the Japan/India/China rotation."""
+    text = ' '.join(line for _, line in lines).lower()
+    for location, keywords in LOCATION_KEYWORDS.items():
+        if any(k in text for k in keywords):
+            return location
+    return SCENE_LOCATIONS[scene_index % len(SCENE_LOCATIONS)]
+
+def split_into_scenes(dialogues, lines_per_scene=LINES_PER_SCENE):
+    """Groups (character, line) pairs into scenes: [{'id', 'location', 'characters', 'line_indexes'}]."""
+    scenes = []
+    for scene_index, start in enumerate(range(0, len(dialogues), lines_per_scene)):
+        indexes = list(range(start, min(start + lines_per_scene, len(dialogues))))
+        lines = [dialogues[i] for i in indexes]
+        characters = list(dict.fromkeys(c for c, _ in lines))
+        scenes.append({
+            'id': scene_index + 1,
+            'location': scene_location(lines, scene_index),
+            'characters': characters,
+            'line_indexes': indexes,
+        })
+    return scenes
+
+def scene_fingerprint(scene, dialogues, frame_count):
+    payload = json.dumps({
+        'location': scene['location'],
+        'lines': [dialogues[i] for i in scene['line_indexes']],
+        'frames': frame_count,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def load_manifest(output_dir):
+    return load_json(os.path.join(output_dir, SCENE_MANIFEST_FILE))
+
+def save_manifest(output_dir, manifest):
+    save_json(os.path.join(output_dir, SCENE_MANIFEST_FILE), manifest, indent=2)
+
+def concat_files(paths, output_path, work_dir, extra_args=()):
+    """Joins media files with ffmpeg's concat demuxer."""
+    list_path = os.path.join(work_dir, os.path.basename(output_path) + '.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+                   + list(extra_args) + [output_path], check=True)
+    os.remove(list_path)
+    return output_path
+
+def frame_ranges(frame_count, frames_per_job=FRAMES_PER_JOB):
+    return [(start, min(start + frames_per_job - 1, frame_count))
+            for start in range(1, frame_count + 1, frames_per_job)]
+
+def part_complete(path, frame_start, frame_end):
+    """
+    Whether a rendered frame range is usable: the file exists and ffprobe reads a duration covering
+    its frames (one frame of slack). A part cut short by a killed job fails this and is re-rendered.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        duration = probe_duration(path)
+    except (subprocess.CalledProcessError, ValueError):
+        return False
+    return duration >= (frame_end - frame_start) / SCENE_FPS
+
+def run_blender_job(script_path, frame_start, frame_end, output_path, threads):
+    """Renders one frame range headless. Runs in a worker process."""
+    # Without --python-exit-code Blender exits 0 even when the scene script raised.
+    subprocess.run([
+        BLENDER_BINARY, '--background', '--threads', str(threads), '--python-exit-code', '1',
+        '--python', script_path, '--', str(frame_start), str(frame_end), output_path
+    ], check=True, stdout=subprocess.DEVNULL)
+    if not part_complete(output_path, frame_start, frame_end):
+        raise RuntimeError(f"Blender finished but {output_path} is missing or incomplete")
+    return output_path
+
+def render_movie(script, output_dir='movie', workers=SCENE_RENDER_WORKERS):
+    """
+    Turns a multi-character script into a movie: per-line voices, one Blender script per scene,
+    headless renders of every scene's frame ranges across a process pool, then each scene is
+    joined with its dialogue audio and the scenes are concatenated into movie.mp4.
+    Scenes whose inputs have not changed since the last run are not rendered again.
+    """
+    dialogues = parse_script_to_dialogues(script)
+    if not dialogues:
+        raise ValueError("Script has no 'CHARACTER: line' dialogues to render.")
+    audio_dir = os.path.join(output_dir, 'audio')
+    scripts_dir = os.path.join(output_dir, 'blender_scripts')
+    parts_dir = os.path.join(output_dir, 'parts')
+    for d in (audio_dir, scripts_dir, parts_dir):
+        os.makedirs(d, exist_ok=True)
+
+    audio_files = generate_multi_voice(dialogues, audio_dir, skip_existing=True)
+    try:
+        download_backgrounds()
+    except Exception as e:
+        print(f"[SCENES] Background sync failed, using cached backgrounds: {e}")
+    manifest = load_manifest(output_dir)
+    scenes = split_into_scenes(dialogues)
+    jobs = []
+    for scene in scenes:
+        scene_id = scene['id']
+        line_audio = [audio_files[i] for i in scene['line_indexes']]
+        scene['audio'] = concat_files(line_audio, os.path.join(audio_dir, f"scene_{scene_id:02d}.m4a"),
+                                      audio_dir, ['-c:a', 'aac', '-b:a', '192k'])
+        frame_count = max(1, math.ceil(probe_duration(scene['audio']) * SCENE_FPS))
+        scene['video'] = os.path.join(output_dir, f"scene_{scene_id:02d}_{scene['location']}.mp4")
+        scene['fingerprint'] = scene_fingerprint(scene, dialogues, frame_count)
+        if os.path.exists(scene['video']) and manifest.get(str(scene_id)) == scene['fingerprint']:
+            print(f"[SCENES] Scene {scene_id} ({scene['location']}) already rendered, skipping")
+            scene['parts'] = []
+            continue
+        blender_script = generate_blender_script(scene_id, scene['location'], scene['characters'],
+                                                 [os.path.abspath(a) for a in line_audio], scripts_dir,
+                                                 frame_count=frame_count, fps=SCENE_FPS, assets_dir=BLENDER_ASSETS_DIR,
+                                                 background_image=background_for(scene['location'], 'landscape', choice=scene_id))
+        scene['parts'] = []
+        for start, end in frame_ranges(frame_count):
+            part = os.path.join(parts_dir, f"scene_{scene_id:02d}_{scene['fingerprint'][:8]}_{start:05d}-{end:05d}.mp4")
+            scene['parts'].append(part)
+            if not part_complete(part, start, end):
+                jobs.append((blender_script, start, end, part))
+
+    threads = max(1, (os.cpu_count() or 2) // max(1, workers))
+    print(f"[SCENES] {len(scenes)} scenes, {len(jobs)} frame ranges to render on {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_blender_job, *job, threads): job for job in jobs}
+        for future in as_completed(futures):
+            _, start, end, part = futures[future]
+            future.result()
+            print(f"[SCENES] Rendered frames {start}-{end}: {part}")
+
+    for scene in scenes:
+        if not scene['parts']:
+            continue
+        silent_path = os.path.join(parts_dir, f"scene_{scene['id']:02d}_silent.mp4")
+        concat_files(scene['parts'], silent_path, parts_dir, ['-c', 'copy'])
+        # Muxed under a temporary name so an interrupted run never leaves a truncated scene behind.
+        partial_path = os.path.join(output_dir, '.muxing_' + os.path.basename(scene['video']))
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', silent_path, '-i', scene['audio'],
+                        '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-shortest', partial_path], check=True)
+        os.replace(partial_path, scene['video'])
+        for path in scene['parts'] + [silent_path]:
+            os.remove(path)
+        manifest[str(scene['id'])] = scene['fingerprint']
+        save_manifest(output_dir, manifest)
+
+    movie_path = concat_files([s['video'] for s in scenes], os.path.join(output_dir, 'movie.mp4'),
+                              output_dir, ['-c', 'copy', '-movflags', '+faststart'])
+    print(f"[SCENES] Movie assembled: {movie_path}")
+    return movie_path
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.content_creation.scene_renderer SCRIPT_FILE [OUTPUT_DIR]")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        render_movie(f.read(), sys.argv[2] if len(sys.argv) > 2 else 'movie')
@@ -1,8 +1,13 @@
 import os
+import sys
+import json
+import threading
 import google.generativeai as genai
 from dotenv import load_dotenv
 import requests
 import re
+from src.utils.rate_limiter import guarded_call, is_available
+from src.utils.json_files import load_json, save_json
 
 # Helper for Hugging Face Inference API
 HF_API_URL = "https://api-inference.huggingface.co/models/google/flan-t5-base"
@@ -10,7 +15,7 @@ def generate_script_hf(prompt: str) -> str:
     headers = {"Accept": "application/json"}
     # Optionally, add 'Authorization': f'Bearer {os.getenv("HF_API_KEY")}' if you have a key
     payload = {"inputs": prompt}
-    response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=60)
+    response = guarded_call('huggingface', requests.post, HF_API_URL, headers=headers, json=payload, timeout=60)
     response.raise_for_status()
     data = response.json()
     # Hugging Face returns a list of dicts with 'generated_text'
@@ -21,6 +26,9 @@ def generate_script_hf(prompt: str) -> str:
     else:
         return str(data)
 
+# A dialogue script line: CHARACTER: dialogue
+_DIALOGUE_LINE_RE = re.compile(r"([A-Za-z0-9_\- ]+):\s*(.+)")
+
 def parse_script_to_dialogues(script: str):
     """
     Parses a script into a list of (character, dialogue) tuples.
@@ -28,24 +36,81 @@ def parse_script_to_dialogues(script: str):
     """
     dialogues = []
     for line in script.splitlines():
-        match = re.match(r"([A-Za-z0-9_\- ]+):\s*(.+)", line)
+        match = _DIALOGUE_LINE_RE.match(line)
         if match:
             character, dialogue = match.groups()
             dialogues.append((character.strip(), dialogue.strip()))
     return dialogues
 
-def generate_script(topic: str, duration: int) -> str:
+# Scripts generated ahead of time (e.g. by generate_scripts_batch), consumed by generate_script.
+SCRIPT_CACHE_FILE = 'script_cache.json'
+SCRIPT_BATCH_SIZE = int(os.getenv('SCRIPT_BATCH_SIZE', '5'))
+# A batched script shorter than this fraction of the target word count is treated as malformed.
+MIN_BATCH_WORD_RATIO = 0.4
+
+def _cache_key(topic, duration):
+    return f"{duration}:{' '.join(topic.lower().split())}"
+
+# Cycle branches generate and consume scripts on executor threads at the same time.
+_script_cache_lock = threading.Lock()
+
+def load_script_cache():
+    return load_json(SCRIPT_CACHE_FILE)
+
+def save_script_cache(cache):
+    save_json(SCRIPT_CACHE_FILE, cache, ensure_ascii=False, indent=2)
+
+def cache_script(topic, duration, script):
+    with _script_cache_lock:
+        cache = load_script_cache()
+        cache[_cache_key(topic, duration)] = script
+        save_script_cache(cache)
+
+def pop_cached_script(topic, duration):
+    """Returns and removes a cached script, so every render still gets a fresh one."""
+    with _script_cache_lock:
+        cache = load_script_cache()
+        script = cache.pop(_cache_key(topic, duration), None)
+        if script is not None:
+            save_script_cache(cache)
+    return script
+
+def is_dialogue_topic(topic):
+    return 'anime' in topic.lower() or 'movie' in topic.lower()
+
+def spoken_text(script, topic):
+    """
+    The words of script that are actually voiced. Dialogue scripts lose the CHARACTER: label at
+    the start of each line (the same rule parse_script_to_dialogues uses); narration is returned
+    unchanged, so a colon inside a sentence ("Tip: ...") is never taken for a speaker.
+    """
+    if not script or not is_dialogue_topic(topic):
+        return script
+    lines = []
+    for line in script.splitlines():
+        match = _DIALOGUE_LINE_RE.match(line)
+        lines.append(match.group(2).strip() if match else line)
+    return '\n'.join(lines)
+
+def generate_script(topic: str, duration: int, use_cache: bool = True) -> str:
     """
     Generate a detailed script in Hindi for a video of a specific duration.
-    Tries Gemini API first, then falls back to Hugging Face Inference API (flan-t5-base).
+    Uses a cached script from a batch run if one exists, otherwise tries Gemini API first,
+    then falls back to Hugging Face Inference API (flan-t5-base).
 
     Args:
         topic (str): The topic for the script (can be in English).
         duration (int): The target duration of the video in seconds.
+        use_cache (bool): Whether a pre-generated script may be used.
 
     Returns:
         str: The generated script in Hindi.
     """
+    if use_cache:
+        cached = pop_cached_script(topic, duration)
+        if cached:
+            print(f"[generate_script] Used cached script for topic: {topic}")
+            return cached
     load_dotenv()
     api_key = os.getenv('GOOGLE_API_KEY')
     if not api_key:
@@ -59,7 +124,7 @@ def generate_script(topic: str, duration: int) -> str:
     target_words = int(duration * words_per_second)
 
     # If anime/movie, generate a multi-character script
-    if 'anime' in topic.lower() or 'movie' in topic.lower():
+    if is_dialogue_topic(topic):
         prompt = f"""
         Write a detailed script for a short animated movie in Hindi with at least 3 named characters. Each line should be in the format: CHARACTER: dialogue. The script should be about '{topic}'.
         The script should include:
@@ -90,15 +155,17 @@ def generate_script(topic: str, duration: int) -> str:
         कृपया केवल अंतिम स्क्रिप्ट का हिंदी टेक्स्ट ही प्रदान करें।
         """
 
-    # Try Gemini API first
-    if api_key:
+    # Try Gemini API first (skipped while its circuit is open after repeated failures)
+    if api_key and is_available('gemini'):
         try:
-            response = model.generate_content(prompt)
+            response = guarded_call('gemini', model.generate_content, prompt)
             script = response.text.strip()
             print(f"[generate_script] Used Gemini API for topic: {topic}")
             return script
         except Exception as e:
             print(f"[generate_script] Gemini API failed: {e}\nFalling back to Hugging Face Inference API.")
+    elif api_key:
+        print("[generate_script] Gemini circuit is open. Using Hugging Face Inference API.")
     else:
         print("[generate_script] GOOGLE_API_KEY not set. Using Hugging Face Inference API.")
     # Fallback: Hugging Face
@@ -110,7 +177,97 @@ def generate_script(topic: str, duration: int) -> str:
         print(f"[generate_script] Hugging Face API failed: {e}")
         raise RuntimeError("Both Gemini and Hugging Face script generation failed.")
 
-if __name__ == "__main__":
+def _parse_batch_response(text):
+    """Extracts the JSON array from a batch response, tolerating code fences around it."""
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end == -1:
+        return []
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return []
+    return data if isinstance(data, list) else []
+
+def generate_scripts_batch(topics, duration: int, batch_size: int = SCRIPT_BATCH_SIZE):
+    """
+    Generates Hindi scripts for many topics with one Gemini request per batch_size topics,
+    asking for a JSON array of {"topic", "script"} objects. Valid entries go into the script cache;
+    missing or malformed ones (and anime/movie topics, which use the dialogue prompt) fall back
+    to per-topic generate_script calls. Returns {topic: script}.
+    """
+    load_dotenv()
+    api_key = os.getenv('GOOGLE_API_KEY')
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable not set.")
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel('gemini-1.5-flash', generation_config={'response_mime_type': 'application/json'})
+    target_words = int(duration * 2.5)
+
+    results = {}
+    narrated = [t for t in dict.fromkeys(topics) if not is_dialogue_topic(t)]
+    for i in range(0, len(narrated), batch_size):
+        batch = narrated[i:i + batch_size]
+        topic_list = '\n'.join(f"- {t}" for t in batch)
+        prompt = f"""
+        नीचे दिए गए हर विषय के लिए {int(duration / 60)} मिनट के यूट्यूब वीडियो की एक अलग, विस्तृत और आकर्षक स्क्रिप्ट लिखें।
+
+        विषय:
+        {topic_list}
+
+        हर स्क्रिप्ट: केवल हिंदी, लगभग {target_words} शब्द, संरचना — आकर्षक परिचय, 3-4 मुख्य भाग, निष्कर्ष और कॉल-टू-एक्शन।
+        स्क्रिप्ट स्वाभाविक और बातचीत की शैली में हो।
+
+        Output only a JSON array with one object per topic, in the same order:
+        [{{"topic": "<topic exactly as given>", "script": "<Hindi script text>"}}]
+        """
+        entries = []
+        if is_available('gemini'):
+            try:
+                response = guarded_call('gemini', model.generate_content, prompt)
+                entries = _parse_batch_response(response.text)
+                print(f"[generate_scripts_batch] Gemini returned {len(entries)} scripts for {len(batch)} topics")
+            except Exception as e:
+                print(f"[generate_scripts_batch] Batch request failed: {e}")
+        by_topic = {
+            e.get('topic', '').strip().lower(): e.get('script', '').strip()
+            for e in entries if isinstance(e, dict)
+        }
+        for topic in batch:
+            script = by_topic.get(topic.strip().lower(), '')
+            if len(script.split()) >= target_words * MIN_BATCH_WORD_RATIO:
+                cache_script(topic, duration, script)
+                results[topic] = script
+    for topic in dict.fromkeys(topics):
+        if topic in results:
+            continue
+        try:
+            script = generate_script(topic, duration, use_cache=False)
+        except Exception as e:
+            print(f"[generate_scripts_batch] Skipping '{topic}': {e}")
+            continue
+        cache_script(topic, duration, script)
+        results[topic] = script
+    return results
+
+def load_topics_file(path):
+    """Reads 'CATEGORY: topic' lines (e.g. 1000_fallback_topics.txt) into a de-duplicated topic list."""
+    topics = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            _, sep, topic = line.strip().partition(':')
+            topic = topic.strip() if sep else line.strip()
+            if topic:
+                topics.append(topic)
+    return list(dict.fromkeys(topics))
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == '--batch':
+    # Overnight cache warm-up: python -m src.content_creation.script_generator --batch 1000_fallback_topics.txt [seconds]
+    load_dotenv()
+    batch_topics = load_topics_file(sys.argv[2] if len(sys.argv) > 2 else '1000_fallback_topics.txt')
+    batch_duration = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+    scripts = generate_scripts_batch(batch_topics, batch_duration)
+    print(f"Cached {len(scripts)} of {len(batch_topics)} scripts in {SCRIPT_CACHE_FILE}")
+elif __name__ == "__main__":
     load_dotenv()
     print("\nTesting 1-minute Hindi Script Generation:")
     print("-" * 50)
@@ -0,0 +1,116 @@
+import sys
+import json
+import subprocess
+import numpy as np
+
+# Backgrounds are analysed once, on a small grayscale copy sampled a few times per second.
+ANALYSIS_WIDTH = 96
+ANALYSIS_FPS = 4
+# Luma histogram distance (0-1) between consecutive samples that counts as a cut.
+SHOT_CUT_THRESHOLD = 0.35
+HISTOGRAM_BINS = 16
+# Samples darker/brighter than this, or flatter than MIN_CONTRAST (fades, title cards, logo slates),
+# should not appear in a reel.
+MIN_BRIGHTNESS = 20.0
+MAX_BRIGHTNESS = 240.0
+MIN_CONTRAST = 12.0
+TARGET_BRIGHTNESS = 125.0
+# Mean absolute luma change per sample at which motion stops adding to a sample's score.
+MOTION_TARGET = 8.0
+# Score bonus for a segment that starts on a shot boundary instead of mid-shot.
+SHOT_START_BONUS = 0.5
+
+def read_frames(video_path, width=ANALYSIS_WIDTH, fps=ANALYSIS_FPS):
+    """Decodes video_path once as a downscaled grayscale stream at fps. Returns (N, H, W) uint8."""
+    probe = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height', '-of', 'json', video_path
+    ], stdout=subprocess.PIPE, check=True)
+    stream = json.loads(probe.stdout)['streams'][0]
+    height = max(2, round(width * stream['height'] / stream['width'] / 2) * 2)
+    result = subprocess.run([
+        'ffmpeg', '-loglevel', 'error', '-i', video_path,
+        '-vf', f"fps={fps},scale={width}:{height}", '-an',
+        '-f', 'rawvideo', '-pix_fmt', 'gray', '-'
+    ], stdout=subprocess.PIPE, check=True)
+    frames = np.frombuffer(result.stdout, dtype=np.uint8)
+    count = frames.size // (width * height)
+    return frames[:count * width * height].reshape(count, height, width)
+
+def frame_stats(frames):
+    """
+    Per-sample brightness, contrast and motion plus the histogram distance to the previous sample,
+    for a (N, H, W) batch in one vectorized pass. The first sample's motion and distance are 0.
+    """
+    f = frames.astype(np.float64)
+    brightness = f.mean(axis=(1, 2))
+    contrast = f.std(axis=(1, 2))
+    motion = np.zeros(len(f))
+    motion[1:] = np.abs(f[1:] - f[:-1]).mean(axis=(1, 2))
+    # All histograms at once: offset each frame's bin numbers so one bincount covers the batch.
+    bins = (frames // (256 // HISTOGRAM_BINS)).reshape(len(frames), -1).astype(np.int64)
+    bins += np.arange(len(frames))[:, None] * HISTOGRAM_BINS
+    hist = np.bincount(bins.ravel(), minlength=len(frames) * HISTOGRAM_BINS).reshape(len(frames), HISTOGRAM_BINS)
+    hist = hist / max(1, bins.shape[1])
+    distance = np.zeros(len(f))
+    distance[1:] = 0.5 * np.abs(hist[1:] - hist[:-1]).sum(axis=1)
+    return brightness, contrast, motion, distance
+
+def analyze_background(video_path):
+    """
+    The shot index stored with a media cache entry: sample rate, shot start times (s) and
+    per-sample brightness/contrast/motion, rounded for the JSON index.
+    """
+    frames = read_frames(video_path)
+    if not len(frames):
+        raise ValueError(f"No frames decoded from {video_path}")
+    brightness, contrast, motion, distance = frame_stats(frames)
+    cuts = np.flatnonzero(distance > SHOT_CUT_THRESHOLD)
+    shots = [0.0] + [round(float(i) / ANALYSIS_FPS, 2) for i in cuts]
+    print(f"[SHOTS] {len(shots)} shot(s) in {len(frames) / ANALYSIS_FPS:.0f}s of {video_path}")
+    return {
+        'fps': ANALYSIS_FPS,
+        'duration': round(len(frames) / ANALYSIS_FPS, 2),
+        'shots': shots,
+        'brightness': np.round(brightness, 1).tolist(),
+        'contrast': np.round(contrast, 1).tolist(),
+        'motion': np.round(motion, 1).tolist(),
+    }
+
+def sample_scores(shots):
+    """How usable each sample is as reel footage: well exposed, textured, moving. Unusable samples score -1."""
+    brightness = np.asarray(shots['brightness'])
+    contrast = np.asarray(shots['contrast'])
+    motion = np.asarray(shots['motion'])
+    exposure = 1.0 - np.minimum(np.abs(brightness - TARGET_BRIGHTNESS) / TARGET_BRIGHTNESS, 1.0)
+    score = exposure * np.minimum(contrast / 40.0, 1.0) * (0.5 + 0.5 * np.minimum(motion / MOTION_TARGET, 1.0))
+    unusable = (brightness < MIN_BRIGHTNESS) | (brightness > MAX_BRIGHTNESS) | (contrast < MIN_CONTRAST)
+    return np.where(unusable, -1.0, score)
+
+def pick_segment(shots, length):
+    """
+    Start time (s) of the best contiguous `length`-second segment of an analysed background:
+    every window is scored at once from a cumulative sum, so fades, slates and dead footage are
+    skipped and windows starting on a cut are preferred. 0 when there is no index or no room.
+    """
+    if not shots or not shots.get('brightness'):
+        return 0.0
+    fps = shots['fps']
+    scores = sample_scores(shots)
+    window = int(round(length * fps))
+    if window <= 0 or window >= len(scores):
+        return 0.0
+    totals = np.concatenate(([0.0], np.cumsum(scores)))
+    window_scores = totals[window:] - totals[:-window]
+    starts = np.asarray([int(round(t * fps)) for t in shots['shots']], dtype=np.int64)
+    starts = starts[starts < len(window_scores)]
+    window_scores[starts] += SHOT_START_BONUS
+    best = int(np.argmax(window_scores))
+    return best / fps
+
+if __name__ == '__main__':
+    # python -m src.content_creation.shot_index <video> [seconds]
+    analysis = analyze_background(sys.argv[1])
+    length = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    print(f"Shots at: {analysis['shots']}")
+    print(f"Best {length:.0f}s segment starts at {pick_segment(analysis, length):.2f}s")
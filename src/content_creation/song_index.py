@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import time
+import struct
+import threading
+
+from src.content_creation.media_cache import file_sha1
+
+# Title/artist/duration/bitrate of every song in downloaded_songs/, keyed by content hash.
+# Files are only re-read when their size or mtime changes; lookups never decode audio.
+SONGS_DIR = 'downloaded_songs'
+SONG_INDEX_FILE = 'song_index.json'
+# Lookups resync only when songs_dir's mtime changed (a song added or removed) or after this long.
+SONG_INDEX_SYNC_SECONDS = float(os.getenv('SONG_INDEX_SYNC_SECONDS', '600'))
+# Bytes read after the ID3 tag while looking for the first MPEG frame.
+FRAME_SYNC_SEARCH_BYTES = 64 * 1024
+
+# MPEG audio header tables, indexed by the header's version/layer/bitrate/sample-rate bits.
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_BITRATES[(2, 3)] = _BITRATES[(2, 2)]
+_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+_VERSIONS = {0b11: 1, 0b10: 2, 0b00: 2.5}
+_LAYERS = {0b11: 1, 0b10: 2, 0b01: 3}
+# Text frames we read, by ID3v2.2 (3-char) and v2.3/2.4 (4-char) id.
+_TEXT_FRAMES = {'TT2': 'title', 'TIT2': 'title', 'TP1': 'artist', 'TPE1': 'artist',
+                'TAL': 'album', 'TALB': 'album', 'TLE': 'length_ms', 'TLEN': 'length_ms'}
+_ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _decode_text(payload):
+    if not payload:
+        return ''
+    text = payload[1:].decode(_ENCODINGS.get(payload[0], 'latin-1'), 'replace')
+    # Multi-value frames separate values with NUL; keep the first.
+    return text.split('\x00')[0].strip()
+
+def parse_id3v2(header_and_body):
+    """Text fields of an ID3v2 tag: {'title', 'artist', 'album', 'length_ms'} (whichever are present)."""
+    major, flags = header_and_body[3], header_and_body[5]
+    body = header_and_body[10:]
+    if flags & 0x40 and major >= 3:
+        # Skip the extended header.
+        ext_size = _syncsafe(body[:4]) if major == 4 else struct.unpack('>I', body[:4])[0] + 4
+        body = body[ext_size:]
+    id_len, head_len = (3, 6) if major == 2 else (4, 10)
+    fields, pos = {}, 0
+    while pos + head_len <= len(body):
+        frame_id = body[pos:pos + id_len].decode('latin-1')
+        if not frame_id.strip('\x00') or not frame_id.isalnum():
+            break  # padding
+        size_bytes = body[pos + id_len:pos + id_len + (3 if major == 2 else 4)]
+        if major == 2:
+            size = int.from_bytes(size_bytes, 'big')
+        elif major == 4:
+            size = _syncsafe(size_bytes)
+        else:
+            size = struct.unpack('>I', size_bytes)[0]
+        payload = body[pos + head_len:pos + head_len + size]
+        pos += head_len + size
+        key = _TEXT_FRAMES.get(frame_id)
+        if key and key not in fields:
+            fields[key] = _decode_text(payload)
+    return fields
+
+def parse_id3v1(trailer):
+    if len(trailer) != 128 or trailer[:3] != b'TAG':
+        return {}
+    fields = {
+        'title': trailer[3:33].split(b'\x00')[0].decode('latin-1').strip(),
+        'artist': trailer[33:63].split(b'\x00')[0].decode('latin-1').strip(),
+        'album': trailer[63:93].split(b'\x00')[0].decode('latin-1').strip(),
+    }
+    return {k: v for k, v in fields.items() if v}
+
+def parse_mpeg_frame(data):
+    """
+    First MPEG audio frame in data: (offset, {'bitrate_kbps', 'sample_rate', 'frames'}), where
+    frames is the total frame count from a Xing/Info/VBRI header when the encoder wrote one.
+    """
+    pos = data.find(b'\xff')
+    while 0 <= pos < len(data) - 4:
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version, layer = _VERSIONS.get((b1 >> 3) & 0b11), _LAYERS.get((b1 >> 1) & 0b11)
+        bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 0b11
+        if (b1 & 0xE0) == 0xE0 and version and layer and 0 < bitrate_index < 15 and rate_index < 3:
+            bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+            sample_rate = _SAMPLE_RATES[version][rate_index]
+            mono = (b3 >> 6) == 0b11
+            info = {'bitrate_kbps': bitrate, 'sample_rate': sample_rate, 'frames': None,
+                    'samples_per_frame': 384 if layer == 1 else (1152 if layer == 2 or version == 1 else 576)}
+            # Xing/Info sits after the side information; VBRI at a fixed offset of 32.
+            side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+            xing = data[pos + 4 + side_info:pos + 4 + side_info + 12]
+            if xing[:4] in (b'Xing', b'Info') and struct.unpack('>I', xing[4:8])[0] & 0x1:
+                info['frames'] = struct.unpack('>I', xing[8:12])[0]
+            elif data[pos + 36:pos + 40] == b'VBRI':
+                info['frames'] = struct.unpack('>I', data[pos + 50:pos + 54])[0]
+            return pos, info
+        pos = data.find(b'\xff', pos + 1)
+    return None, None
+
+def read_metadata(path):
+    """
+    Title, artist, album, duration (s) and bitrate (kbps) of an MP3 from its headers only:
+    the ID3v2 tag at the start, the first MPEG frame (plus its Xing/Info/VBRI header) and the
+    ID3v1 trailer. Never decodes audio. Missing fields are None.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(10)
+        tag_size, fields = 0, {}
+        if head[:3] == b'ID3' and len(head) == 10:
+            tag_size = 10 + _syncsafe(head[6:10]) + (10 if head[5] & 0x10 else 0)
+            fields = parse_id3v2(head + f.read(tag_size - 10))
+        f.seek(tag_size)
+        offset, frame = parse_mpeg_frame(f.read(FRAME_SYNC_SEARCH_BYTES))
+        f.seek(max(0, size - 128))
+        trailer = f.read(128)
+    v1 = parse_id3v1(trailer)
+    for key, value in v1.items():
+        fields.setdefault(key, value)
+
+    duration, bitrate = None, None
+    if fields.get('length_ms', '').isdigit():
+        duration = int(fields['length_ms']) / 1000.0
+    if frame:
+        audio_bytes = size - tag_size - offset - (128 if v1 else 0)
+        if frame['frames']:
+            duration = duration or frame['frames'] * frame['samples_per_frame'] / frame['sample_rate']
+            bitrate = round(audio_bytes * 8 / duration / 1000) if duration else frame['bitrate_kbps']
+        else:
+            bitrate = frame['bitrate_kbps']
+            duration = duration or audio_bytes * 8 / (bitrate * 1000)
+    return {
+        'title': fields.get('title') or None,
+        'artist': fields.get('artist') or None,
+        'album': fields.get('album') or None,
+        'duration': round(duration, 3) if duration else None,
+        'bitrate_kbps': bitrate,
+    }
+
+class SongIndex:
+    """
+    {'files': {path: {'size', 'mtime', 'sha1'}}, 'songs': {sha1: metadata}, 'urls': {source url: sha1}}
+    kept in SONG_INDEX_FILE. sync() hashes and parses only files that are new or changed.
+    """
+    def __init__(self, songs_dir=SONGS_DIR, index_file=SONG_INDEX_FILE):
+        self.songs_dir = songs_dir
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        # (songs_dir mtime, time) of the last sync; see sync_if_stale().
+        self._synced = (None, 0.0)
+        self.index = {'files': {}, 'songs': {}, 'urls': {}}
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='utf-8') as f:
+                self.index.update(json.load(f))
+
+    def _save(self):
+        tmp_path = self.index_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_file)
+
+    def _index_file(self, path):
+        stat = os.stat(path)
+        known = self.index['files'].get(path)
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+            return known['sha1'], False
+        sha1 = file_sha1(path)
+        self.index['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1}
+        if sha1 not in self.index['songs']:
+            try:
+                self.index['songs'][sha1] = read_metadata(path)
+            except (OSError, struct.error, IndexError) as e:
+                print(f"[SONGS] Could not read tags of {path}: {e}")
+                self.index['songs'][sha1] = {}
+        return sha1, True
+
+    def _dir_mtime(self):
+        return os.stat(self.songs_dir).st_mtime if os.path.isdir(self.songs_dir) else None
+
+    def sync(self):
+        """Brings the index in line with songs_dir; unchanged files cost one stat() each."""
+        synced = (self._dir_mtime(), time.time())
+        paths = set()
+        if os.path.isdir(self.songs_dir):
+            paths = {os.path.join(self.songs_dir, n) for n in os.listdir(self.songs_dir) if n.lower().endswith('.mp3')}
+        with self._lock:
+            changed = False
+            for path in paths:
+                changed |= self._index_file(path)[1]
+            for path in set(self.index['files']) - paths:
+                del self.index['files'][path]
+                changed = True
+            live = {f['sha1'] for f in self.index['files'].values()}
+            for sha1 in set(self.index['songs']) - live:
+                del self.index['songs'][sha1]
+            self.index['urls'] = {u: s for u, s in self.index['urls'].items() if s in live}
+            if changed:
+                self._save()
+            self._synced = synced
+        return self
+
+    def sync_if_stale(self):
+        """
+        sync() only if songs_dir's mtime moved since the last sync or SONG_INDEX_SYNC_SECONDS have
+        passed (which catches files rewritten in place). Otherwise one stat() of the directory.
+        """
+        dir_mtime, synced_at = self._synced
+        if self._dir_mtime() != dir_mtime or time.time() - synced_at > SONG_INDEX_SYNC_SECONDS:
+            return self.sync()
+        return self
+
+    def register(self, path, source_url=None, title=None, artist=None):
+        """
+        Indexes a song just saved to songs_dir. source_url lets the song be looked up by the URL it
+        came from; title/artist fill in tags the file itself does not carry.
+        """
+        with self._lock:
+            sha1, _ = self._index_file(path)
+            song = self.index['songs'][sha1]
+            song['title'] = song.get('title') or title
+            song['artist'] = song.get('artist') or artist
+            if source_url:
+                self.index['urls'][source_url] = sha1
+            self._save()
+        return song
+
+    def lookup(self, path_or_url):
+        """Metadata of an indexed song by file path or source URL, or None. A dict lookup; no file I/O."""
+        with self._lock:
+            entry = self.index['files'].get(path_or_url)
+            sha1 = entry['sha1'] if entry else self.index['urls'].get(path_or_url)
+            song = self.index['songs'].get(sha1) if sha1 else None
+            if song is not None and not song.get('title'):
+                # Untagged file: fall back to its name, e.g. 'sidhu_goat.mp3' -> 'Sidhu Goat'.
+                name = next((p for p, f in self.index['files'].items() if f['sha1'] == sha1), '')
+                song = dict(song, title=os.path.splitext(os.path.basename(name))[0].replace('_', ' ').title() or None)
+        return song
+
+_index = None
+
+def get_index():
+    """
+    The shared song index, synced with downloaded_songs/ on first use (startup); callers use
+    sync_if_stale() before a lookup rather than a full sync().
+    """
+    global _index
+    if _index is None:
+        _index = SongIndex().sync()
+    return _index
+
+if __name__ == '__main__':
+    index = SongIndex(sys.argv[1] if len(sys.argv) > 1 else SONGS_DIR).sync()
+    for path in sorted(index.index['files']):
+        song = index.lookup(path)
+        print(f"{os.path.basename(path):30} {song.get('title')!s:30} {song.get('artist')!s:20} "
+              f"{song.get('duration')}s {song.get('bitrate_kbps')}kbps")
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+from src.content_creation.encode_planner import plan_encode, RENDER_FPS
+from src.content_creation.subtitles import subtitle_filter
+
+# Hard ceiling on the heap of one render job (RLIMIT_DATA on the ffmpeg process). 0 disables it.
+RENDER_MEMORY_LIMIT_MB = int(os.getenv('RENDER_MEMORY_LIMIT_MB', '1536'))
+# util-linux tool that applies the limit to the render process before it starts.
+PRLIMIT_BINARY = os.getenv('PRLIMIT_BINARY', 'prlimit')
+# Bounded queues between demuxers, encoder and muxer; ffmpeg's defaults grow with the input.
+INPUT_QUEUE_PACKETS = 64
+MUXING_QUEUE_PACKETS = 256
+# x264 keeps this many raw frames in flight for rate control; it dominates encoder memory at 1080p.
+RC_LOOKAHEAD_FRAMES = 20
+
+# Peak RSS per job measured by benchmark_render_memory(), used to size the render pool.
+RENDER_MEMORY_FILE = 'render_memory.json'
+
+def _concat_input(video_paths, work_dir, start=0.0):
+    """
+    ffmpeg input args for the backgrounds; several clips are joined with the concat demuxer (no re-decode).
+    `start` seeks the input; with one-second GOPs in the mezzanine files that decodes at most a second extra.
+    """
+    seek = ['-ss', f"{start:.3f}"] if start else []
+    if len(video_paths) == 1:
+        return seek + ['-i', video_paths[0]]
+    list_path = os.path.join(work_dir, 'backgrounds.txt')
+    with open(list_path, 'w') as f:
+        for path in video_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    return seek + ['-f', 'concat', '-safe', '0', '-i', list_path]
+
+def streaming_command(video_paths, soundtrack, output_path, duration, encode_settings, work_dir, subtitles=None, start=0.0):
+    """
+    One ffmpeg process: background frames and the finished soundtrack are piped straight to the muxer.
+    If an ASS file is given it is burned in by libass in the same pass. The background is read from `start` seconds.
+    """
+    video_filter = f"fps={RENDER_FPS},format=yuv420p"
+    if subtitles:
+        video_filter += ',' + subtitle_filter(subtitles)
+    return (
+        ['ffmpeg', '-y', '-loglevel', 'error', '-thread_queue_size', str(INPUT_QUEUE_PACKETS)]
+        + _concat_input(video_paths, work_dir, start)
+        + ['-thread_queue_size', str(INPUT_QUEUE_PACKETS), '-i', soundtrack,
+           '-map', '0:v:0', '-map', '1:a:0', '-t', f"{duration:.3f}",
+           '-vf', video_filter,
+           '-c:v', 'libx264', '-preset', encode_settings['preset'],
+           '-threads', str(encode_settings['threads']), '-rc-lookahead', str(RC_LOOKAHEAD_FRAMES)]
+        + encode_settings['ffmpeg_params']
+        + ['-c:a', 'copy', '-max_muxing_queue_size', str(MUXING_QUEUE_PACKETS), output_path]
+    )
+
+def run_bounded(cmd, limit_mb=None):
+    """
+    Runs cmd with its data segment capped at limit_mb (default RENDER_MEMORY_LIMIT_MB) and
+    returns the child's peak RSS in MB. Raises CalledProcessError on failure, like check=True.
+    """
+    limit_mb = RENDER_MEMORY_LIMIT_MB if limit_mb is None else limit_mb
+    if limit_mb:
+        # prlimit sets the cap and then execs cmd, so the cap holds from the first allocation
+        # and no Python runs in the forked child (renders start from executor threads).
+        if shutil.which(PRLIMIT_BINARY):
+            cmd = [PRLIMIT_BINARY, f"--data={limit_mb * 1024 * 1024}", '--'] + list(cmd)
+        else:
+            print(f"[RENDER] {PRLIMIT_BINARY} not found, rendering without the {limit_mb} MB memory limit")
+    proc = subprocess.Popen(cmd)
+    # wait4 reports this child's own rusage, unlike RUSAGE_CHILDREN which mixes all jobs.
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return usage.ru_maxrss / 1024
+
+def render_streaming(video_paths, soundtrack, output_path, duration, encode_settings, work_dir, subtitles=None, start=0.0):
+    """Encodes the reel without decoding any clip into Python. Returns the job's peak RSS in MB."""
+    started = time.perf_counter()
+    peak_mb = run_bounded(streaming_command(video_paths, soundtrack, output_path, duration, encode_settings, work_dir, subtitles, start))
+    print(f"[RENDER] Streamed {duration:.0f}s to {output_path} in {time.perf_counter() - started:.0f}s, peak RSS {peak_mb:.0f} MB")
+    return peak_mb
+
+def available_memory_mb():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+def memory_pool_size(default=1):
+    """How many renders fit in available memory, from the peak RSS recorded by the benchmark."""
+    if not os.path.exists(RENDER_MEMORY_FILE):
+        return default
+    with open(RENDER_MEMORY_FILE, 'r') as f:
+        peak_mb = json.load(f).get('max_peak_rss_mb')
+    free_mb = available_memory_mb()
+    if not peak_mb or not free_mb:
+        return default
+    return max(1, int(free_mb // peak_mb))
+
+def benchmark_render_memory(jobs=2, duration=180, aspect_ratio='landscape'):
+    """
+    Renders `jobs` synthetic videos of `duration` seconds concurrently in streaming mode and
+    reports each job's peak RSS. The worst case is saved to RENDER_MEMORY_FILE.
+    """
+    size = '1920x1080' if aspect_ratio == 'landscape' else '1080x1920'
+    work_dir = tempfile.mkdtemp(prefix='render_bench_')
+    background = os.path.join(work_dir, 'background.mp4')
+    soundtrack = os.path.join(work_dir, 'soundtrack.m4a')
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', f"testsrc2=size={size}:rate={RENDER_FPS}", '-t', str(duration),
+                    '-c:v', 'libx264', '-preset', 'ultrafast', background], check=True)
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', 'sine=frequency=440:sample_rate=44100', '-t', str(duration),
+                    '-c:a', 'aac', soundtrack], check=True)
+
+    peaks = [None] * jobs
+    def job(i):
+        settings = plan_encode(duration, aspect_ratio, queue_depth=jobs)
+        output = os.path.join(work_dir, f"out_{i}.mp4")
+        peaks[i] = render_streaming([background], soundtrack, output, duration, settings, work_dir)
+
+    threads = [threading.Thread(target=job, args=(i,)) for i in range(jobs)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, peak in enumerate(peaks):
+        print(f"[RENDER] Job {i}: peak RSS {peak:.0f} MB" if peak else f"[RENDER] Job {i}: failed")
+
+    measured = [p for p in peaks if p]
+    data = {
+        'jobs': jobs,
+        'duration': duration,
+        'aspect_ratio': aspect_ratio,
+        'peak_rss_mb': peaks,
+        'max_peak_rss_mb': max(measured) if measured else None,
+        'measured_at': time.time(),
+    }
+    with open(RENDER_MEMORY_FILE, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"[RENDER] Renders that fit in available memory: {memory_pool_size()}")
+    for name in os.listdir(work_dir):
+        os.remove(os.path.join(work_dir, name))
+    os.rmdir(work_dir)
+    return data
+
+if __name__ == '__main__':
+    benchmark_render_memory(jobs=int(sys.argv[1]) if len(sys.argv) > 1 else 2)
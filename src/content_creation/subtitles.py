@@ -0,0 +1,116 @@
+import os
+
+from src.content_creation.duration_model import split_sentences
+from src.content_creation.media_cache import CACHE_PROFILES
+
+# Captions are burned in by libass during the final encode; set to False to render without them.
+BURN_SUBTITLES = os.getenv('BURN_SUBTITLES', 'True').lower() in ('true', '1', 't')
+SUBTITLE_FONT = os.getenv('SUBTITLE_FONT', 'Noto Sans Devanagari')
+# One caption shows at most this many words and never spans two sentences.
+MAX_WORDS_PER_CUE = 6
+# A sentence break costs as much time as this many characters of speech.
+SENTENCE_PAUSE_CHARS = 6
+
+# Font size and bottom margin as fractions of the frame height.
+STYLE_SCALE = {'portrait': (0.034, 0.18), 'landscape': (0.055, 0.08)}
+
+def word_timings(script, audio_duration):
+    """
+    Start/end time for every word of script, spread over the measured audio_duration.
+    TTS backends return no alignment, so time is allotted per character (the same unit the
+    duration model is calibrated in), with a short pause after each sentence.
+    Returns a list of sentences, each a list of (word, start, end).
+    Expects the spoken text: speaker labels of dialogue scripts already removed (see spoken_text).
+    """
+    sentences = [s.split() for s in split_sentences(script)]
+    sentences = [words for words in sentences if words]
+    total_chars = sum(len(w) + 1 for words in sentences for w in words) + SENTENCE_PAUSE_CHARS * len(sentences)
+    if not total_chars:
+        return []
+    per_char = audio_duration / total_chars
+    clock, timed = 0.0, []
+    for words in sentences:
+        timed_sentence = []
+        for word in words:
+            end = clock + (len(word) + 1) * per_char
+            timed_sentence.append((word, clock, end))
+            clock = end
+        timed.append(timed_sentence)
+        clock += SENTENCE_PAUSE_CHARS * per_char
+    return timed
+
+def build_cues(script, audio_duration, max_duration=None):
+    """Groups timed words into (start, end, text) captions, dropping anything past max_duration."""
+    cues = []
+    for sentence in word_timings(script, audio_duration):
+        for i in range(0, len(sentence), MAX_WORDS_PER_CUE):
+            chunk = sentence[i:i + MAX_WORDS_PER_CUE]
+            start, end = chunk[0][1], chunk[-1][2]
+            if max_duration is not None:
+                if start >= max_duration:
+                    return cues
+                end = min(end, max_duration)
+            cues.append((start, end, ' '.join(w for w, _, _ in chunk)))
+    return cues
+
+def _ass_time(seconds):
+    centis = int(round(seconds * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+def _ass_escape(text):
+    return text.replace('\\', '\\\\').replace('{', '(').replace('}', ')').replace('\n', ' ')
+
+def write_ass(cues, output_path, aspect_ratio='portrait'):
+    """Writes cues as an ASS file sized for the render geometry of aspect_ratio."""
+    profile = CACHE_PROFILES.get(aspect_ratio, CACHE_PROFILES['portrait'])
+    width, height = profile['width'], profile['height']
+    size_ratio, margin_ratio = STYLE_SCALE.get(aspect_ratio, STYLE_SCALE['portrait'])
+    font_size = int(height * size_ratio)
+    margin_v = int(height * margin_ratio)
+    lines = [
+        '[Script Info]',
+        'ScriptType: v4.00+',
+        f'PlayResX: {width}',
+        f'PlayResY: {height}',
+        'WrapStyle: 0',
+        'ScaledBorderAndShadow: yes',
+        '',
+        '[V4+ Styles]',
+        'Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, '
+        'Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, '
+        'Alignment, MarginL, MarginR, MarginV, Encoding',
+        f'Style: Default,{SUBTITLE_FONT},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,'
+        f'1,0,0,0,100,100,0,0,1,{max(2, font_size // 12)},1,2,60,60,{margin_v},1',
+        '',
+        '[Events]',
+        'Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text',
+    ]
+    for start, end, text in cues:
+        lines.append(f"Dialogue: 0,{_ass_time(start)},{_ass_time(end)},Default,,0,0,0,,{_ass_escape(text)}")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return output_path
+
+def subtitle_filter(ass_path):
+    """ffmpeg video filter that burns ass_path in with libass."""
+    escaped = ass_path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+    return f"ass='{escaped}'"
+
+def prepare_subtitles(script, audio_duration, work_dir, aspect_ratio, max_duration=None):
+    """Writes subtitles.ass for the script into work_dir; returns its path, or None if captions are off."""
+    if not BURN_SUBTITLES or not script:
+        return None
+    cues = build_cues(script, audio_duration, max_duration)
+    if not cues:
+        return None
+    path = write_ass(cues, os.path.join(work_dir, 'subtitles.ass'), aspect_ratio)
+    print(f"[SUBTITLES] {len(cues)} captions written to {path}")
+    return path
+
+if __name__ == '__main__':
+    sample = "क्या आप जानते हैं? भारत में हर साल लाखों लोग योग करते हैं। यह शरीर और मन दोनों के लिए अच्छा है। फॉलो करें!"
+    for cue in build_cues(sample, 12.0):
+        print(cue)
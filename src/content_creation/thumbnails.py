@@ -0,0 +1,86 @@
+import os
+import re
+import subprocess
+import numpy as np
+
+# Candidate frames are scored on small grayscale copies; only the winner is written at full size.
+SCORE_WIDTH = 160
+SCORE_HEIGHTS = {'portrait': 284, 'landscape': 90}
+# Brightness (0-255) we aim for; very dark or blown-out frames make poor covers.
+TARGET_BRIGHTNESS = 125.0
+
+_PTS_RE = re.compile(r'pts_time:\s*([0-9.]+)')
+
+def thumbnail_path_for(video_path):
+    """Poster frames are stored next to the video as '<video>.mp4.jpg'."""
+    return f"{video_path}.jpg"
+
+def extract_keyframes(source_path, aspect_ratio, max_time=None, start=0.0):
+    """
+    Decodes only the keyframes of source_path (ffmpeg -skip_frame nokey), downscaled to grayscale,
+    from `start` for up to max_time seconds. Returns (frames, timestamps) where frames has shape
+    (N, H, W) and timestamps are relative to start.
+    """
+    width, height = SCORE_WIDTH, SCORE_HEIGHTS.get(aspect_ratio, SCORE_HEIGHTS['portrait'])
+    cmd = ['ffmpeg', '-loglevel', 'info', '-skip_frame', 'nokey']
+    if start:
+        cmd += ['-ss', f"{start:.3f}"]
+    if max_time:
+        cmd += ['-t', str(max_time)]
+    cmd += [
+        '-i', source_path,
+        '-vf', f"scale={width}:{height},showinfo", '-vsync', '0', '-an',
+        '-f', 'rawvideo', '-pix_fmt', 'gray', '-'
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    frames = np.frombuffer(result.stdout, dtype=np.uint8)
+    count = frames.size // (width * height)
+    frames = frames[:count * width * height].reshape(count, height, width)
+    timestamps = [float(t) for t in _PTS_RE.findall(result.stderr.decode('utf-8', 'ignore'))][:count]
+    return frames, timestamps
+
+def score_frames(frames):
+    """
+    Scores a (N, H, W) batch of grayscale frames in one vectorized pass.
+    Sharpness is the variance of a 4-neighbour Laplacian; frames far from TARGET_BRIGHTNESS
+    or with little contrast are penalized.
+    """
+    f = frames.astype(np.float32)
+    laplacian = (
+        -4 * f[:, 1:-1, 1:-1]
+        + f[:, :-2, 1:-1] + f[:, 2:, 1:-1]
+        + f[:, 1:-1, :-2] + f[:, 1:-1, 2:]
+    )
+    sharpness = laplacian.var(axis=(1, 2))
+    brightness = f.mean(axis=(1, 2))
+    contrast = f.std(axis=(1, 2))
+    brightness_penalty = 1.0 - np.minimum(np.abs(brightness - TARGET_BRIGHTNESS) / TARGET_BRIGHTNESS, 1.0)
+    return np.log1p(sharpness) * brightness_penalty * np.minimum(contrast / 40.0, 1.0)
+
+def write_frame(source_path, timestamp, output_path):
+    """Writes the frame at timestamp as a JPEG, seeking straight to it instead of decoding from the start."""
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error', '-ss', f"{timestamp:.3f}", '-i', source_path,
+        '-frames:v', '1', '-q:v', '2', output_path
+    ], check=True)
+    return output_path
+
+def generate_thumbnail(source_path, video_path, aspect_ratio, max_time=None, start=0.0):
+    """
+    Picks the sharpest, best-exposed keyframe of source_path (the background the reel was cut from)
+    within the max_time seconds from `start` that the reel used, and saves it as the poster for video_path.
+    Returns the thumbnail path, or None if no usable frame was found.
+    """
+    frames, timestamps = extract_keyframes(source_path, aspect_ratio, max_time, start)
+    if not len(frames) or not timestamps:
+        print(f"[THUMBNAIL] No keyframes found in {source_path}")
+        return None
+    scores = score_frames(frames[:len(timestamps)])
+    best = int(np.argmax(scores))
+    output_path = write_frame(source_path, start + timestamps[best], thumbnail_path_for(video_path))
+    print(f"[THUMBNAIL] Picked keyframe at {start + timestamps[best]:.1f}s of {len(timestamps)}: {output_path}")
+    return output_path
+
+def existing_thumbnail(video_path):
+    path = thumbnail_path_for(video_path)
+    return path if os.path.exists(path) else None
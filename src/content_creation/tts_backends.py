@@ -0,0 +1,173 @@
+import os
+import time
+import random
+import shutil
+import threading
+import subprocess
+from dotenv import load_dotenv
+from elevenlabs import save
+from elevenlabs.client import ElevenLabs
+from gtts import gTTS
+from src.utils.rate_limiter import guarded_call, is_available
+
+DEFAULT_ELEVENLABS_VOICE = "AZnzlk1XvdvUeBnXmlld"
+DEFAULT_GTTS_TLD = 'co.in'
+GTTS_TLDS = ['co.in', 'com', 'co.uk', 'ca', 'com.au']
+
+# Offline engine. Piper is used when a Hindi voice model is configured, otherwise espeak-ng.
+PIPER_BINARY = os.getenv('PIPER_BINARY', 'piper')
+PIPER_MODEL = os.getenv('PIPER_MODEL', 'voices/hi_IN-rohan-medium.onnx')
+ESPEAK_BINARY = os.getenv('ESPEAK_BINARY', 'espeak-ng')
+ESPEAK_VOICE = os.getenv('ESPEAK_VOICE', 'hi')
+
+# A network backend expected to take longer than this for the text at hand is tried after the
+# local engine. Expectations come from its recent seconds-per-character, so a slow 3-minute
+# script and a slow one-line dialogue are judged on the same scale.
+TTS_LATENCY_BUDGET_SECONDS = float(os.getenv('TTS_LATENCY_BUDGET_SECONDS', '60'))
+# Text length assumed when the caller does not say (about a 3-minute script).
+TTS_REFERENCE_CHARS = 2000
+# Latency samples expire after this long, so a demoted backend is tried first again and
+# re-measured instead of staying demoted for the life of the process.
+TTS_LATENCY_WINDOW_SECONDS = float(os.getenv('TTS_LATENCY_WINDOW_SECONDS', '1800'))
+TTS_LATENCY_SAMPLES = 20
+
+# {backend name: [(recorded_at, seconds per character)]}
+_latencies = {}
+_latencies_lock = threading.Lock()
+
+def record_latency(name, seconds, chars):
+    with _latencies_lock:
+        samples = _latencies.get(name, []) + [(time.monotonic(), seconds / max(1, chars))]
+        _latencies[name] = samples[-TTS_LATENCY_SAMPLES:]
+
+def seconds_per_char(name):
+    """Mean seconds per character over the backend's unexpired samples, or None."""
+    cutoff = time.monotonic() - TTS_LATENCY_WINDOW_SECONDS
+    with _latencies_lock:
+        samples = [(t, v) for t, v in _latencies.get(name, []) if t >= cutoff]
+        _latencies[name] = samples
+    return sum(v for _, v in samples) / len(samples) if samples else None
+
+class TTSBackend:
+    """One way of turning text into an audio file. Subclasses implement configured() and synthesize()."""
+    name = None
+    networked = True
+
+    def configured(self):
+        """True if this backend can be used at all (keys set, binaries installed)."""
+        raise NotImplementedError
+
+    def usable(self):
+        return self.configured() and is_available(self.name)
+
+    def voice_for(self, voice_id=None):
+        """The voice this backend will use for voice_id; recorded for duration calibration."""
+        return voice_id
+
+    def synthesize(self, text, output_path, voice_id=None):
+        """Writes speech for text to output_path and returns the voice that was used."""
+        raise NotImplementedError
+
+    def speak(self, text, output_path, voice_id=None):
+        """synthesize(), recording how long it took per character of text."""
+        start = time.monotonic()
+        voice = self.synthesize(text, output_path, voice_id)
+        record_latency(self.name, time.monotonic() - start, len(text))
+        return voice
+
+class ElevenLabsBackend(TTSBackend):
+    name = 'elevenlabs'
+
+    def configured(self):
+        load_dotenv()
+        return bool(os.getenv('ELEVEN_LABS_API_KEY'))
+
+    def voice_for(self, voice_id=None):
+        return voice_id or DEFAULT_ELEVENLABS_VOICE
+
+    def synthesize(self, text, output_path, voice_id=None):
+        client = ElevenLabs(api_key=os.getenv('ELEVEN_LABS_API_KEY'))
+        hindi_voice_id = self.voice_for(voice_id)
+
+        def stream_to_file():
+            audio_stream = client.text_to_speech.stream(
+                text=text,
+                voice_id=hindi_voice_id,
+                model_id="eleven_multilingual_v2"
+            )
+            save(audio_stream, output_path)
+
+        guarded_call(self.name, stream_to_file)
+        return hindi_voice_id
+
+class GTTSBackend(TTSBackend):
+    name = 'gtts'
+
+    def configured(self):
+        return True
+
+    def voice_for(self, voice_id=None):
+        return DEFAULT_GTTS_TLD
+
+    def synthesize(self, text, output_path, voice_id=None):
+        # Use different tld for different characters for variety
+        tld = random.choice(GTTS_TLDS) if voice_id else DEFAULT_GTTS_TLD
+        tts = gTTS(text=text, lang='hi', tld=tld, slow=False)
+        guarded_call(self.name, tts.save, output_path, retries=2)
+        return tld
+
+class LocalTTSBackend(TTSBackend):
+    """CPU-only Hindi speech with Piper (if a model is installed) or espeak-ng. Needs no network."""
+    name = 'local'
+    networked = False
+
+    def _use_piper(self):
+        return bool(shutil.which(PIPER_BINARY)) and os.path.exists(PIPER_MODEL)
+
+    def configured(self):
+        return self._use_piper() or bool(shutil.which(ESPEAK_BINARY))
+
+    def voice_for(self, voice_id=None):
+        if self._use_piper():
+            return f"piper:{os.path.basename(PIPER_MODEL)}"
+        return f"espeak-ng:{ESPEAK_VOICE}"
+
+    def synthesize(self, text, output_path, voice_id=None):
+        wav_path = os.path.splitext(output_path)[0] + '.local.wav'
+
+        def run_engine():
+            if self._use_piper():
+                subprocess.run([PIPER_BINARY, '--model', PIPER_MODEL, '--output_file', wav_path],
+                               input=text.encode('utf-8'), check=True, stdout=subprocess.DEVNULL)
+            else:
+                subprocess.run([ESPEAK_BINARY, '-v', ESPEAK_VOICE, '-w', wav_path, '--stdin'],
+                               input=text.encode('utf-8'), check=True)
+            # Callers expect MP3 (voiceover.mp3); encode the WAV in place.
+            subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', wav_path,
+                            '-acodec', 'libmp3lame', output_path], check=True)
+
+        try:
+            guarded_call(self.name, run_engine)
+        finally:
+            if os.path.exists(wav_path):
+                os.remove(wav_path)
+        return self.voice_for(voice_id)
+
+# Tiers in order of preference: best quality first, offline last.
+TTS_BACKENDS = [ElevenLabsBackend(), GTTSBackend(), LocalTTSBackend()]
+
+def select_backends(text_length=None):
+    """
+    Usable backends in the order they should be tried for text_length characters. Backends with
+    an open circuit are skipped. Network backends whose recent speed would take longer than
+    TTS_LATENCY_BUDGET_SECONDS for that much text move behind the local engine until their
+    samples expire.
+    """
+    usable = [b for b in TTS_BACKENDS if b.usable()]
+    chars = text_length or TTS_REFERENCE_CHARS
+
+    def too_slow(backend):
+        rate = seconds_per_char(backend.name)
+        return backend.networked and rate is not None and rate * chars > TTS_LATENCY_BUDGET_SECONDS
+
+    return [b for b in usable if not too_slow(b)] + [b for b in usable if too_slow(b)]
@@ -1,65 +1,52 @@
 import os
 from dotenv import load_dotenv
-from elevenlabs import save
-from elevenlabs.client import ElevenLabs
 from gtts import gTTS
-import random
+from src.utils.rate_limiter import guarded_call
+from src.content_creation.tts_backends import select_backends
+
+def expected_backend(voice_id: str = None):
+    """The (backend, voice) generate_realistic_voice will try first, given keys, circuit state and latency."""
+    backends = select_backends()
+    if not backends:
+        return 'gtts', None
+    return backends[0].name, backends[0].voice_for(voice_id)
 
 def generate_realistic_voice(text: str, output_path: str, voice_id: str = None):
     """
-    Generate voice using ElevenLabs API. If it fails (e.g., quota exceeded),
-    fall back to gTTS.
+    Generate voice with the best available TTS backend: ElevenLabs, then gTTS, then the
+    offline local engine (Piper/espeak-ng). Backends with an open circuit (e.g. quota exceeded)
+    or a history of being too slow are skipped or tried last.
     
     Args:
         text (str): Text to convert to speech.
         output_path (str): The path to save the generated audio file.
         voice_id (str): Optional, for multi-character support.
+
+    Returns:
+        tuple: (backend, voice) that produced the audio, for duration calibration.
     """
     load_dotenv()
-    api_key = os.getenv('ELEVEN_LABS_API_KEY')
-    
-    # --- Attempt 1: Use ElevenLabs for high-quality voice ---
-    if api_key:
-        print(f"Attempting to generate voice with ElevenLabs{' (voice_id: ' + str(voice_id) + ')' if voice_id else ''}...")
+    backends = select_backends(len(text))
+    if not backends:
+        raise RuntimeError("No TTS backend is available (all circuits open or none configured).")
+    last_error = None
+    for backend in backends:
+        print(f"Generating voice with {backend.name}{' (voice_id: ' + str(voice_id) + ')' if voice_id else ''}...")
         try:
-            client = ElevenLabs(api_key=api_key)
-            hindi_voice_id = voice_id or "AZnzlk1XvdvUeBnXmlld" 
-
-            audio_stream = client.text_to_speech.stream(
-                text=text,
-                voice_id=hindi_voice_id,
-                model_id="eleven_multilingual_v2"
-            )
-            
-            save(audio_stream, output_path)
-            print(f"Successfully generated voice with ElevenLabs and saved to {output_path}")
-            return # Success, exit the function
+            voice = backend.speak(text, output_path, voice_id)
+            print(f"Successfully generated voice with {backend.name} and saved to {output_path}")
+            return backend.name, voice
         except Exception as e:
-            print(f"ElevenLabs API failed: {e}")
-            if 'quota_exceeded' in str(e).lower():
-                print("Your ElevenLabs quota is exceeded. Falling back to a standard voice.")
-            else:
-                print("An unknown error occurred with ElevenLabs. Falling back to a standard voice.")
-    else:
-        print("ELEVEN_LABS_API_KEY not found. Using standard voice.")
-
-    # --- Attempt 2: Fallback to gTTS ---
-    try:
-        print(f"Generating voice with gTTS as a fallback{' (voice_id: ' + str(voice_id) + ')' if voice_id else ''}...")
-        # Use different tld or slow for different characters for variety
-        tlds = ['co.in', 'com', 'co.uk', 'ca', 'com.au']
-        tld = random.choice(tlds) if voice_id else 'co.in'
-        tts = gTTS(text=text, lang='hi', tld=tld, slow=False)
-        tts.save(output_path)
-        print(f"Successfully generated voice with gTTS and saved to {output_path}")
-    except Exception as e:
-        print(f"gTTS also failed: {e}")
-        raise # If both fail, the program should stop
+            print(f"{backend.name} TTS failed: {e}")
+            last_error = e
+    print("All TTS backends failed.")
+    raise last_error # If every tier fails, the program should stop
 
-def generate_multi_voice(dialogues, output_dir):
+def generate_multi_voice(dialogues, output_dir, skip_existing=False):
     """
     Given a list of (character, dialogue), generate separate audio files for each line,
     using different voices for each character. Returns a list of audio file paths in order.
+    With skip_existing, lines whose audio file is already on disk are not synthesized again.
     """
     # Assign a unique voice_id or tld to each character
     character_voice_map = {}
@@ -82,6 +69,9 @@ def generate_multi_voice(dialogues, output_dir):
         voice_id = character_voice_map[character]['voice_id']
         tld = character_voice_map[character]['tld']
         audio_path = os.path.join(output_dir, f"{idx:02d}_{character.replace(' ', '_')}.mp3")
+        if skip_existing and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+            audio_paths.append(audio_path)
+            continue
         try:
             # Try ElevenLabs first, fallback to gTTS with tld for variety
             generate_realistic_voice(line, audio_path, voice_id=voice_id)
@@ -89,7 +79,7 @@ def generate_multi_voice(dialogues, output_dir):
             # Fallback to gTTS with tld
             print(f"Falling back to gTTS for {character}...")
             tts = gTTS(text=line, lang='hi', tld=tld, slow=False)
-            tts.save(audio_path)
+            guarded_call('gtts', tts.save, audio_path, retries=2)
         audio_paths.append(audio_path)
     return audio_paths
 
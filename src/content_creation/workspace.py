@@ -0,0 +1,164 @@
+import os
+import json
+import glob
+import time
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from src.content_creation.media_cache import MEDIA_CACHE_DIR, evict_lru
+from src.content_creation.run_ledger import LEDGER_ARTIFACTS_DIR, prune_artifacts
+
+OUTPUT_ROOT = 'output'
+PREFETCH_ROOT = 'prefetch'
+
+# Every temp/work dir we create carries this marker so the sweeper can tell live dirs from orphans.
+OWNER_MARKER = '.workspace_owner'
+SESSION_ID = f"{os.getpid()}-{int(time.time())}"
+# Dirs from another session are only swept once they are this old (guards a second instance).
+ORPHAN_GRACE_SECONDS = int(os.getenv('ORPHAN_GRACE_SECONDS', '3600'))
+
+# Finished outputs are deleted this long after a confirmed upload.
+UPLOADED_OUTPUTS_FILE = 'uploaded_outputs.json'
+OUTPUT_RETENTION_DAYS = float(os.getenv('OUTPUT_RETENTION_DAYS', '3'))
+
+# Budget for everything the pipeline writes (outputs, prefetch, media cache, ledger artifacts),
+# plus a free-space floor.
+DISK_BUDGET_MB = int(os.getenv('DISK_BUDGET_MB', '20480'))
+MIN_FREE_DISK_MB = int(os.getenv('MIN_FREE_DISK_MB', '2048'))
+# Over budget, ledger artifacts unused for this long are dropped before the media cache is evicted.
+DISK_ALERT_ARTIFACT_RETENTION_DAYS = float(os.getenv('DISK_ALERT_ARTIFACT_RETENTION_DAYS', '1'))
+
+def create_temp_dir(parent, name):
+    """
+    Creates a fresh <parent>/<name>_<rand> tagged with the current session and returns its path.
+    mkdtemp never hands out an existing dir, so concurrent reels on one topic never share one.
+    """
+    os.makedirs(parent, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=f"{name}_", dir=parent)
+    with open(os.path.join(path, OWNER_MARKER), 'w') as f:
+        json.dump({'session': SESSION_ID, 'created': time.time()}, f)
+    return path
+
+def remove_temp_dir(path):
+    if path and os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"Cleaned up temporary directory: {path}")
+
+@contextmanager
+def scoped_temp_dir(parent, name):
+    """Temp dir that is removed when the block exits, whether it succeeded or not."""
+    path = create_temp_dir(parent, name)
+    try:
+        yield path
+    finally:
+        remove_temp_dir(path)
+
+def _is_orphan(path, now):
+    marker = os.path.join(path, OWNER_MARKER)
+    if os.path.exists(marker):
+        try:
+            with open(marker, 'r') as f:
+                if json.load(f).get('session') == SESSION_ID:
+                    return False
+        except (OSError, ValueError):
+            pass
+    return now - os.path.getmtime(path) > ORPHAN_GRACE_SECONDS
+
+def sweep_orphans():
+    """
+    Removes temp dirs left behind by crashed or killed runs: output/*/temp_* and prefetch/*.
+    Meant to run once at startup. Returns the number of dirs removed.
+    """
+    now = time.time()
+    candidates = glob.glob(os.path.join(OUTPUT_ROOT, '*', 'temp_*')) + glob.glob(os.path.join(PREFETCH_ROOT, '*'))
+    removed = 0
+    for path in candidates:
+        if os.path.isdir(path) and _is_orphan(path, now):
+            print(f"[WORKSPACE] Removing orphaned temp dir: {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    _remove_empty_output_dirs()
+    return removed
+
+def load_uploaded_outputs():
+    if os.path.exists(UPLOADED_OUTPUTS_FILE):
+        with open(UPLOADED_OUTPUTS_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_uploaded_outputs(uploaded):
+    with open(UPLOADED_OUTPUTS_FILE, 'w') as f:
+        json.dump(uploaded, f, indent=2)
+
+def mark_uploaded(video_path):
+    """Records a confirmed upload so the retention policy may delete the file later."""
+    uploaded = load_uploaded_outputs()
+    uploaded[video_path] = time.time()
+    save_uploaded_outputs(uploaded)
+
+def _delete_output(video_path):
+    # Also drop sidecar files such as '<video>.mp4.jpg' posters.
+    for path in glob.glob(glob.escape(video_path) + '*'):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"[WORKSPACE] Could not delete {path}: {e}")
+
+def _remove_empty_output_dirs():
+    for path in glob.glob(os.path.join(OUTPUT_ROOT, '*')):
+        if os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+
+def apply_retention(retention_days=None):
+    """Deletes uploaded outputs older than the retention period and empty output/<timestamp> dirs."""
+    retention_days = OUTPUT_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = time.time() - retention_days * 24 * 60 * 60
+    uploaded = load_uploaded_outputs()
+    for video_path, uploaded_at in list(uploaded.items()):
+        if uploaded_at <= cutoff:
+            _delete_output(video_path)
+            del uploaded[video_path]
+            print(f"[WORKSPACE] Retention: deleted uploaded output {video_path}")
+    save_uploaded_outputs(uploaded)
+    _remove_empty_output_dirs()
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def workspace_usage():
+    return {path: dir_size(path) for path in (OUTPUT_ROOT, PREFETCH_ROOT, MEDIA_CACHE_DIR, LEDGER_ARTIFACTS_DIR) if os.path.exists(path)}
+
+def check_disk_budget():
+    """
+    Prints an alert when the pipeline's directories exceed DISK_BUDGET_MB or the disk runs low,
+    and reclaims space: all uploaded outputs first, then ledger artifacts unused for
+    DISK_ALERT_ARTIFACT_RETENTION_DAYS, then the media cache down to half its budget.
+    Returns True if usage is within limits afterwards.
+    """
+    usage = workspace_usage()
+    used_mb = sum(usage.values()) / (1024 * 1024)
+    free_mb = shutil.disk_usage('.').free / (1024 * 1024)
+    if used_mb <= DISK_BUDGET_MB and free_mb >= MIN_FREE_DISK_MB:
+        return True
+    print(f"[DISK ALERT] Workspace uses {used_mb:.0f} MB (budget {DISK_BUDGET_MB} MB), {free_mb:.0f} MB free (floor {MIN_FREE_DISK_MB} MB).")
+    for path, size in usage.items():
+        print(f"[DISK ALERT]   {path}: {size / (1024 * 1024):.0f} MB")
+    apply_retention(retention_days=0)
+    prune_artifacts(retention_days=DISK_ALERT_ARTIFACT_RETENTION_DAYS)
+    cache_mb = usage.get(MEDIA_CACHE_DIR, 0) / (1024 * 1024)
+    if cache_mb:
+        evict_lru(budget_mb=int(cache_mb / 2))
+    used_mb = sum(workspace_usage().values()) / (1024 * 1024)
+    free_mb = shutil.disk_usage('.').free / (1024 * 1024)
+    within = used_mb <= DISK_BUDGET_MB and free_mb >= MIN_FREE_DISK_MB
+    if not within:
+        print(f"[DISK ALERT] Still over budget after cleanup: {used_mb:.0f} MB used, {free_mb:.0f} MB free.")
+    return within
@@ -11,11 +11,16 @@ print("You only need to run this once, or when your session expires.\n")
 load_dotenv()
 
 cl = Client()
-session_file = Path("session.json")
+# One session file per account: python src/instagram/login_helper.py sessions/second_account.json
+session_file = Path(sys.argv[1] if len(sys.argv) > 1 else "session.json")
+if session_file.parent != Path('.'):
+    session_file.parent.mkdir(parents=True, exist_ok=True)
 
-# Get username and password
-username = os.getenv('INSTAGRAM_USERNAME')
-password = os.getenv('INSTAGRAM_PASSWORD')
+# Get username and password (the .env credentials belong to the default session only)
+username, password = None, None
+if session_file == Path("session.json"):
+    username = os.getenv('INSTAGRAM_USERNAME')
+    password = os.getenv('INSTAGRAM_PASSWORD')
 
 if not username or not password:
     print("Could not find Instagram credentials in your .env file.")
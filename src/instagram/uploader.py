@@ -5,29 +5,40 @@ from instagrapi import Client
 from instagrapi.exceptions import LoginRequired
 from dotenv import load_dotenv
 
-async def upload_reel(video_path, caption, first_comment=""):
+async def upload_reel(video_path, caption, first_comment="", thumbnail_path=None, session_file="session.json"):
     """
     Upload a video as a Reel to Instagram using a pre-saved session file.
+    instagrapi is blocking, so the upload runs on a worker thread and uploads to several
+    accounts (and the rest of the cycle) proceed concurrently.
     
     Args:
         video_path (str): Path to the video file
         caption (str): Caption for the Reel
         first_comment (str): Optional first comment to post
+        thumbnail_path (str): Optional JPEG to use as the Reel cover
+        session_file (str): Saved session of the account to upload to
+
+    Returns:
+        The uploaded media, or None if the upload failed.
     """
+    return await asyncio.to_thread(upload_reel_blocking, video_path, caption, first_comment, thumbnail_path, session_file)
+
+def upload_reel_blocking(video_path, caption, first_comment="", thumbnail_path=None, session_file="session.json"):
+    """upload_reel on the calling thread."""
     if not os.path.exists(video_path):
         print(f"Error: Video file not found at {video_path}")
-        return
+        return None
 
     cl = Client()
     
-    session_file = Path("session.json")
+    session_file = Path(session_file)
     if not session_file.exists():
         print("\n--- INSTAGRAM LOGIN REQUIRED ---")
         print(f"Session file '{session_file}' not found.")
         print("Please run the login helper script once to authorize the application:")
-        print("python src/instagram/login_helper.py")
+        print(f"python src/instagram/login_helper.py {session_file}")
         print("--------------------------------\n")
-        return
+        return None
 
     try:
         print("Logging in to Instagram using session file.")
@@ -36,7 +47,8 @@ async def upload_reel(video_path, caption, first_comment=""):
         print("Uploading Reel to Instagram...")
         media = cl.clip_upload(
             video_path,
-            caption=caption
+            caption=caption,
+            thumbnail=Path(thumbnail_path) if thumbnail_path and os.path.exists(thumbnail_path) else None
         )
         print("Reel uploaded successfully!")
         
@@ -48,6 +60,7 @@ async def upload_reel(video_path, caption, first_comment=""):
         if first_comment:
             cl.media_comment(media.id, first_comment)
             print("Posted first comment.")
+        return media
 
     except LoginRequired:
         print("\n--- INSTAGRAM LOGIN EXPIRED ---")
@@ -66,6 +79,7 @@ async def upload_reel(video_path, caption, first_comment=""):
             # Raise a custom exception to be caught by the main loop
             raise RuntimeError('INSTAGRAM_FEEDBACK_REQUIRED')
         print(f"An unknown error occurred during Reel upload: {e}")
+    return None
 
 if __name__ == "__main__":
     # For direct testing
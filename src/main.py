@@ -3,20 +3,31 @@ import sys
 import time
 import asyncio
 import random
-import re
 import pickle
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 import requests
-from pathlib import Path
 
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.trending.google_trends import TrendingTopicsFetcher, FALLBACK_TOPICS
-from src.content_creation.creator import create_video, random_upload_delay
-from src.youtube.uploader import upload_to_youtube
-from src.instagram.uploader import upload_reel
+from src.content_creation.creator import create_video, random_upload_delay, final_video_path_for, run_blocking, prepare_voiceover
+from src.content_creation.reel_derivation import DERIVE_VOICE_REEL, derive_voice_reel
+from src.content_creation.cycle_planner import CycleGraph
+from src.content_creation.prefetch import CyclePrefetcher, prefetch_cycle_inputs, release_prefetched
+from src.content_creation.workspace import sweep_orphans, apply_retention, check_disk_budget, create_temp_dir
+from src.content_creation.run_ledger import prune_artifacts
+from src.content_creation.encode_planner import ensure_benchmark
+from src.content_creation.hashtags import get_engine
+from src.content_creation.jamendo import get_client as jamendo_client
+from src.content_creation.song_index import get_index as song_index
+from src.content_creation.publisher import (
+    TREND_REGION, load_targets, has_credentials, schedule, fan_out, instagram_caption,
+    youtube_description, target_regions, release,
+)
+from src.youtube.uploader import EncodeStatus
 
 # Persistent storage for used voice reel topics and reel count
 USED_VOICE_REEL_TOPICS_FILE = 'used_voice_reel_topics.pkl'
@@ -34,147 +45,86 @@ def save_pickle(filename, obj):
 
 # Load persistent state
 used_voice_reel_topics = load_pickle(USED_VOICE_REEL_TOPICS_FILE, set())
+# plan_cycle runs for the current cycle and on the prefetcher's thread; topic claims are serialized.
+_voice_topics_lock = threading.Lock()
 reel_count = load_pickle(REEL_COUNT_FILE, 0)
 
-def sanitize_hashtag(text):
-    """Removes special characters to create a valid hashtag."""
-    return re.sub(r'[^a-zA-Z0-9]', '', text)
-
-async def create_and_upload_youtube_video(topic, output_dir):
-    """Creates and uploads a 3-minute YouTube video."""
+async def create_and_upload_youtube_video(topic, output_dir, prefetched=None):
+    """
+    Creates a 3-minute YouTube video and publishes it to every configured YouTube target.
+    The video is encoded as a fragmented MP4 and uploaded while it is still being written,
+    so the uploads overlap the encode.
+    """
     try:
         print(f"\n--- Creating 3-Minute YouTube Video for: {topic} ---")
-        video_path = await create_video(
-            topic=topic,
-            duration=180,  # 3 minutes
-            aspect_ratio='landscape',
-            output_dir=output_dir
-        )
-        
-        if video_path and os.path.exists(video_path):
-            print(f"\n--- Uploading to YouTube: {topic} ---")
-            title = f"{topic} (Full Video in Hindi)"
-            description = f"A detailed 3-minute video exploring {topic}. All content is AI-generated."
-            tags = ['AI', 'DeepDive', 'Hindi', 'Tech', topic]
-            
+        title = f"{topic} (Full Video in Hindi)"
+        description = f"A detailed 3-minute video exploring {topic}. All content is AI-generated."
+        tags = ['AI', 'DeepDive', 'Hindi', 'Tech', topic]
+        scheduled = schedule(load_targets('youtube'))
+        if not scheduled:
+            print("No YouTube target can take this video. Skipping YouTube for this cycle.")
+            return
+        try:
+            expected_path = final_video_path_for(output_dir, topic, 'landscape', 'voice')
+            encode_status = EncodeStatus()
+            # Started right away: each target authenticates, then streams chunks as they are encoded.
+            uploads = asyncio.ensure_future(fan_out(
+                expected_path, scheduled,
+                lambda target: {'title': title, 'description': youtube_description(target, description), 'tags': tags},
+                encode_status
+            ))
+            video_path = None
             try:
-                # Run the synchronous upload function in a separate thread with a timeout
-                await asyncio.wait_for(
-                    asyncio.to_thread(upload_to_youtube, video_path, title, description, tags),
-                    timeout=60.0
+                video_path, _ = await create_video(
+                    topic=topic,
+                    duration=180,  # 3 minutes
+                    aspect_ratio='landscape',
+                    output_dir=output_dir,
+                    voice_reel=True,  # narrated Hindi script over a topic background
+                    prefetched=prefetched,
+                    fragmented=True,
+                    streaming=True  # 3 minutes of 1080p: keep memory flat per render
                 )
+            finally:
+                encoded = bool(video_path and os.path.exists(video_path))
+                encode_status.finish(success=encoded)
+                if not encoded:
+                    # Nothing will be uploaded: stop the streaming uploads before their slots are released.
+                    uploads.cancel()
+                    await asyncio.gather(uploads, return_exceptions=True)
+            if not encoded:
+                return
+
+            print(f"\n--- Finishing YouTube uploads: {topic} ---")
+            try:
+                # The encode is done; give the remaining chunks (and any paced targets) a bounded amount of time.
+                await asyncio.wait_for(uploads, timeout=60.0 + max(wait for _, wait in scheduled))
             except asyncio.TimeoutError:
-                print("\nYouTube upload timed out after 60 seconds. Continuing to the next task.")
-        
+                print("\nYouTube upload timed out. Continuing to the next task.")
+        finally:
+            # Frees the slots of targets that never got this upload.
+            release(scheduled)
     except Exception as e:
         print(f"An error occurred during YouTube video processing for '{topic}': {e}")
         print("This may be due to an API quota issue. Continuing to the next task.")
 
 def fetch_song_metadata(song_url):
-    # Dummy: Extracts song title/artist from URL or returns placeholders
-    # In production, parse ID3 tags or use API if available
-    if 'jamendo' in song_url:
-        # Jamendo URLs have /track/ID/SONGNAME.mp3
-        parts = song_url.split('/')
-        if len(parts) > 5:
-            title = parts[-1].replace('.mp3', '').replace('-', ' ').title()
-            artist = 'Jamendo Artist'
-            return title, artist
+    """
+    (title, artist) of the song a music reel used. song_url is a local file or the URL the song was
+    downloaded from; both are looked up in the song index (tags read once per file), then the Jamendo catalogue.
+    """
+    song = song_index().sync_if_stale().lookup(song_url) or jamendo_client().metadata_for_url(song_url)
+    if song and song.get('title'):
+        return song['title'], song.get('artist') or 'Unknown Artist'
     # Fallback for samplelib or others
     return 'Trending Song', 'Unknown Artist'
 
 def generate_caption(topic, category, song_title=None, song_artist=None, is_music_reel=False):
-    if is_music_reel and song_title:
-        # Try to fetch a related quote/lyric (placeholder logic)
-        quote = f"Enjoy the vibes of '{song_title}' by {song_artist}. Let the music move you!"
-        caption = f"{quote} #NowPlaying"
-        if len(caption) > 150:
-            caption = caption[:147] + '...'
-        return caption
-    # Voice/topic-based
-    base = f"{topic}: Discover more in {category}. "
-    words = (base * 5).split()[:random.randint(40, 60)]
-    caption = ' '.join(words)
-    if len(caption) > 150:
-        caption = caption[:147] + '...'
-    return caption
+    return get_engine().caption(topic, category, song_title, song_artist, is_music_reel)
 
-def generate_hashtags(topic, category, n=30, song_title=None, song_artist=None, is_music_reel=False):
-    tags = set()
-    if is_music_reel and song_title:
-        tags.add(f"#{sanitize_hashtag(song_title)}")
-        tags.add(f"#{sanitize_hashtag(song_artist)}")
-        tags.add("#NowPlaying")
-        tags.add("#MusicReel")
-        tags.add("#TrendingSong")
-    tags.add(f"#{sanitize_hashtag(topic)}")
-    tags.add(f"#{sanitize_hashtag(category)}")
-    generic_tags = [
-        'Trending', 'Viral', 'Explore', 'Reels', 'Music', 'Fun', 'InstaGood', 'AI', '2024',
-        'Hindi', 'Punjabi', 'English', 'India', 'Desi', 'Bollywood', 'Pop', 'Rap', 'Dance',
-        'Motivation', 'Learning', 'Vibes', 'Chill', 'Love', 'Life', 'Friends', 'Family',
-        'Comedy', 'Memes', 'Tech', 'Science', 'Business', 'Sports', 'Health', 'Travel',
-        'Culture', 'Art', 'Fashion', 'Food', 'Fitness', 'Education', 'Inspiration', 'Quotes',
-        'Photography', 'Nature', 'Adventure', 'Goals', 'Dreams', 'Success', 'Happiness',
-        'PositiveVibes', 'Mindset', 'SelfCare', 'Creativity', 'Story', 'Shorts', 'Vlog',
-        'Vlogger', 'Vlogging', 'ViralVideo', 'ViralReel', 'ForYou', 'ForYouPage', 'FYP',
-        'ExplorePage', 'Discover', 'MusicLover', 'Song', 'Singer', 'Artist', 'Beat', 'Sound',
-        'Lyrics', 'Cover', 'Remix', 'Mashup', 'Original', 'New', 'Now', 'Today', 'ThisWeek',
-        'ThisMonth', 'TrendingNow', 'MustWatch', 'WatchThis', 'Share', 'Like', 'Comment',
-        'Follow', 'Subscribe', 'Support', 'Community', 'Collab', 'Creator', 'Influencer',
-        'ViralContent', 'ContentCreator', 'SocialMedia', 'Online', 'Digital', 'TechTrends',
-        'Future', 'Innovation', 'Startup', 'Entrepreneur', 'Motivational', 'Learning',
-        'Education', 'Knowledge', 'Wisdom', 'Growth', 'PersonalGrowth', 'SelfImprovement',
-        'Challenge', 'FunChallenge', 'Game', 'Games', 'Gaming', 'Gamer', 'Play', 'Win',
-        'Champion', 'Leader', 'Team', 'Squad', 'SquadGoals', 'Best', 'Top', 'Amazing',
-        'Awesome', 'Cool', 'Wow', 'OMG', 'Incredible', 'Unbelievable', 'MustSee', 'Epic',
-        'Legend', 'Legendary', 'Iconic', 'Classic', 'Throwback', 'Memories', 'OldIsGold',
-        'Timeless', 'Forever', 'Always', 'NeverGiveUp', 'KeepGoing', 'StayStrong', 'Believe',
-        'DreamBig', 'WorkHard', 'SuccessStory', 'Journey', 'Path', 'Road', 'Way', 'Direction',
-        'Move', 'Action', 'Act', 'DoIt', 'JustDoIt', 'LetsGo', 'GoForIt', 'MakeItHappen',
-        'Yes', 'No', 'Maybe', 'WhyNot', 'Try', 'TryAgain', 'NeverStop', 'KeepMoving', 'Push',
-        'Rise', 'Shine', 'Glow', 'Spark', 'Fire', 'Energy', 'Power', 'Strength', 'Force',
-        'Magic', 'Wonder', 'Surprise', 'Gift', 'Present', 'Moment', 'Time', 'Day', 'Night',
-        'Morning', 'Evening', 'Afternoon', 'Sun', 'Moon', 'Star', 'Sky', 'Cloud', 'Rain',
-        'Storm', 'Wind', 'Earth', 'Water', 'Fire', 'Air', 'Space', 'Universe', 'Galaxy',
-        'Planet', 'World', 'Life', 'Live', 'Living', 'Exist', 'Being', 'Human', 'People',
-        'Person', 'Individual', 'Unique', 'Special', 'Different', 'Diversity', 'Unity', 'Together',
-        'One', 'All', 'Everyone', 'Somebody', 'Nobody', 'Somewhere', 'Anywhere', 'Everywhere',
-        'Nowhere', 'Here', 'There', 'Where', 'When', 'How', 'What', 'Why', 'Which', 'Who',
-        'Whom', 'Whose', 'Whichever', 'Whatever', 'Whenever', 'However', 'Because', 'Since',
-        'Until', 'While', 'During', 'Before', 'After', 'Once', 'Twice', 'Thrice', 'Again',
-        'Soon', 'Later', 'Early', 'Late', 'First', 'Last', 'Next', 'Previous', 'Past', 'Future',
-        'Present', 'Current', 'Recent', 'Old', 'New', 'Young', 'Youth', 'Adult', 'Child', 'Kid',
-        'Baby', 'Teen', 'Elder', 'Senior', 'Parent', 'Mother', 'Father', 'Sister', 'Brother',
-        'Daughter', 'Son', 'Wife', 'Husband', 'Friend', 'Buddy', 'Pal', 'Mate', 'Partner',
-        'Colleague', 'Boss', 'Leader', 'Manager', 'Worker', 'Employee', 'Employer', 'Owner',
-        'Customer', 'Client', 'User', 'Member', 'Guest', 'Visitor', 'Host', 'Admin', 'Moderator',
-        'Supporter', 'Fan', 'Follower', 'Subscriber', 'Viewer', 'Audience', 'Spectator', 'Observer',
-        'Participant', 'Contestant', 'Competitor', 'Winner', 'Loser', 'Player', 'Coach', 'Trainer',
-        'Mentor', 'Guide', 'Advisor', 'Consultant', 'Expert', 'Specialist', 'Professional', 'Amateur',
-        'Beginner', 'Novice', 'Learner', 'Student', 'Teacher', 'Professor', 'Instructor', 'Educator',
-        'Researcher', 'Scientist', 'Engineer', 'Doctor', 'Nurse', 'Therapist', 'Counselor', 'Psychologist',
-        'Artist', 'Musician', 'Singer', 'Dancer', 'Actor', 'Actress', 'Director', 'Producer', 'Writer',
-        'Author', 'Poet', 'Journalist', 'Reporter', 'Editor', 'Publisher', 'Photographer', 'Designer',
-        'Developer', 'Programmer', 'Coder', 'Hacker', 'Maker', 'Builder', 'Creator', 'Inventor',
-        'Entrepreneur', 'Businessman', 'Businesswoman', 'Investor', 'Trader', 'Broker', 'Agent', 'Dealer',
-        'Merchant', 'Shopkeeper', 'Vendor', 'Supplier', 'Manufacturer', 'Distributor', 'Wholesaler',
-        'Retailer', 'Customer', 'Client', 'User', 'Member', 'Guest', 'Visitor', 'Host', 'Admin',
-        'Moderator', 'Supporter', 'Fan', 'Follower', 'Subscriber', 'Viewer', 'Audience', 'Spectator',
-        'Observer', 'Participant', 'Contestant', 'Competitor', 'Winner', 'Loser', 'Player', 'Coach',
-        'Trainer', 'Mentor', 'Guide', 'Advisor', 'Consultant', 'Expert', 'Specialist', 'Professional',
-        'Amateur', 'Beginner', 'Novice', 'Learner', 'Student', 'Teacher', 'Professor', 'Instructor',
-        'Educator', 'Researcher', 'Scientist', 'Engineer', 'Doctor', 'Nurse', 'Therapist', 'Counselor',
-        'Psychologist', 'Artist', 'Musician', 'Singer', 'Dancer', 'Actor', 'Actress', 'Director',
-        'Producer', 'Writer', 'Author', 'Poet', 'Journalist', 'Reporter', 'Editor', 'Publisher',
-        'Photographer', 'Designer', 'Developer', 'Programmer', 'Coder', 'Hacker', 'Maker', 'Builder',
-        'Creator', 'Inventor', 'Entrepreneur', 'Businessman', 'Businesswoman', 'Investor', 'Trader',
-        'Broker', 'Agent', 'Dealer', 'Merchant', 'Shopkeeper', 'Vendor', 'Supplier', 'Manufacturer',
-        'Distributor', 'Wholesaler', 'Retailer'
-    ]
-    while len(tags) < n:
-        tags.add(f"#{random.choice(generic_tags)}")
-    return ' '.join(list(tags)[:n])
+def generate_hashtags(topic, category, n=30, song_title=None, song_artist=None, is_music_reel=False, trending=()):
+    """Hashtags weighted by the reel's category and, when given, the topics trending this cycle."""
+    return get_engine().hashtags(topic, category, n, song_title, song_artist, is_music_reel, trending)
 
 # Placeholder for Instagram trending audio selection
 def get_trending_instagram_audio():
@@ -186,91 +136,203 @@ def get_trending_instagram_audio():
     ]
     return random.choice(trending_audios)
 
-async def create_and_upload_instagram_reel(topic, output_dir, reel_index, voice_reel=False, use_spotify=True):
+async def create_and_upload_instagram_reel(topic, output_dir, reel_index, voice_reel=False, use_spotify=True, prefetched=None, trending_by_region=None):
+    """Renders one reel and publishes it to every configured Instagram account that can take it."""
     try:
         print(f"\n--- Creating 1-Minute Instagram Reel for: {topic} ---")
         if not topic or not topic.strip():
             print("WARNING: Topic is empty or None. Skipping Instagram upload.")
             return
-        # Check for Instagram session file
-        session_file = Path("session.json")
-        if not session_file.exists():
-            print("\n--- INSTAGRAM LOGIN REQUIRED ---")
-            print(f"Session file '{session_file}' not found.")
-            print("Please run the login helper script once to authorize the application:")
-            print("python src/instagram/login_helper.py")
-            print("--------------------------------\n")
+        # Only accounts with a saved session get the reel
+        targets = []
+        for target in load_targets('instagram'):
+            if has_credentials(target):
+                targets.append(target)
+            else:
+                print("\n--- INSTAGRAM LOGIN REQUIRED ---")
+                print(f"Session file '{target['session']}' of target '{target['name']}' not found.")
+                print("Please run the login helper script once to authorize the account:")
+                print(f"python src/instagram/login_helper.py {target['session']}")
+                print("--------------------------------\n")
+        scheduled = schedule(targets)
+        if not scheduled:
             print("Skipping Instagram upload for this cycle.")
             return
-        # Pass voice_reel flag and use_spotify to create_video
-        reel_path, song_url = await create_video(
-            topic=topic,
-            duration=60,  # 1 minute
-            aspect_ratio='portrait',
-            output_dir=output_dir,
-            reel_index=reel_index,
-            voice_reel=voice_reel,
-            use_spotify=use_spotify
-        )
-        song_title, song_artist = None, None
-        if not voice_reel and reel_path:
-            song_title, song_artist = fetch_song_metadata(song_url) if song_url else (None, None)
-        if reel_path and os.path.exists(reel_path):
-            print(f"\n--- Uploading to Instagram: {topic} ---")
-            category = os.getenv('CURRENT_CATEGORY', '')
-            caption = generate_caption(topic, category, song_title, song_artist, is_music_reel=not voice_reel)
-            hashtags = generate_hashtags(topic, category, song_title=song_title, song_artist=song_artist, is_music_reel=not voice_reel)
-            full_caption = f"{caption}\n\n{hashtags}"
-            print(f"[DEBUG] Instagram caption to be used:\n{full_caption}\n")
-            await upload_reel(reel_path, full_caption)
-            print(f"--- Finished Instagram task for: {topic} ---")
+        try:
+            # Pass voice_reel flag and use_spotify to create_video
+            reel_path, song_url = await create_video(
+                topic=topic,
+                duration=60,  # 1 minute
+                aspect_ratio='portrait',
+                output_dir=output_dir,
+                reel_index=reel_index,
+                voice_reel=voice_reel,
+                use_spotify=use_spotify,
+                prefetched=prefetched
+            )
+            song_title, song_artist = None, None
+            if not voice_reel and reel_path:
+                song_title, song_artist = fetch_song_metadata(song_url) if song_url else (None, None)
+            if reel_path and os.path.exists(reel_path):
+                print(f"\n--- Uploading to {len(scheduled)} Instagram account(s): {topic} ---")
+                category = os.getenv('CURRENT_CATEGORY', '')
+
+                def params_for(target):
+                    caption = instagram_caption(target, reel_path, topic, category, song_title, song_artist,
+                                                is_music_reel=not voice_reel, trending_by_region=trending_by_region)
+                    print(f"[DEBUG] Instagram caption for {target['name']}:\n{caption}\n")
+                    return {'caption': caption}
+
+                await fan_out(reel_path, scheduled, params_for)
+                print(f"--- Finished Instagram task for: {topic} ---")
+        finally:
+            # Frees the slots of targets that never got this upload.
+            release(scheduled)
     except Exception as e:
         print(f"An error occurred during Instagram Reel processing for '{topic}': {e}")
         print("This may be due to an API quota issue. Continuing to the next task.")
 
-async def main_cycle(output_dir, use_spotify):
-    global reel_count, used_voice_reel_topics
-    trends_fetcher = TrendingTopicsFetcher(region='IN')
+def plan_cycle(trends_fetcher, use_spotify, reel_number, create_youtube=True):
+    """
+    Picks the category, topic and reels for cycle number reel_number: a music reel every cycle,
+    plus a voice reel every 5th. When a YouTube video is made too, the voice reel covers the same
+    topic so both can share one script. Returns a plan dict, or None if no topic could be found.
+    """
+    global used_voice_reel_topics
     categories = trends_fetcher.get_available_categories()
     if not categories:
         print("No categories found. Waiting for the next cycle.")
-        return
+        return None
     category = random.choice(categories)
-    os.environ['CURRENT_CATEGORY'] = category
     topics = trends_fetcher.get_topics(category)
     if not topics:
         print(f"Could not fetch any topics for '{category}'. Waiting for the next cycle.")
-        return
-    topic = random.choice(topics)
-    print(f">>> Selected Topic for this cycle: {topic} <<<")
+        return None
+    topic = trends_fetcher.choose_topic(topics, category)
+    # Only every 5th reel is a voice reel, but only if use_spotify is True
+    voice_reel = bool(use_spotify and reel_number % 5 == 0)
+    reel_topic = topic
+    if voice_reel and not create_youtube:
+        with _voice_topics_lock:
+            available_voice_topics = [t for t in topics if t not in used_voice_reel_topics]
+            if not available_voice_topics:
+                used_voice_reel_topics = set()
+                available_voice_topics = topics
+            reel_topic = trends_fetcher.choose_topic(available_voice_topics, category, exclude=[topic])
+            used_voice_reel_topics.add(reel_topic)
+            save_pickle(USED_VOICE_REEL_TOPICS_FILE, used_voice_reel_topics)
+    return {
+        'category': category,
+        'topic': topic,
+        'reel_number': reel_number,
+        'voice_reel': voice_reel,
+        'reel_topic': reel_topic,
+        # What is trending right now in every target region; boosts matching hashtags.
+        'trending_by_region': trending_by_region(trends_fetcher, category, topics),
+    }
+
+def trending_by_region(trends_fetcher, category, topics):
+    """Trending topics of each publish target's region; the cycle's own region reuses topics."""
+    trending = {trends_fetcher.region: topics[:20]}
+    for region in target_regions():
+        if region not in trending:
+            trending[region] = TrendingTopicsFetcher(region=region, topic_index=trends_fetcher.topic_index).get_topics(category)[:20]
+    return trending
+
+def prefetch_next_cycle(use_spotify, reel_number):
+    """Plans the next cycle and prepares its inputs; runs on the prefetcher thread."""
     create_youtube = os.getenv('CREATE_YOUTUBE_VIDEO', 'True').lower() in ('true', '1', 't')
     create_instagram = os.getenv('CREATE_INSTAGRAM_REEL', 'True').lower() in ('true', '1', 't')
-    fallback = False
-    if topic in FALLBACK_TOPICS.get(category, []):
-        fallback = True
+    plan = plan_cycle(TrendingTopicsFetcher(region=TREND_REGION), use_spotify, reel_number, create_youtube)
+    if not plan:
+        return None
+    return prefetch_cycle_inputs(plan, use_spotify, create_youtube, create_instagram)
+
+def build_cycle_graph(plan, output_dir, use_spotify, create_youtube, create_instagram, reel_index):
+    """
+    The cycle's deliverables as a DAG: the long-form script and voiceover feed the YouTube video and,
+    when they share a topic, the voice reel, which is cut from that voiceover; the music reel depends
+    on nothing. Branches run concurrently.
+    """
+    graph = CycleGraph()
+    topic, reel_topic = plan['topic'], plan['reel_topic']
+    trending = plan.get('trending_by_region')
+    voice_reel = create_instagram and plan['voice_reel']
+    shares_script = create_youtube and voice_reel and reel_topic == topic
+
     if create_youtube:
-        await create_and_upload_youtube_video(topic, output_dir)
+        async def long_form_voiceover():
+            # Voiced once per cycle (or taken from the prefetch) and shared by every branch on the topic.
+            youtube = plan.get('youtube') or {}
+            if youtube.get('audio_path'):
+                return youtube['script'], youtube['audio_path']
+            return await run_blocking(prepare_voiceover, topic, 180, plan['work_dir'], script=youtube.get('script'))
+        graph.add('voiceover', long_form_voiceover)
+        graph.add('youtube', lambda voiceover: create_and_upload_youtube_video(
+            topic, output_dir, prefetched=dict(plan.get('youtube') or {}, script=voiceover[0], audio_path=voiceover[1])),
+            deps=('voiceover',))
     else:
         print("\nSkipping YouTube video creation based on .env configuration.")
+
     if create_instagram:
-        reel_count += 1
-        save_pickle(REEL_COUNT_FILE, reel_count)
-        # Only every 5th reel is a voice reel, but only if use_spotify is True
-        if use_spotify and reel_count % 5 == 0:
-            available_voice_topics = [t for t in topics if t not in used_voice_reel_topics]
-            if not available_voice_topics:
-                used_voice_reel_topics = set()
-                available_voice_topics = topics
-            voice_topic = random.choice(available_voice_topics)
-            used_voice_reel_topics.add(voice_topic)
-            save_pickle(USED_VOICE_REEL_TOPICS_FILE, used_voice_reel_topics)
-            print(f"[VOICE REEL] Creating unique voice reel for topic: {voice_topic}")
-            await create_and_upload_instagram_reel(voice_topic, output_dir, reel_count, voice_reel=True, use_spotify=use_spotify)
-        else:
-            await create_and_upload_instagram_reel(topic, output_dir, reel_count, voice_reel=False, use_spotify=use_spotify)
+        graph.add('music_reel', lambda: create_and_upload_instagram_reel(
+            topic, output_dir, reel_index, voice_reel=False, use_spotify=use_spotify,
+            prefetched=plan.get('music'), trending_by_region=trending))
     else:
         print("\nSkipping Instagram Reel creation based on .env configuration.")
 
+    if voice_reel:
+        print(f"[VOICE REEL] Creating voice reel for topic: {reel_topic}")
+        if shares_script:
+            async def shared_voice_reel(voiceover):
+                script, audio_path = voiceover
+                prefetched = plan.get('voice')
+                if not prefetched and DERIVE_VOICE_REEL:
+                    try:
+                        # Cut from the long-form audio by timestamp: no second script, no second TTS call.
+                        reel_script, reel_audio = await run_blocking(
+                            derive_voice_reel, script, audio_path, 60, plan['work_dir'], reel_topic)
+                        prefetched = {'script': reel_script, 'audio_path': reel_audio}
+                    except Exception as e:
+                        print(f"[DERIVE] Could not cut the voice reel from the long-form audio, voicing it instead: {e}")
+                # Otherwise create_video fits the long-form script to the reel's length before TTS.
+                return await create_and_upload_instagram_reel(
+                    reel_topic, output_dir, reel_index, voice_reel=True, use_spotify=use_spotify,
+                    prefetched=prefetched or {'script': script}, trending_by_region=trending)
+            graph.add('voice_reel', shared_voice_reel, deps=('voiceover',))
+        else:
+            graph.add('voice_reel', lambda: create_and_upload_instagram_reel(
+                reel_topic, output_dir, reel_index, voice_reel=True, use_spotify=use_spotify,
+                prefetched=plan.get('voice'), trending_by_region=trending))
+    return graph
+
+async def main_cycle(output_dir, use_spotify, prefetched=None):
+    global reel_count
+    create_youtube = os.getenv('CREATE_YOUTUBE_VIDEO', 'True').lower() in ('true', '1', 't')
+    create_instagram = os.getenv('CREATE_INSTAGRAM_REEL', 'True').lower() in ('true', '1', 't')
+    plan = prefetched
+    if plan is None:
+        plan = plan_cycle(TrendingTopicsFetcher(region=TREND_REGION), use_spotify, reel_count + 1, create_youtube)
+        if not plan:
+            return
+    else:
+        print(">>> Using inputs prefetched during the upload delay <<<")
+    category, topic = plan['category'], plan['topic']
+    os.environ['CURRENT_CATEGORY'] = category
+    print(f">>> Selected Topic for this cycle: {topic} <<<")
+    if not plan.get('work_dir'):
+        # Holds the inputs the cycle's branches share; removed with the plan.
+        plan['work_dir'] = create_temp_dir(output_dir, 'temp_cycle')
+    try:
+        if create_instagram:
+            # Counts cycles with Instagram output; every 5th also gets a voice reel.
+            reel_count += 1
+            save_pickle(REEL_COUNT_FILE, reel_count)
+        graph = build_cycle_graph(plan, output_dir, use_spotify, create_youtube, create_instagram, reel_count)
+        await graph.run()
+    finally:
+        release_prefetched(plan)
+
 if __name__ == "__main__":
     load_dotenv()
 
@@ -285,14 +347,36 @@ if __name__ == "__main__":
     if not os.path.exists('client_secrets.json'):
         print("FATAL: client_secrets.json not found. Please obtain it from Google Cloud Console.")
     else:
+        # Reclaim temp dirs left behind by crashed runs before starting.
+        sweep_orphans()
+        # Measure x264 presets once up front instead of inside the first render.
+        try:
+            ensure_benchmark()
+        except Exception as e:
+            print(f"[ENCODE] Preset benchmark failed, renders will use ultrafast: {e}")
+        # Index downloaded_songs/ now; lookups afterwards only resync when it changes.
+        song_index()
+        prefetcher = CyclePrefetcher()
+        prefetched = None
         while True:
             # Check for Instagram feedback_required flag
             if os.path.exists('feedback_required.flag'):
                 print("\n[BLOCKED] Instagram 'feedback_required' flag detected. Pausing uploads for 6 hours. Please check your Instagram app for verification or wait before resuming.")
+                # Topics picked before the pause would be stale by the time we resume.
+                release_prefetched(prefetched)
+                prefetched = None
+                prefetcher.release_all()
                 time.sleep(6 * 60 * 60)  # Sleep for 6 hours
                 continue
             output_dir = os.path.join("output", datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
             os.makedirs(output_dir, exist_ok=True)
-            asyncio.run(main_cycle(output_dir, use_spotify=use_spotify))
+            asyncio.run(main_cycle(output_dir, use_spotify=use_spotify, prefetched=prefetched))
             print("\n\n>>> Cycle complete. Waiting before starting the next one... <<<")
+            apply_retention()
+            prune_artifacts()
+            check_disk_budget()
+            # Prepare the next cycle(s) while we wait, never more than PREFETCH_MAX_AHEAD ahead.
+            while prefetcher.has_room():
+                prefetcher.schedule(prefetch_next_cycle, use_spotify, reel_count + 1 + len(prefetcher.pending))
             random_upload_delay()
+            prefetched = prefetcher.take()
@@ -0,0 +1,68 @@
+import os
+import sys
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+# Add project root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.content_creation.creator import create_video
+from src.content_creation.run_ledger import ReelRun, read_entries, latest_reel, content_hash
+from src.content_creation.publisher import target_named, fan_out
+
+def previous_uploads(run):
+    """The last recorded upload to each target, oldest first."""
+    uploads = {}
+    for name, entry in sorted(run.previous.items(), key=lambda item: item[1]['ts']):
+        if name == 'upload' or name.startswith('upload:'):
+            # Uploads recorded before publish targets existed went to the platform's default account.
+            uploads[target_named(entry['inputs'].get('target'), entry['inputs']['platform'])['name']] = entry
+    return uploads.values()
+
+async def replay_upload(run, video_path, previous):
+    """Re-uploads video_path to the target of a recorded upload, with its parameters, if the video changed."""
+    inputs = previous['inputs']
+    if inputs['video'] == content_hash(video_path):
+        print(f"[LEDGER] {previous['stage']}: video unchanged, not re-uploading")
+        return
+    params = {k: v for k, v in inputs.items() if k not in ('platform', 'video', 'target')}
+    target = target_named(inputs.get('target'), inputs['platform'])
+    await fan_out(video_path, [(target, 0)], lambda _: params, run=run)
+
+async def rebuild(reel_id, upload=True):
+    """
+    Re-creates a reel from the run ledger. Stages whose inputs are unchanged (script, TTS,
+    backgrounds, song) reuse their recorded outputs; changed settings, such as ENCODE_CRF or the
+    loudness targets, re-run the render and then the upload.
+    """
+    reel = latest_reel(reel_id)
+    if not reel:
+        raise ValueError(f"No ledger entry for {reel_id}")
+    run = ReelRun(reel_id, replay=True)
+    video_path, _ = await create_video(**reel['args'], ledger=run)
+    if upload and video_path:
+        for previous_upload in previous_uploads(run):
+            await replay_upload(run, video_path, previous_upload)
+    print(f"[LEDGER] Rebuild of {reel_id} complete")
+    return video_path
+
+def list_reels():
+    reels = {}
+    for entry in read_entries():
+        if entry.get('type') == 'reel':
+            reels[entry['reel']] = entry
+    for reel_id, entry in reels.items():
+        print(f"{entry['kind']:6} {entry['args']['topic'][:40]:40} {reel_id}")
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Rebuild a reel, re-running only the stages whose inputs changed.")
+    parser.add_argument('reel', nargs='?', help="Output path of the reel, as recorded in the run ledger")
+    parser.add_argument('--no-upload', action='store_true', help="Render only; never upload")
+    parser.add_argument('--list', action='store_true', help="List reels recorded in the ledger")
+    args = parser.parse_args()
+    if args.list or not args.reel:
+        list_reels()
+    else:
+        asyncio.run(rebuild(args.reel, upload=not args.no_upload))
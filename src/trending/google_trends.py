@@ -8,6 +8,8 @@ try:
 except ImportError as e:
     print("pytrends is not installed. Please install it with 'pip install pytrends'.")
     raise e
+from src.trending.topic_index import TopicIndex
+from src.utils.rate_limiter import guarded_call
 
 CATEGORIES = {
     'SPORTS': 'all',
@@ -109,14 +111,13 @@ FALLBACK_TOPICS = {
     ]
 }
 
-# Track used topics in memory for this session
-USED_TOPICS = set()
-
 class TrendingTopicsFetcher:
-    def __init__(self, region='IN'):
+    def __init__(self, region='IN', topic_index=None):
         self.region = region
         # Note: 'urllib3<2.0' is required for the current version of pytrends
         self.pytrends = TrendReq(hl='en-US', tz=330, retries=3, backoff_factor=0.5)
+        # Persistent, near-duplicate aware topic history (replaces the per-session USED_TOPICS set)
+        self.topic_index = topic_index or TopicIndex()
 
     def get_available_categories(self):
         """Returns a list of all available fallback categories."""
@@ -134,8 +135,8 @@ class TrendingTopicsFetcher:
                 meme_keywords = ['memes', 'funny', 'viral memes', 'trending memes']
                 all_memes = set()
                 for kw in meme_keywords:
-                    self.pytrends.build_payload([kw], cat=0, timeframe='now 7-d', geo=self.region)
-                    related = self.pytrends.related_queries()
+                    guarded_call('pytrends', self.pytrends.build_payload, [kw], cat=0, timeframe='now 7-d', geo=self.region)
+                    related = guarded_call('pytrends', self.pytrends.related_queries)
                     if kw in related and related[kw]['top'] is not None:
                         all_memes.update([q['query'] for q in related[kw]['top'].to_dict('records')])
                 if all_memes:
@@ -144,7 +145,7 @@ class TrendingTopicsFetcher:
                 suggestions = []
                 for kw in meme_keywords:
                     try:
-                        suggestions += [s['title'] for s in self.pytrends.suggestions(keyword=kw)]
+                        suggestions += [s['title'] for s in guarded_call('pytrends', self.pytrends.suggestions, keyword=kw)]
                     except Exception:
                         continue
                 if suggestions:
@@ -152,34 +153,32 @@ class TrendingTopicsFetcher:
                 print("No trending memes found, using fallback.")
             else:
                 print(f"Fetching trends for {category_name or 'all categories'}...")
-                df = self.pytrends.trending_searches(pn=self.region.lower())
+                df = guarded_call('pytrends', self.pytrends.trending_searches, pn=self.region.lower())
                 return df[0].tolist()
         except Exception as e:
             print(f"Error fetching trends: {e}. Using fallback topics.")
             if category_name and category_name in FALLBACK_TOPICS:
-                # Remove used topics from fallback
-                available = [t for t in FALLBACK_TOPICS[category_name] if t not in USED_TOPICS]
-                if not available:
-                    # Reset if all topics used
-                    USED_TOPICS.clear()
-                    available = FALLBACK_TOPICS[category_name][:]
-                return available
+                return self.topic_index.dedupe(FALLBACK_TOPICS[category_name], category_name)
             all_fallback = []
-            for topics in FALLBACK_TOPICS.values():
-                all_fallback.extend([t for t in topics if t not in USED_TOPICS])
-            if not all_fallback:
-                USED_TOPICS.clear()
-            for topics in FALLBACK_TOPICS.values():
-                all_fallback.extend(topics)
-            return all_fallback
+            for category, topics in FALLBACK_TOPICS.items():
+                all_fallback.extend(self.topic_index.dedupe(topics, category))
+            return self.topic_index.dedupe(all_fallback)
+
+    def choose_topic(self, topics, category=None, exclude=()):
+        """
+        Picks a topic from topics, preferring ones (and their near-duplicates) that were used
+        least recently, and records the choice in the persistent topic index.
+        """
+        topic = self.topic_index.choose(topics, category, exclude=exclude)
+        if topic:
+            self.topic_index.mark_used(topic, category)
+        return topic
 
     def get_random_topic(self, category=None):
         topics = self.get_topics(category)
         if not topics:
             return None
-        topic = random.choice(topics)
-        USED_TOPICS.add(topic)
-        return topic
+        return self.choose_topic(topics, category)
 
 if __name__ == "__main__":
     fetcher = TrendingTopicsFetcher(region='IN')
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import random
+import zlib
+
+# Persistent record of every topic we have rendered, shared by all reel types.
+TOPIC_INDEX_FILE = 'topic_index.json'
+TOPIC_HISTORY_FILE = '1000_fallback_topics.txt'
+
+# MinHash over character 3-grams, split into LSH bands. Topics that agree on every row of any
+# band share a bucket; bucket mates are then confirmed with the exact n-gram Jaccard similarity.
+NGRAM_SIZE = 3
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+NEAR_DUPLICATE_THRESHOLD = 0.7
+
+# A topic used this long ago (or never) gets full weight in the sampler.
+TOPIC_COOLDOWN_SECONDS = 7 * 24 * 60 * 60
+
+_MINHASH_SEEDS = [random.Random(i).getrandbits(32) for i in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+def normalize_topic(topic):
+    """Lowercases, drops punctuation and collapses whitespace: 'Movie Review: X!' -> 'movie review x'."""
+    text = re.sub(r'[^\w\s]', ' ', topic.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+def _shingles(key):
+    padded = f" {key} "
+    if len(padded) <= NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+def minhash_signature(key):
+    shingles = [zlib.crc32(s.encode('utf-8')) for s in _shingles(key)]
+    return [min(h ^ seed for h in shingles) for seed in _MINHASH_SEEDS]
+
+def _band_keys(signature):
+    return [
+        f"{band}:" + '-'.join(str(v) for v in signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+        for band in range(MINHASH_BANDS)
+    ]
+
+def jaccard(key_a, key_b):
+    a, b = _shingles(key_a), _shingles(key_b)
+    return len(a & b) / len(a | b)
+
+class TopicIndex:
+    """
+    Persistent topic history with near-duplicate clustering and least-recently-used selection.
+    Every lookup is a dict/bucket probe, so selection cost depends only on the candidate list,
+    not on how much history has accumulated.
+    """
+    def __init__(self, path=TOPIC_INDEX_FILE):
+        self.path = path
+        self.topics = {}   # normalized key -> {'topic', 'category', 'cluster', 'signature'}
+        self.clusters = {} # cluster key -> {'last_used', 'uses'}
+        self.buckets = {}  # LSH band key -> [topic keys]
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            # First run: start from the existing topic log so old repeats are already clustered.
+            self.seed_from_history()
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.clusters = data.get('clusters', {})
+        for key, entry in data.get('topics', {}).items():
+            self.topics[key] = entry
+            for band_key in _band_keys(entry['signature']):
+                self.buckets.setdefault(band_key, []).append(key)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'topics': self.topics, 'clusters': self.clusters}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def cluster_of(self, topic, category=None):
+        """Returns the cluster key for topic, registering it (and its near-duplicate cluster) if new."""
+        key = normalize_topic(topic)
+        if key in self.topics:
+            return self.topics[key]['cluster']
+        signature = minhash_signature(key)
+        cluster = key
+        for band_key in _band_keys(signature):
+            for other in self.buckets.get(band_key, []):
+                if jaccard(key, other) >= NEAR_DUPLICATE_THRESHOLD:
+                    cluster = self.topics[other]['cluster']
+                    break
+            if cluster != key:
+                break
+        self.topics[key] = {'topic': topic, 'category': category, 'cluster': cluster, 'signature': signature}
+        for band_key in _band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+        self.clusters.setdefault(cluster, {'last_used': 0, 'uses': 0})
+        return cluster
+
+    def dedupe(self, topics, category=None):
+        """Keeps the first topic of each near-duplicate cluster, preserving order."""
+        seen = set()
+        unique = []
+        for topic in topics:
+            if not topic or not topic.strip():
+                continue
+            cluster = self.cluster_of(topic, category)
+            if cluster not in seen:
+                seen.add(cluster)
+                unique.append(topic)
+        return unique
+
+    def weight(self, topic, now=None):
+        cluster = self.clusters.get(self.cluster_of(topic), {})
+        age = (now or time.time()) - cluster.get('last_used', 0)
+        return min(1.0, max(age, 0) / TOPIC_COOLDOWN_SECONDS) + 1e-3
+
+    def choose(self, topics, category=None, exclude=()):
+        """
+        Picks one of topics, weighted toward clusters that were used least recently.
+        Topics in the same cluster as anything in exclude are skipped when possible.
+        """
+        candidates = self.dedupe(topics, category)
+        excluded = {self.cluster_of(t) for t in exclude}
+        preferred = [t for t in candidates if self.cluster_of(t) not in excluded]
+        candidates = preferred or candidates
+        if not candidates:
+            return None
+        now = time.time()
+        weights = [self.weight(t, now) for t in candidates]
+        return random.choices(candidates, weights=weights, k=1)[0]
+
+    def mark_used(self, topic, category=None):
+        cluster = self.cluster_of(topic, category)
+        entry = self.clusters.setdefault(cluster, {'last_used': 0, 'uses': 0})
+        entry['last_used'] = time.time()
+        entry['uses'] += 1
+        self.save()
+
+    def was_used(self, topic):
+        return self.clusters.get(self.cluster_of(topic), {}).get('uses', 0) > 0
+
+    def seed_from_history(self, history_file=TOPIC_HISTORY_FILE):
+        """Imports 'CATEGORY: topic' lines (e.g. 1000_fallback_topics.txt) as already-used topics."""
+        if not os.path.exists(history_file):
+            return 0
+        count = 0
+        with open(history_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                category, sep, topic = line.strip().partition(':')
+                if not sep or not topic.strip():
+                    continue
+                cluster = self.cluster_of(topic.strip(), category.strip())
+                entry = self.clusters[cluster]
+                entry['uses'] += 1
+                entry['last_used'] = max(entry['last_used'], 1)
+                count += 1
+        self.save()
+        return count
+
+if __name__ == '__main__':
+    index = TopicIndex(path='topic_index_test.json')
+    print(f"Indexed {len(index.topics)} distinct topics in {len(index.clusters)} near-duplicate clusters.")
+    sample = ['Latest Cricket Highlights', 'Latest cricket highlights!', 'Cricket Highlights Latest', 'Football Skills']
+    print(f"Deduplicated {sample} -> {index.dedupe(sample, 'SPORTS')}")
+    print(f"Chosen: {index.choose(sample, 'SPORTS')}")
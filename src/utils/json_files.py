@@ -0,0 +1,30 @@
+import os
+import json
+import tempfile
+
+def load_json(path, default=None, encoding='utf-8'):
+    """Contents of the JSON file at path, or default if it is missing or unreadable."""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding=encoding) as f:
+                return json.load(f)
+        except ValueError:
+            print(f"[JSON] {path} is unreadable, starting empty")
+    return {} if default is None else default
+
+def save_json(path, data, encoding='utf-8', **dump_kwargs):
+    """
+    Writes data to path atomically: dumped to a unique temp file in the same directory, then
+    moved over path. Readers see the old or the new file, never a partial one, and concurrent
+    writers never share a temp file.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,234 @@
+import os
+import time
+import asyncio
+import random
+import threading
+
+# Starting limits per provider: (requests per second, burst). Header-reporting providers adjust these live.
+PROVIDER_LIMITS = {
+    'gemini': (0.25, 2),       # free tier: 15 requests/minute
+    'huggingface': (0.5, 2),
+    'elevenlabs': (0.5, 2),
+    'gtts': (1.0, 3),
+    'pexels': (0.05, 5),       # 200 requests/hour
+    'spotify': (2.0, 5),
+    'jamendo': (1.0, 3),
+    'pytrends': (0.2, 2),      # Google Trends blocks bursts quickly
+}
+DEFAULT_LIMIT = (1.0, 2)
+
+# Consecutive failures before a circuit opens, and how long it stays open before a trial call.
+FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '120'))
+# Quota/auth errors will not fix themselves in minutes, so the circuit stays open much longer.
+QUOTA_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_QUOTA_COOLDOWN_SECONDS', '3600'))
+QUOTA_MARKERS = ('quota_exceeded', 'quota exceeded', 'exceeded your current quota', 'resource_exhausted', 'resourceexhausted')
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Takes one token and returns how long the caller must wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+class ProviderGuard:
+    """Token-bucket rate limit plus a closed/open/half-open circuit breaker for one provider."""
+    def __init__(self, name):
+        rate, burst = PROVIDER_LIMITS.get(name, DEFAULT_LIMIT)
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.failures = 0
+        self.state = 'closed'
+        self.open_until = 0.0
+        self.latencies = []
+        # When the half-open trial call was admitted; None while no trial is in flight.
+        self.trial_started = None
+        self.lock = threading.Lock()
+
+    def _check(self, claim):
+        now = time.monotonic()
+        if self.state == 'open' and now >= self.open_until:
+            self.state = 'half_open'
+            self.trial_started = None
+            print(f"[CIRCUIT] {self.name}: cooldown over, allowing a trial call")
+        if self.state != 'half_open':
+            return self.state == 'closed'
+        # A trial that never reported back (e.g. its task was cancelled) stops blocking after a cooldown.
+        if self.trial_started is not None and now - self.trial_started < COOLDOWN_SECONDS:
+            return False
+        if claim:
+            self.trial_started = now
+        return True
+
+    def available(self):
+        """
+        False while the circuit is open, or while it is half-open and its trial call is in flight.
+        Only a check: use admit() to actually make the call.
+        """
+        with self.lock:
+            return self._check(claim=False)
+
+    def admit(self):
+        """Like available(), but a half-open circuit lets exactly one caller through as its trial."""
+        with self.lock:
+            return self._check(claim=True)
+
+    def reserve(self):
+        """Takes a token; returns the seconds to wait before using it."""
+        with self.lock:
+            wait = self.bucket.reserve()
+        if wait > 0:
+            print(f"[RATE LIMIT] {self.name}: waiting {wait:.1f}s")
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self, latency=None):
+        with self.lock:
+            if self.state != 'closed':
+                print(f"[CIRCUIT] {self.name}: closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_started = None
+            if latency is not None:
+                self.latencies = (self.latencies + [latency])[-20:]
+
+    def record_failure(self, error=None):
+        message = str(error).lower() if error is not None else ''
+        is_quota = any(marker in message for marker in QUOTA_MARKERS)
+        with self.lock:
+            self.failures += 1
+            self.trial_started = None
+            if is_quota or self.state == 'half_open' or self.failures >= FAILURE_THRESHOLD:
+                self._open(QUOTA_COOLDOWN_SECONDS if is_quota else COOLDOWN_SECONDS)
+
+    def trip(self, cooldown):
+        """Opens the circuit right away, e.g. when a provider sends Retry-After."""
+        with self.lock:
+            self._open(cooldown)
+
+    def _open(self, cooldown):
+        self.state = 'open'
+        self.open_until = time.monotonic() + cooldown
+        print(f"[CIRCUIT] {self.name}: open for {cooldown:.0f}s after {self.failures} failure(s)")
+
+    def observe_headers(self, headers):
+        """
+        Learns the real limit from X-RateLimit-* headers (as sent by Pexels, Hugging Face and others)
+        and honours Retry-After.
+        """
+        if not headers:
+            return
+        lowered = {k.lower(): v for k, v in headers.items()}
+        retry_after = lowered.get('retry-after')
+        if retry_after and retry_after.isdigit():
+            self.trip(float(retry_after))
+            return
+        remaining = lowered.get('x-ratelimit-remaining')
+        reset = lowered.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining, reset = float(remaining), float(reset)
+        except ValueError:
+            return
+        # Reset is either an epoch timestamp or seconds until the window resets.
+        seconds_left = reset - time.time() if reset > 1e9 else reset
+        with self.lock:
+            if remaining <= 0:
+                self._open(max(seconds_left, 1.0))
+            else:
+                self.bucket.rate = remaining / max(seconds_left, 1.0)
+
+    def mean_latency(self):
+        with self.lock:
+            return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+def get_guard(provider):
+    with _guards_lock:
+        if provider not in _guards:
+            _guards[provider] = ProviderGuard(provider)
+        return _guards[provider]
+
+def is_available(provider):
+    return get_guard(provider).available()
+
+def guarded_call(provider, func, *args, retries=0, **kwargs):
+    """
+    Calls func(*args, **kwargs) under the provider's rate limit and circuit breaker.
+    Raises CircuitOpenError without calling func when the circuit is open, so callers can go
+    straight to their fallback. Transient failures are retried with jittered exponential backoff.
+    If func returns a requests.Response, its rate-limit headers are learned automatically.
+    """
+    guard = get_guard(provider)
+    for attempt in range(retries + 1):
+        if not guard.admit():
+            raise CircuitOpenError(f"{provider} circuit is open")
+        guard.acquire()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            guard.record_failure(e)
+            if attempt >= retries:
+                raise
+            time.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.5))
+            continue
+        _record_response(guard, result, start)
+        return result
+
+def _record_response(guard, result, start):
+    guard.observe_headers(getattr(result, 'headers', None))
+    # requests.Response has status_code, aiohttp.ClientResponse has status.
+    status = getattr(result, 'status_code', getattr(result, 'status', None))
+    if isinstance(status, int) and (status == 429 or status >= 500):
+        # Returned rather than raised; the caller's raise_for_status() surfaces it.
+        guard.record_failure(f"HTTP {status}")
+    else:
+        guard.record_success(time.monotonic() - start)
+
+async def async_guarded_call(provider, coro_func, *args, retries=0, **kwargs):
+    """
+    guarded_call() for coroutine functions: the rate-limit wait and retry backoff are
+    asyncio.sleep()s, so other coroutines keep running while this one waits.
+    """
+    guard = get_guard(provider)
+    for attempt in range(retries + 1):
+        if not guard.admit():
+            raise CircuitOpenError(f"{provider} circuit is open")
+        wait = guard.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        start = time.monotonic()
+        try:
+            result = await coro_func(*args, **kwargs)
+        except Exception as e:
+            guard.record_failure(e)
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.5))
+            continue
+        _record_response(guard, result, start)
+        return result
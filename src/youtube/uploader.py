@@ -1,9 +1,11 @@
 import os
+import time
 import pickle
+import threading
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaUpload
 from googleapiclient.errors import HttpError
 
 """
@@ -19,16 +21,17 @@ IMPORTANT: Before running this script, you need to:
 # OAuth 2.0 credentials
 SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
 TOKEN_PICKLE_FILE = 'token.pickle'
+CLIENT_SECRETS_FILE = 'client_secrets.json'
 OAUTH_PORT = 8080
 
-def get_authenticated_service():
-    """Get YouTube API credentials and build service."""
+def get_authenticated_service(token_file=TOKEN_PICKLE_FILE, client_secrets_file=CLIENT_SECRETS_FILE):
+    """Get YouTube API credentials and build service. Each channel keeps its own token_file."""
     credentials = None
     
     # Token pickle stores the user's credentials from previously successful logins
-    if os.path.exists(TOKEN_PICKLE_FILE):
-        print('Loading credentials from file...')
-        with open(TOKEN_PICKLE_FILE, 'rb') as token:
+    if os.path.exists(token_file):
+        print(f'Loading credentials from {token_file}...')
+        with open(token_file, 'rb') as token:
             credentials = pickle.load(token)
 
     # If there are no valid credentials available, prompt the user to log in
@@ -40,24 +43,81 @@ def get_authenticated_service():
             print('Fetching new tokens...')
             try:
                 flow = InstalledAppFlow.from_client_secrets_file(
-                    'client_secrets.json', SCOPES)
+                    client_secrets_file, SCOPES)
                 credentials = flow.run_local_server(port=OAUTH_PORT)
             except Exception as e:
                 print(f"\nError during OAuth: {e}")
                 print("\nPlease make sure:")
-                print(f"1. Your client_secrets.json has http://localhost:{OAUTH_PORT}/ in its redirect_uris")
+                print(f"1. Your {client_secrets_file} has http://localhost:{OAUTH_PORT}/ in its redirect_uris")
                 print("2. The same URI is added in Google Cloud Console")
                 print("3. You've enabled the YouTube Data API v3")
                 raise
 
         # Save the credentials for the next run
-        with open(TOKEN_PICKLE_FILE, 'wb') as token:
+        with open(token_file, 'wb') as token:
             print('Saving credentials for future use...')
             pickle.dump(credentials, token)
 
     return build('youtube', 'v3', credentials=credentials)
 
-def upload_to_youtube(file_path, title, description="", tags=None):
+# Resumable chunks must be multiples of 256 KiB (except the last one).
+STREAMING_CHUNK_SIZE = 32 * 256 * 1024
+
+class EncodeStatus:
+    """Signals a streaming upload that the encoder has finished writing (or failed)."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.failed = False
+
+    def finish(self, success=True):
+        self.failed = not success
+        self.done.set()
+
+class GrowingFileUpload(MediaUpload):
+    """
+    Resumable upload of a file that is still being written, e.g. a fragmented MP4 while
+    the encoder runs. Chunks are sent as soon as enough bytes exist on disk; the total size
+    is only declared once the encoder signals completion (a short read ends the upload).
+    """
+    def __init__(self, file_path, status, mimetype='video/mp4', chunksize=STREAMING_CHUNK_SIZE, poll_interval=0.5):
+        self._file_path = file_path
+        self._status = status
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._poll_interval = poll_interval
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        end = begin + length
+        while True:
+            # Read the flag before the size so a final write is never missed.
+            done = self._status.done.is_set()
+            available = os.path.getsize(self._file_path) if os.path.exists(self._file_path) else 0
+            if available >= end or done:
+                break
+            time.sleep(self._poll_interval)
+        if self._status.failed:
+            raise RuntimeError(f"Encoding of {self._file_path} failed; aborting streaming upload.")
+        with open(self._file_path, 'rb') as f:
+            f.seek(begin)
+            return f.read(length)
+
+def upload_to_youtube(file_path, title, description="", tags=None, thumbnail_path=None, encode_status=None,
+                      token_file=TOKEN_PICKLE_FILE, client_secrets_file=CLIENT_SECRETS_FILE):
     """
     Upload a video to YouTube.
     
@@ -66,14 +126,22 @@ def upload_to_youtube(file_path, title, description="", tags=None):
         title (str): Title of the video
         description (str): Video description
         tags (list): List of tags for the video
+        thumbnail_path (str): Optional JPEG to set as the custom thumbnail
+        encode_status (EncodeStatus): If given, file_path is still being encoded and is
+            uploaded as it grows; the upload completes once the encoder finishes.
+        token_file (str): OAuth token of the channel to upload to
+        client_secrets_file (str): OAuth client used if token_file has to be (re)created
+
+    Returns:
+        str: The uploaded video's ID, or None if the upload failed.
     """
-    if not os.path.exists(file_path):
+    if encode_status is None and not os.path.exists(file_path):
         print(f"Error: Video file not found at {file_path}")
-        return
+        return None
 
     print("Authenticating with YouTube...")
     try:
-        youtube = get_authenticated_service()
+        youtube = get_authenticated_service(token_file, client_secrets_file)
         
         print("Preparing video upload...")
         body = {
@@ -89,15 +157,20 @@ def upload_to_youtube(file_path, title, description="", tags=None):
             }
         }
 
-        # Create the video insert request
-        insert_request = youtube.videos().insert(
-            part=','.join(body.keys()),
-            body=body,
-            media_body=MediaFileUpload(
+        if encode_status is not None:
+            media_body = GrowingFileUpload(file_path, encode_status)
+        else:
+            media_body = MediaFileUpload(
                 file_path, 
                 chunksize=-1, 
                 resumable=True
             )
+
+        # Create the video insert request
+        insert_request = youtube.videos().insert(
+            part=','.join(body.keys()),
+            body=body,
+            media_body=media_body
         )
 
         print("Starting video upload to YouTube...")
@@ -107,13 +180,25 @@ def upload_to_youtube(file_path, title, description="", tags=None):
         if video_id:
             print(f"Video upload successful! Video ID: {video_id}")
             print(f"Video URL: https://youtu.be/{video_id}")
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                try:
+                    youtube.thumbnails().set(
+                        videoId=video_id,
+                        media_body=MediaFileUpload(thumbnail_path, mimetype='image/jpeg')
+                    ).execute()
+                    print(f"Custom thumbnail set from {thumbnail_path}")
+                except HttpError as e:
+                    # Custom thumbnails need a verified channel; the upload itself still succeeded.
+                    print(f"Could not set thumbnail: HTTP {e.resp.status}")
         else:
             print("Video upload completed but no video ID was returned.")
+        return video_id
 
     except HttpError as e:
         print(f"An HTTP error {e.resp.status} occurred: {e.content}")
     except Exception as e:
         print(f"An error occurred during upload: {e}")
+    return None
 
 if __name__ == "__main__":
     # For direct testing